@@ -0,0 +1,687 @@
+"""
+Асинхронный движок VKinder на asyncio
+Один цикл событий обслуживает тысячи диалогов одновременно
+"""
+
+import asyncio
+import html
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+import vk_api
+from vk_api.utils import get_random_id
+
+from database import Database
+from dispatcher import SynchronizedProxy
+from db_pool import ConnectionPool
+from favorites import FavoritesRepository, FavoritesPager
+from cities import CityIndex, UserCities
+from vk_batch import BatchVKService
+from cache import CachedVKService, MemoryCacheBackend
+from session_store import SessionStore, CandidateList
+from exclusion import ExclusionIndex
+from candidate_search import SearchPositions, FIRST_PAGE_SIZE, LOOKAHEAD
+from candidate_pool import CandidatePool
+from ranking import CandidateRanker
+from router import CommandRouter, KeyboardCache, event_payload
+from log_setup import log_context
+from vk_executor import resilient
+from config import VK_GROUP_TOKEN, VK_USER_TOKEN, DB_CONFIG
+from main import VKinderBot, WELCOME_TEMPLATE, CHANGE_SEX_TEXT, \
+    CHANGE_AGE_TEXT, CHANGE_CITY_TEXT, HELP_TEXT
+
+logger = logging.getLogger(__name__)
+
+API_URL = 'https://api.vk.com/method/'
+API_VERSION = '5.131'
+
+# Тайм-аут ожидания событий long poll (секунды)
+LONGPOLL_WAIT = 25
+# Максимум одновременно обрабатываемых событий
+DEFAULT_MAX_CONCURRENCY = 1000
+# Потоки для блокирующих вызовов VKService и Database
+DEFAULT_BLOCKING_THREADS = 32
+
+# Код события "новое сообщение" и флаг исходящего сообщения в long poll
+EVENT_MESSAGE_NEW = 4
+FLAG_OUTBOX = 2
+
+
+class AsyncVkApiError(Exception):
+    """Ошибка VK API"""
+
+    def __init__(self, error):
+        self.code = error.get('error_code')
+        self.error = error
+        super().__init__(f"[{self.code}] {error.get('error_msg')}")
+
+
+class AsyncVkClient:
+    """Неблокирующий клиент VK API"""
+
+    def __init__(self, token, http=None, api_version=API_VERSION):
+        self.token = token
+        self.api_version = api_version
+        self.http = http
+
+    async def __aenter__(self):
+        if self.http is None:
+            self.http = aiohttp.ClientSession()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        if self.http is not None:
+            await self.http.close()
+            self.http = None
+
+    async def method(self, method, **params):
+        """Вызов метода VK API"""
+        params = {k: v for k, v in params.items() if v is not None}
+        params['access_token'] = self.token
+        params['v'] = self.api_version
+
+        async with self.http.post(API_URL + method, data=params) as response:
+            data = await response.json(content_type=None)
+
+        if 'error' in data:
+            raise AsyncVkApiError(data['error'])
+        return data['response']
+
+
+class AsyncLongPollEvent:
+    """Событие long poll (поля совпадают с vk_api.longpoll.Event)"""
+
+    __slots__ = ('type', 'message_id', 'user_id', 'text', 'timestamp', 'to_me', 'from_me')
+
+    def __init__(self, raw):
+        self.type = raw[0]
+        self.message_id = raw[1]
+        flags = raw[2]
+        self.user_id = raw[3]
+        self.timestamp = raw[4]
+        self.text = html.unescape(raw[5]).replace('<br>', '\n')
+        self.from_me = bool(flags & FLAG_OUTBOX)
+        self.to_me = not self.from_me
+
+
+class AsyncLongPoll:
+    """Асинхронное чтение событий long poll (аналог vk_api.longpoll.VkLongPoll)"""
+
+    def __init__(self, client, group_id=None, wait=LONGPOLL_WAIT):
+        self.client = client
+        self.group_id = group_id
+        self.wait = wait
+        self.server = None
+        self.key = None
+        self.ts = None
+
+    async def update_longpoll_server(self, update_ts=True):
+        """Получение адреса и ключа сервера long poll"""
+        response = await self.client.method(
+            'messages.getLongPollServer',
+            lp_version=3,
+            group_id=self.group_id
+        )
+        self.server = response['server']
+        self.key = response['key']
+        if update_ts:
+            self.ts = response['ts']
+
+    async def check(self):
+        """Один запрос к серверу long poll"""
+        params = {
+            'act': 'a_check',
+            'key': self.key,
+            'ts': self.ts,
+            'wait': self.wait,
+            'mode': 2,
+            'version': 3
+        }
+        timeout = aiohttp.ClientTimeout(total=self.wait + 10)
+        async with self.client.http.get(f'https://{self.server}', params=params,
+                                        timeout=timeout) as response:
+            data = await response.json(content_type=None)
+
+        if 'failed' not in data:
+            self.ts = data['ts']
+            return [
+                AsyncLongPollEvent(raw) for raw in data['updates']
+                if raw and raw[0] == EVENT_MESSAGE_NEW
+            ]
+
+        if data['failed'] == 1:
+            self.ts = data['ts']
+        elif data['failed'] == 2:
+            await self.update_longpoll_server(update_ts=False)
+        else:
+            await self.update_longpoll_server()
+        return []
+
+    async def listen(self):
+        """Бесконечный асинхронный генератор событий"""
+        if self.server is None:
+            await self.update_longpoll_server()
+
+        while True:
+            try:
+                events = await self.check()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error(f"Ошибка long poll, переподключение: {e}")
+                await asyncio.sleep(1)
+                await self.update_longpoll_server()
+                continue
+
+            for event in events:
+                yield event
+
+
+class AsyncProxy:
+    """Асинхронная обёртка над блокирующим объектом: методы выполняются в пуле потоков"""
+
+    def __init__(self, target, executor=None):
+        self._target = target
+        self._executor = executor
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, lambda: attr(*args, **kwargs))
+
+        return call
+
+
+class AsyncVKinderBot(VKinderBot):
+    """
+    Асинхронная версия бота.
+
+    Клавиатуры и тексты общие с VKinderBot, а сеть и обработчики - асинхронные:
+    сообщения отправляются через aiohttp, события читаются асинхронным long poll,
+    а блокирующие VKService и Database вызываются в отдельном пуле потоков.
+    Поиск тот же, что у VKinderBot: страницы общего пула кандидатов без исключённых,
+    ранжирование и продолжение с места, где пользователь остановился.
+    """
+
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 blocking_threads=DEFAULT_BLOCKING_THREADS, cache_backend=None):
+        """
+        Инициализация бота.
+        Соединение с БД и пул соединений открываются здесь же (с созданием индекса
+        избранных и столбца города), сессия aiohttp для VK API - в run.
+        """
+        self.executor = ThreadPoolExecutor(max_workers=blocking_threads,
+                                           thread_name_prefix='vkinder-blocking')
+        self.router = CommandRouter()
+        self.keyboards = KeyboardCache()
+
+        self.vk_session = vk_api.VkApi(token=VK_GROUP_TOKEN)
+        # Блокирующие запросы VKService идут через слой выполнения (vk_executor)
+        self.user_session = resilient(vk_api.VkApi(token=VK_USER_TOKEN), 'user')
+        self.vk_service = AsyncProxy(
+            CachedVKService(
+                BatchVKService(resilient(self.vk_session, 'group'), self.user_session),
+                backend=cache_backend or MemoryCacheBackend()
+            ),
+            self.executor
+        )
+        # Соединение с БД одно на все потоки пула - сериализуем запросы
+        self.sync_db = SynchronizedProxy(Database(**DB_CONFIG))
+        self.db = AsyncProxy(self.sync_db, self.executor)
+        # Страницы избранных читаются из БД через отдельный пул соединений
+        self.db_pool = ConnectionPool(DB_CONFIG, size=blocking_threads)
+        favorites_store = FavoritesRepository(self.db_pool)
+        favorites_store.ensure_index()
+        self.favorites = AsyncProxy(FavoritesPager(favorites_store), self.executor)
+        self.cities = CityIndex(self.user_session)
+        user_cities = UserCities(self.db_pool)
+        user_cities.ensure_column()
+        self.user_cities = AsyncProxy(user_cities, self.executor)
+
+        # Поиск: общий пул кандидатов, исключения, ранжирование и позиции (см. VKinderBot.make_cursor)
+        self.candidate_pool = CandidatePool(self.user_session, city_resolver=self.cities.city_id)
+        self.exclusions = ExclusionIndex(self.sync_db, pool=self.db_pool)
+        self.ranker = CandidateRanker()
+        self.search_positions = SearchPositions()
+
+        self.client = None
+        self.user_states = SessionStore()
+
+        self.max_concurrency = max_concurrency
+        self._user_locks = {}
+
+    async def run_blocking(self, func, *args):
+        """Вызов блокирующей функции в пуле потоков"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, lambda: func(*args))
+
+    async def send_message(self, user_id, message, keyboard=None, attachment=None):
+        """Отправка сообщения пользователю"""
+        try:
+            await self.client.method(
+                'messages.send',
+                user_id=user_id,
+                message=message,
+                keyboard=keyboard,
+                attachment=attachment,
+                random_id=get_random_id()
+            )
+        except Exception as e:
+            logger.error(f"Ошибка отправки сообщения пользователю {user_id}: {e}")
+
+    async def handle_start(self, user_id):
+        """Обработка команды /start"""
+        try:
+            user_info = await self.vk_service.get_user_info(user_id)
+            if not user_info:
+                await self.send_message(user_id, "❌ Не удалось получить информацию о вашем профиле.")
+                return
+
+            await self.db.add_user(user_info)
+
+            welcome_msg = WELCOME_TEMPLATE.format(first_name=user_info['first_name'])
+            await self.send_message(user_id, welcome_msg, self.get_main_keyboard())
+
+        except Exception as e:
+            logger.error(f"Ошибка в handle_start для пользователя {user_id}: {e}")
+            await self.send_message(user_id, "❌ Произошла ошибка при запуске. Попробуйте позже.")
+
+    async def handle_search(self, user_id):
+        """Обработка поиска людей"""
+        try:
+            user_info = await self.db.get_user(user_id)
+            if not user_info:
+                await self.send_message(user_id, "❌ Сначала нужно запустить бота командой /start")
+                return
+
+            await self.send_message(user_id, "🔍 Ищу подходящих людей для знакомства...")
+
+            # Продолжаем с того места, где пользователь остановился в прошлый раз
+            offset = self.search_positions.get(user_id, self.candidate_pool.key(user_info))
+            cursor = self.make_cursor(user_id, user_info, offset)
+
+            candidates = CandidateList(await self.run_blocking(cursor.next_page, FIRST_PAGE_SIZE))
+            while not candidates and not cursor.exhausted:
+                candidates.extend(await self.run_blocking(cursor.next_page))
+
+            if not candidates:
+                self.search_positions.reset(user_id)
+                await self.send_message(
+                    user_id,
+                    "😔 К сожалению, не нашел подходящих кандидатов. Попробуйте изменить параметры поиска в настройках.",
+                    self.get_main_keyboard()
+                )
+                return
+
+            self.user_states[user_id] = {
+                'candidates': candidates,
+                'cursor': cursor,
+                'current_index': 0,
+                'mode': 'search'
+            }
+
+            await self.show_next_candidate(user_id)
+
+        except Exception as e:
+            logger.error(f"Ошибка в handle_search для пользователя {user_id}: {e}")
+            await self.send_message(user_id, "❌ Ошибка при поиске. Попробуйте позже.")
+
+    async def show_next_candidate(self, user_id):
+        """Показ следующего кандидата"""
+        try:
+            if user_id not in self.user_states:
+                await self.send_message(user_id, "❌ Сначала начните поиск", self.get_main_keyboard())
+                return
+
+            state = self.user_states[user_id]
+            candidates = state['candidates']
+            current_index = state['current_index']
+
+            if current_index >= len(candidates):
+                await self.run_blocking(self.load_more_candidates, state, current_index + 1)
+
+            if current_index >= len(candidates):
+                self.search_positions.reset(user_id)
+                await self.send_message(
+                    user_id,
+                    "🎉 Вы просмотрели всех найденных людей!\n\nХотите начать новый поиск?",
+                    self.get_main_keyboard()
+                )
+                del self.user_states[user_id]
+                return
+
+            candidate = candidates[current_index]
+            photos = await self.vk_service.get_popular_photos(candidate['id'])
+            message, attachment = self.format_candidate(candidate, photos)
+
+            await self.send_message(user_id, message, self.get_search_keyboard(), attachment)
+
+            state['current_candidate'] = candidate
+            await self.run_blocking(self.exclusions.mark_seen, user_id, candidate['id'])
+
+            cursor = state.get('cursor')
+            if cursor:
+                self.search_positions.save(user_id, cursor.key, cursor.resume_offset(current_index))
+
+            # Следующая страница подгружается, пока пользователь смотрит карточку
+            await self.run_blocking(self.load_more_candidates, state, current_index + 1 + LOOKAHEAD)
+
+        except Exception as e:
+            logger.error(f"Ошибка в show_next_candidate для пользователя {user_id}: {e}")
+            await self.send_message(user_id, "❌ Ошибка при показе кандидата.")
+
+    async def handle_next_candidate(self, user_id):
+        """Переход к следующему кандидату"""
+        if user_id in self.user_states:
+            self.user_states[user_id]['current_index'] += 1
+            await self.show_next_candidate(user_id)
+        else:
+            await self.send_message(user_id, "❌ Сначала начните поиск", self.get_main_keyboard())
+
+    async def handle_add_to_favorites(self, user_id):
+        """Добавление в избранное"""
+        try:
+            if user_id not in self.user_states:
+                await self.send_message(user_id, "❌ Сначала начните поиск", self.get_main_keyboard())
+                return
+
+            state = self.user_states[user_id]
+            if 'current_candidate' not in state:
+                await self.send_message(user_id, "❌ Нет текущего кандидата")
+                return
+
+            candidate = state['current_candidate']
+
+            success = await self.db.add_to_favorites(
+                user_id,
+                candidate['id'],
+                candidate['first_name'],
+                candidate['last_name']
+            )
+
+            if success:
+                await self.run_blocking(self.exclusions.add_favorite, user_id, candidate['id'])
+                await self.send_message(user_id, f"❤️ {candidate['first_name']} добавлен(а) в избранное!")
+            else:
+                await self.send_message(user_id, "❌ Этот человек уже в вашем списке избранных")
+
+            await self.handle_next_candidate(user_id)
+
+        except Exception as e:
+            logger.error(f"Ошибка в handle_add_to_favorites для пользователя {user_id}: {e}")
+            await self.send_message(user_id, "❌ Ошибка при добавлении в избранное.")
+
+    async def handle_add_to_blacklist(self, user_id):
+        """Добавление в черный список"""
+        try:
+            if user_id not in self.user_states:
+                await self.send_message(user_id, "❌ Сначала начните поиск", self.get_main_keyboard())
+                return
+
+            state = self.user_states[user_id]
+            if 'current_candidate' not in state:
+                await self.send_message(user_id, "❌ Нет текущего кандидата")
+                return
+
+            candidate = state['current_candidate']
+
+            await self.db.add_to_blacklist(user_id, candidate['id'])
+            await self.run_blocking(self.exclusions.add_blacklist, user_id, candidate['id'])
+            await self.send_message(user_id, f"👎 {candidate['first_name']} добавлен(а) в черный список")
+
+            await self.handle_next_candidate(user_id)
+
+        except Exception as e:
+            logger.error(f"Ошибка в handle_add_to_blacklist для пользователя {user_id}: {e}")
+            await self.send_message(user_id, "❌ Ошибка при добавлении в черный список.")
+
+    async def handle_show_favorites(self, user_id):
+        """Показ первой страницы избранных"""
+        await self._show_favorites_page(user_id, lambda state: self.favorites.first(user_id))
+
+    async def handle_favorites_next(self, user_id):
+        """Следующая страница избранных"""
+        await self._show_favorites_page(user_id, lambda state: self.favorites.next(user_id, state))
+
+    async def handle_favorites_prev(self, user_id):
+        """Предыдущая страница избранных"""
+        await self._show_favorites_page(user_id, lambda state: self.favorites.prev(user_id, state))
+
+    async def _show_favorites_page(self, user_id, load):
+        """Загрузка страницы избранных; положение листания хранится в сессии"""
+        try:
+            session = self.user_states.get(user_id)
+            state = session.get('favorites_page') if session else None
+            if state is None or state['first'] is None:
+                favorites, page = await self.favorites.first(user_id)
+            else:
+                favorites, page = await load(state)
+
+            if not favorites:
+                await self.send_message(
+                    user_id,
+                    "💔 Ваш список избранных пуст.\n\nНачните поиск, чтобы найти интересных людей!",
+                    self.get_main_keyboard()
+                )
+                return
+
+            if session is None:
+                session = {}
+                self.user_states[user_id] = session
+            session['favorites_page'] = page
+
+            await self.send_message(user_id, self.format_favorites(favorites, page),
+                                    self.get_favorites_page_keyboard(page))
+
+        except Exception as e:
+            logger.error(f"Ошибка в handle_show_favorites для пользователя {user_id}: {e}")
+            await self.send_message(user_id, "❌ Ошибка при получении избранных.")
+
+    async def handle_clear_favorites(self, user_id):
+        """Очистка списка избранных"""
+        try:
+            await self.db.clear_favorites(user_id)
+            await self.run_blocking(self.exclusions.clear_favorites, user_id)
+            session = self.user_states.get(user_id)
+            if session:
+                session.pop('favorites_page', None)
+            await self.send_message(user_id, "🗑️ Список избранных очищен!", self.get_main_keyboard())
+        except Exception as e:
+            logger.error(f"Ошибка в handle_clear_favorites для пользователя {user_id}: {e}")
+            await self.send_message(user_id, "❌ Ошибка при очистке избранных.")
+
+    async def handle_settings(self, user_id):
+        """Показ меню настроек"""
+        try:
+            user_info = await self.db.get_user(user_id)
+            if not user_info:
+                await self.send_message(user_id, "❌ Сначала запустите бота командой /start")
+                return
+
+            await self.send_message(user_id, self.format_settings(user_info), self.get_settings_keyboard())
+
+        except Exception as e:
+            logger.error(f"Ошибка в handle_settings для пользователя {user_id}: {e}")
+            await self.send_message(user_id, "❌ Ошибка при получении настроек.")
+
+    async def handle_change_sex(self, user_id):
+        """Изменение пола для поиска"""
+        self.user_states[user_id] = {'mode': 'waiting_sex'}
+        await self.send_message(user_id, CHANGE_SEX_TEXT, self.get_sex_keyboard())
+
+    async def handle_change_age(self, user_id):
+        """Изменение возраста"""
+        self.user_states[user_id] = {'mode': 'waiting_age'}
+        await self.send_message(user_id, CHANGE_AGE_TEXT, self.get_cancel_keyboard())
+
+    async def handle_change_city(self, user_id):
+        """Изменение города"""
+        self.user_states[user_id] = {'mode': 'waiting_city'}
+        await self.send_message(user_id, CHANGE_CITY_TEXT, self.get_city_keyboard())
+
+    async def process_settings_input(self, user_id, text):
+        """Обработка ввода настроек"""
+        try:
+            state = self.user_states.get(user_id, {})
+            mode = state.get('mode')
+
+            if mode == 'waiting_sex':
+                if text in ['1', '1 - женский', 'женский', 'ж']:
+                    await self.db.update_user_sex(user_id, 1)
+                    await self.send_message(user_id, "✅ Пол изменён на: Женский", self.get_settings_keyboard())
+                    del self.user_states[user_id]
+                elif text in ['2', '2 - мужской', 'мужской', 'м']:
+                    await self.db.update_user_sex(user_id, 2)
+                    await self.send_message(user_id, "✅ Пол изменён на: Мужской", self.get_settings_keyboard())
+                    del self.user_states[user_id]
+                else:
+                    await self.send_message(user_id, "❌ Неверный формат. Отправьте 1 или 2")
+                return True
+
+            elif mode == 'waiting_age':
+                try:
+                    age = int(text)
+                except ValueError:
+                    await self.send_message(user_id, "❌ Отправьте число. Например: 25")
+                    return True
+
+                if 18 <= age <= 80:
+                    await self.db.update_user_age(user_id, age)
+                    await self.send_message(user_id, f"✅ Возраст изменён на: {age} лет", self.get_settings_keyboard())
+                    del self.user_states[user_id]
+                else:
+                    await self.send_message(user_id, "❌ Возраст должен быть от 18 до 80 лет")
+                return True
+
+            elif mode == 'waiting_city':
+                # Неизвестный город ищется через VK - в пуле потоков
+                city, suggestions = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self.cities.resolve, text)
+                if city:
+                    await self.db.update_user_city(user_id, city.title.lower())
+                    await self.user_cities.set_city_id(user_id, city.id)
+                    await self.send_message(user_id, f"✅ Город изменён на: {city.title}", self.get_settings_keyboard())
+                    del self.user_states[user_id]
+                else:
+                    await self.send_message(user_id, self.format_city_not_found(text, suggestions))
+                return True
+
+            return False
+
+        except Exception as e:
+            logger.error(f"Ошибка в process_settings_input: {e}")
+            return False
+
+    async def handle_help(self, user_id):
+        """Показ справки"""
+        await self.send_message(user_id, HELP_TEXT, self.get_main_keyboard())
+
+    async def handle_cancel(self, user_id):
+        """Отмена текущего действия"""
+        self.user_states.pop(user_id, None)
+        await self.send_message(user_id, "❌ Отменено", self.get_main_keyboard())
+
+    async def handle_favorites_menu(self, user_id):
+        """Меню избранных"""
+        await self.send_message(user_id, "❤️ Избранные:", self.get_favorites_keyboard())
+
+    async def handle_main_menu(self, user_id):
+        """Возврат в главное меню"""
+        await self.send_message(user_id, "🏠 Главное меню:", self.get_main_keyboard())
+
+    async def handle_unknown(self, user_id, text):
+        """Ответ на неизвестную команду"""
+        logger.info(f"Неизвестная команда от {user_id}: '{text}'")
+        await self.send_message(
+            user_id,
+            f"🤔 Не понимаю команду '{text}'.\n\nВыберите действие из меню:",
+            self.get_main_keyboard()
+        )
+
+    async def handle_message(self, event):
+        """Обработка входящих сообщений"""
+        user_id = event.user_id
+        message = event.text.lower().strip()
+
+        with log_context(user_id=user_id):
+            await self._handle_message(event, user_id, message)
+
+    async def _handle_message(self, event, user_id, message):
+        try:
+            handler = self.router.resolve(message, event_payload(event))
+
+            if handler != 'handle_cancel' and await self.process_settings_input(user_id, message):
+                return
+
+            if handler:
+                await getattr(self, handler)(user_id)
+            else:
+                await self.handle_unknown(user_id, event.text)
+
+        except Exception as e:
+            logger.error(f"Ошибка при обработке сообщения от {user_id}: {e}")
+            await self.send_message(user_id, "❌ Произошла ошибка. Попробуйте позже.", self.get_main_keyboard())
+
+    async def _handle_ordered(self, event, semaphore):
+        """Обработка события с сохранением порядка сообщений одного пользователя"""
+        user_id = event.user_id
+        entry = self._user_locks.get(user_id)
+        if entry is None:
+            entry = self._user_locks[user_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+
+        try:
+            async with entry[0], semaphore:
+                await self.handle_message(event)
+        finally:
+            entry[1] -= 1
+            # Больше никто не ждёт блокировку - освобождаем память
+            if entry[1] == 0:
+                del self._user_locks[user_id]
+
+    async def run_async(self):
+        """Главный цикл асинхронного бота"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = set()
+
+        async with AsyncVkClient(VK_GROUP_TOKEN) as client:
+            self.client = client
+            longpoll = AsyncLongPoll(client)
+
+            try:
+                async for event in longpoll.listen():
+                    if not event.to_me:
+                        continue
+                    task = asyncio.create_task(self._handle_ordered(event, semaphore))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            finally:
+                # Дожидаемся уже начатых обработчиков
+                if tasks:
+                    await asyncio.gather(*tasks, return_exceptions=True)
+
+    def run(self):
+        """Запуск асинхронного бота"""
+        logger.info("VKinder bot (asyncio) запущен!")
+        print("🤖 VKinder bot (asyncio) запущен! Нажмите Ctrl+C для остановки.")
+
+        try:
+            asyncio.run(self.run_async())
+
+        except KeyboardInterrupt:
+            logger.info("VKinder bot остановлен пользователем")
+            print("\n🛑 VKinder bot остановлен")
+
+        except Exception as e:
+            logger.error(f"Критическая ошибка: {e}")
+            print(f"❌ Критическая ошибка: {e}")
+
+        finally:
+            self.executor.shutdown(wait=True)
+            self.db_pool.close()
+            self.sync_db.close()
@@ -0,0 +1,110 @@
+"""
+Бенчмарк разбора команд: цепочка elif со списками против таблицы CommandRouter,
+сборка клавиатуры на каждый ответ против готового JSON из KeyboardCache
+
+Запуск: python benchmarks/bench_router.py [--events 200000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vk_api.keyboard import VkKeyboard, VkKeyboardColor  # noqa: E402
+
+from router import CommandRouter, KeyboardCache  # noqa: E402
+
+# Сообщения в пропорциях, близких к реальным: в основном листание и оценки
+MESSAGES = (['▶️ следующий'] * 40 + ['❤️ в избранное'] * 15 + ['👎 в черный список'] * 15
+            + ['🔍 поиск'] * 10 + ['🏠 главное меню'] * 5 + ['настройки⚙️'] * 3 + ['лайк'] * 5
+            + ['/start'] * 2 + ['ℹ️ помощь'] * 2 + ['что-то непонятное'] * 3)
+
+
+def elif_chain(message):
+    """Прежний разбор команд в handle_message"""
+    if message in ['❌ отмена', 'отмена']:
+        return 'handle_cancel'
+    if message in ['/start', 'начать', 'привет', 'старт']:
+        return 'handle_start'
+    elif message in ['🔍 поиск', 'поиск']:
+        return 'handle_search'
+    elif message in ['▶️ следующий', 'следующий', 'далее']:
+        return 'handle_next_candidate'
+    elif message in ['❤️ в избранное', 'в избранное', 'лайк']:
+        return 'handle_add_to_favorites'
+    elif message in ['👎 в черный список', 'в черный список', 'дизлайк']:
+        return 'handle_add_to_blacklist'
+    elif message in ['❤️ избранные', 'избранные']:
+        return 'handle_favorites_menu'
+    elif message in ['📋 показать избранных', 'показать избранных']:
+        return 'handle_show_favorites'
+    elif message in ['🗑️ очистить избранных', 'очистить избранных']:
+        return 'handle_clear_favorites'
+    elif message in ['⚙️ настройки', 'настройки', '⚙ настройки', 'настройки⚙️', 'настройка']:
+        return 'handle_settings'
+    elif message in ['🚻 изменить пол', 'изменить пол', 'пол']:
+        return 'handle_change_sex'
+    elif message in ['🎂 изменить возраст', 'изменить возраст', 'возраст']:
+        return 'handle_change_age'
+    elif message in ['🏙️ изменить город', 'изменить город', 'город', '🏙 изменить город']:
+        return 'handle_change_city'
+    elif message in ['📊 показать настройки', 'показать настройки']:
+        return 'handle_settings'
+    elif message in ['🏠 главное меню', 'главное меню', 'меню']:
+        return 'handle_main_menu'
+    elif message in ['ℹ️ помощь', 'помощь', 'help']:
+        return 'handle_help'
+    return None
+
+
+def build_search_keyboard():
+    """Прежняя сборка клавиатуры на каждый ответ"""
+    keyboard = VkKeyboard(one_time=True)
+    keyboard.add_button('❤️ В избранное', VkKeyboardColor.POSITIVE)
+    keyboard.add_button('👎 В черный список', VkKeyboardColor.NEGATIVE)
+    keyboard.add_line()
+    keyboard.add_button('▶️ Следующий', VkKeyboardColor.PRIMARY)
+    keyboard.add_button('🏠 Главное меню', VkKeyboardColor.SECONDARY)
+    return keyboard.get_keyboard()
+
+
+def per_event(func, items):
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    return (time.perf_counter() - start) / len(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', type=int, default=200000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    messages = [rng.choice(MESSAGES) for _ in range(args.events)]
+    router = CommandRouter()
+    keyboards = KeyboardCache()
+
+    # Оба способа должны выбирать одни и те же обработчики
+    for message in set(MESSAGES):
+        assert router.resolve(message) == elif_chain(message), message
+
+    payload = {'command': 'next'}
+    results = [
+        ('elif-цепочка', per_event(elif_chain, messages)),
+        ('CommandRouter, текст', per_event(router.resolve, messages)),
+        ('CommandRouter, payload', per_event(lambda m: router.resolve(m, payload), messages)),
+        ('сборка клавиатуры', per_event(lambda _: build_search_keyboard(), messages[:args.events // 10])),
+        ('KeyboardCache', per_event(lambda _: keyboards['search'], messages)),
+    ]
+
+    print(f"{'способ':<26} {'нс на событие':>14}")
+    for name, seconds in results:
+        print(f"{name:<26} {seconds * 1e9:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
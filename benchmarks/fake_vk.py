@@ -0,0 +1,370 @@
+"""
+Поддельный VK API и база данных для нагрузочного тестирования VKinder без сети и PostgreSQL
+"""
+
+import queue
+import random
+import sqlite3
+import threading
+import time
+
+from vk_api.exceptions import ApiError
+from vk_api.longpoll import VkEventType
+
+CITIES = [(1, 'Москва'), (2, 'Санкт-Петербург'), (99, 'Новосибирск'), (60, 'Казань'), (73, 'Красноярск')]
+# Коды ошибок, которые подмешиваются при error_rate > 0
+INJECTED_ERRORS = {6: 'Too many requests per second', 10: 'Internal server error'}
+
+
+class FakeVkApi:
+    """
+    Поддельная сессия vk_api.VkApi.
+
+    Поддерживает users.get, users.search, photos.get, execute (пакет photos.get),
+    database.getCities и messages.send. Каждый вызов ждёт latency секунд
+    (плюс случайный разброс jitter) и с вероятностью error_rate завершается
+    ошибкой VK. Отправленные сообщения передаются в on_send(user_id, params).
+    """
+
+    def __init__(self, population=5000, latency=0.0, jitter=0.0, error_rate=0.0, seed=1, on_send=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.on_send = on_send
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = {}
+        self.profiles = [self._make_profile(i, seed) for i in range(1, population + 1)]
+        self._by_id = {p['id']: p for p in self.profiles}
+
+    @staticmethod
+    def _make_profile(i, seed):
+        rng = random.Random(seed * 1000003 + i)
+        city_id, city = rng.choice(CITIES)
+        return {
+            'id': 100000 + i,
+            'first_name': f'Имя{i}',
+            'last_name': f'Фамилия{i}',
+            'sex': rng.choice((1, 2)),
+            'bdate': f'{rng.randint(1, 28)}.{rng.randint(1, 12)}.{rng.randint(1965, 2006)}',
+            'city': {'id': city_id, 'title': city},
+            'is_closed': rng.random() < 0.1,
+            'last_seen': {'time': int(time.time()) - rng.randint(0, 30 * 24 * 3600)},
+            'common_count': rng.randint(0, 10),
+        }
+
+    def _delay_and_fail(self, method, values):
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            delay = self.latency + (self._rng.random() * self.jitter if self.jitter else 0)
+            fail = self.error_rate and self._rng.random() < self.error_rate
+            code = self._rng.choice(list(INJECTED_ERRORS)) if fail else None
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise ApiError(self, method, values, {}, {'error_code': code, 'error_msg': INJECTED_ERRORS[code]})
+
+    def method(self, method, values=None, raw=False):
+        values = dict(values or {})
+        self._delay_and_fail(method, values)
+        handler = getattr(self, '_' + method.replace('.', '_'))
+        response = handler(values)
+        if raw:
+            return response if 'response' in response else {'response': response}
+        return response
+
+    def get_api(self):
+        return _FakeApiMethod(self)
+
+    # Методы API
+
+    def _users_get(self, values):
+        ids = str(values.get('user_ids', '')).split(',')
+        result = []
+        for raw_id in ids:
+            user_id = int(raw_id)
+            if user_id in self._by_id:
+                result.append(self._by_id[user_id])
+                continue
+            rng = random.Random(user_id)
+            city_id, city = rng.choice(CITIES)
+            result.append({
+                'id': user_id,
+                'first_name': f'Пользователь{user_id}',
+                'last_name': 'Тестовый',
+                'sex': rng.choice((1, 2)),
+                'bdate': f'1.1.{rng.randint(1975, 2000)}',
+                'city': {'id': city_id, 'title': city},
+            })
+        return result
+
+    def _users_search(self, values):
+        sex = values.get('sex')
+        city = values.get('city')
+        year = time.localtime().tm_year
+        born_to = year - values.get('age_from', 0)
+        born_from = year - values.get('age_to', 200)
+        matches = [
+            p for p in self.profiles
+            if (not sex or p['sex'] == sex) and (not city or p['city']['id'] == city)
+            and born_from <= int(p['bdate'].rsplit('.', 1)[1]) <= born_to
+        ]
+        offset = int(values.get('offset', 0))
+        count = int(values.get('count', 20))
+        return {'count': len(matches), 'items': matches[offset:offset + count]}
+
+    def _database_getCities(self, values):
+        q = (values.get('q') or '').lower()
+        return {'count': 1, 'items': [{'id': cid, 'title': title} for cid, title in CITIES
+                                      if title.lower().startswith(q)][:int(values.get('count', 1))]}
+
+    def _photos(self, owner_id):
+        rng = random.Random(owner_id)
+        return [
+            {
+                'id': owner_id * 10 + n,
+                'owner_id': owner_id,
+                'likes': {'count': rng.randint(0, 300)},
+                'comments': {'count': rng.randint(0, 30)},
+            }
+            for n in range(rng.randint(1, 12))
+        ]
+
+    def _photos_get(self, values):
+        items = self._photos(int(values['owner_id']))
+        offset = int(values.get('offset', 0))
+        return {'count': len(items), 'items': items[offset:offset + int(values.get('count', 50))]}
+
+    def _execute(self, values):
+        # Пакетный photos.get (или только число фото): владельцы перечислены в коде VKScript
+        code = values['code']
+        owners = [int(part.split(',', 1)[0]) for part in code.split('"owner_id": ')[1:]]
+        counts_only = ').count' in code
+        items = []
+        errors = []
+        for owner_id in owners:
+            if self._rng.random() < 0.05:
+                items.append(False)
+                errors.append({'method': 'photos.get', 'error_code': 30, 'error_msg': 'This profile is private'})
+            else:
+                photos = self._photos(owner_id)
+                items.append(len(photos) if counts_only else {'count': len(photos), 'items': photos})
+        response = {'response': items}
+        if errors:
+            response['execute_errors'] = errors
+        return response
+
+    def _messages_send(self, values):
+        if self.on_send:
+            self.on_send(values['user_id'], values)
+        return 1
+
+
+class _FakeApiMethod:
+    """Аналог vk_api.VkApiMethod: vk.messages.send(...) -> method('messages.send', {...})"""
+
+    def __init__(self, vk, name=None):
+        self._vk = vk
+        self._name = name
+
+    def __getattr__(self, name):
+        return _FakeApiMethod(self._vk, f'{self._name}.{name}' if self._name else name)
+
+    def __call__(self, **kwargs):
+        return self._vk.method(self._name, kwargs)
+
+
+class FakeVKService:
+    """Поддельный VKService поверх FakeVkApi (тот же интерфейс, что у BatchVKService)"""
+
+    def __init__(self, vk):
+        from photo_ranking import PhotoRanker
+        from profiles import ProfileBatcher
+
+        self.vk = vk
+        self.photo_ranker = PhotoRanker(vk)
+        self.profiles = ProfileBatcher(vk)
+
+    def get_user_info(self, user_id):
+        return self.profiles.get(user_id)
+
+    def get_popular_photos(self, owner_id):
+        return self.photo_ranker.get_popular_photos(owner_id)
+
+    def get_popular_photos_many(self, owner_ids):
+        return self.photo_ranker.get_popular_photos_many(owner_ids)
+
+    def search_people(self, user_info):
+        return self.vk.method('users.search', {'count': 100})['items']
+
+
+class FakeEvent:
+    """Событие long poll с полями vk_api.longpoll.Event"""
+
+    __slots__ = ('type', 'user_id', 'text', 'to_me', 'timestamp', 'created')
+
+    def __init__(self, user_id, text):
+        self.type = VkEventType.MESSAGE_NEW
+        self.user_id = user_id
+        self.text = text
+        self.to_me = True
+        self.timestamp = int(time.time())
+        self.created = time.perf_counter()
+
+
+class FakeLongPoll:
+    """
+    Источник событий long poll.
+    События подаются с частотой rate в секунду (0 - без ограничения);
+    listen() завершается, когда события закончились.
+    """
+
+    def __init__(self, texts, rate=0.0, on_event=None):
+        self.texts = texts
+        self.rate = rate
+        self.on_event = on_event
+
+    def listen(self):
+        interval = 1.0 / self.rate if self.rate else 0
+        started = time.perf_counter()
+        for i, (user_id, text) in enumerate(self.texts):
+            if interval:
+                wait = started + i * interval - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+            event = FakeEvent(user_id, text)
+            if self.on_event:
+                self.on_event(event)
+            yield event
+
+
+class SqliteDatabase:
+    """Замена Database на SQLite в памяти (те же методы, что вызывает бот)"""
+
+    def __init__(self, path=':memory:'):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.executescript("""
+            CREATE TABLE users (
+                user_id INTEGER PRIMARY KEY, first_name TEXT, last_name TEXT,
+                age INTEGER, city TEXT, country TEXT, sex INTEGER
+            );
+            CREATE TABLE favorites (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, candidate_id INTEGER,
+                first_name TEXT, last_name TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (user_id, candidate_id)
+            );
+            CREATE INDEX favorites_user_created_id_idx ON favorites (user_id, created_at, id);
+            CREATE TABLE blacklist (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, candidate_id INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (user_id, candidate_id)
+            );
+        """)
+
+    def _execute(self, sql, params=(), fetch=False):
+        with self._lock:
+            cur = self.conn.execute(sql, params)
+            rows = cur.fetchall() if fetch else None
+            self.conn.commit()
+            return rows, cur.rowcount
+
+    def add_user(self, user_info):
+        self._execute(
+            "INSERT OR REPLACE INTO users (user_id, first_name, last_name, age, city, sex) VALUES (?, ?, ?, ?, ?, ?)",
+            (user_info['user_id'], user_info['first_name'], user_info['last_name'],
+             user_info.get('age'), user_info.get('city'), user_info.get('sex'))
+        )
+
+    def get_user(self, user_id):
+        rows, _ = self._execute(
+            "SELECT user_id, first_name, last_name, age, city, sex FROM users WHERE user_id = ?",
+            (user_id,), fetch=True
+        )
+        if not rows:
+            return None
+        keys = ('user_id', 'first_name', 'last_name', 'age', 'city', 'sex')
+        return dict(zip(keys, rows[0]))
+
+    def update_user_sex(self, user_id, sex):
+        self._execute("UPDATE users SET sex = ? WHERE user_id = ?", (sex, user_id))
+
+    def update_user_age(self, user_id, age):
+        self._execute("UPDATE users SET age = ? WHERE user_id = ?", (age, user_id))
+
+    def update_user_city(self, user_id, city):
+        self._execute("UPDATE users SET city = ? WHERE user_id = ?", (city, user_id))
+
+    def add_to_favorites(self, user_id, candidate_id, first_name, last_name):
+        _, count = self._execute(
+            "INSERT OR IGNORE INTO favorites (user_id, candidate_id, first_name, last_name) VALUES (?, ?, ?, ?)",
+            (user_id, candidate_id, first_name, last_name)
+        )
+        return count > 0
+
+    def add_to_blacklist(self, user_id, candidate_id):
+        self._execute("INSERT OR IGNORE INTO blacklist (user_id, candidate_id) VALUES (?, ?)",
+                      (user_id, candidate_id))
+
+    def get_favorites(self, user_id):
+        rows, _ = self._execute(
+            "SELECT candidate_id, first_name, last_name FROM favorites WHERE user_id = ? ORDER BY created_at, id",
+            (user_id,), fetch=True
+        )
+        return [{'candidate_id': r[0], 'first_name': r[1], 'last_name': r[2]} for r in rows]
+
+    def get_blacklist(self, user_id):
+        rows, _ = self._execute("SELECT candidate_id FROM blacklist WHERE user_id = ?", (user_id,), fetch=True)
+        return [{'candidate_id': r[0]} for r in rows]
+
+    def get_favorites_page(self, user_id, after=None, before=None, limit=10):
+        columns = "SELECT id, candidate_id, first_name, last_name, created_at FROM favorites WHERE user_id = ?"
+        if before is not None:
+            sql = f"{columns} AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT ?"
+            params = (user_id, before[0], before[1], limit + 1)
+        elif after is not None:
+            sql = f"{columns} AND (created_at, id) > (?, ?) ORDER BY created_at, id LIMIT ?"
+            params = (user_id, after[0], after[1], limit + 1)
+        else:
+            sql, params = f"{columns} ORDER BY created_at, id LIMIT ?", (user_id, limit + 1)
+        rows, _ = self._execute(sql, params, fetch=True)
+        keys = ('id', 'candidate_id', 'first_name', 'last_name', 'created_at')
+        favorites = [dict(zip(keys, row)) for row in rows[:limit]]
+        if before is not None:
+            favorites.reverse()
+        return favorites, len(rows) > limit
+
+    def count_favorites(self, user_id):
+        rows, _ = self._execute("SELECT count(*) FROM favorites WHERE user_id = ?", (user_id,), fetch=True)
+        return rows[0][0]
+
+    def clear_favorites(self, user_id):
+        self._execute("DELETE FROM favorites WHERE user_id = ?", (user_id,))
+
+    def close(self):
+        self.conn.close()
+
+
+class ReplyTracker:
+    """
+    Задержка ответа: время от появления события до отправки ответа пользователю.
+    Отправка сообщения пользователю завершает все его события, пришедшие раньше.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.replies = 0
+
+    def on_event(self, event):
+        with self._lock:
+            self._pending.setdefault(event.user_id, queue.SimpleQueue()).put(event.created)
+
+    def on_send(self, user_id, params):
+        now = time.perf_counter()
+        with self._lock:
+            self.replies += 1
+            pending = self._pending.get(user_id)
+            while pending is not None and not pending.empty():
+                self.latencies.append(now - pending.get())
@@ -0,0 +1,144 @@
+"""
+Нагрузочный тест VKinder на поддельном VK API и SQLite вместо PostgreSQL
+
+Каждый пользователь проходит сценарий: старт -> поиск -> N раз "следующий",
+между показами ставит лайки и дизлайки. Сценарии тысяч пользователей
+перемешиваются в один поток событий long poll.
+
+Запуск: python benchmarks/run_load.py [--users 2000] [--swipes 10] [--workers 8] [--latency 0.05]
+"""
+
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_vk import FakeLongPoll, FakeVKService, FakeVkApi, ReplyTracker, SqliteDatabase  # noqa: E402
+from log_setup import setup_logging  # noqa: E402
+from main import VKinderBot  # noqa: E402
+from outbound import TokenBucket  # noqa: E402
+from vk_executor import resilient  # noqa: E402
+
+
+def make_trace(users, swipes, like_rate=0.3, dislike_rate=0.2, spam_rate=0.0, seed=7):
+    """
+    Перемешанные сценарии пользователей: список (user_id, текст).
+    spam_rate - доля переходов, которые пользователь нажимает 2-5 раз подряд.
+    """
+    rng = random.Random(seed)
+    scripts = []
+    for user_id in range(1, users + 1):
+        script = ['начать', 'поиск']
+        for _ in range(swipes):
+            roll = rng.random()
+            if roll < like_rate:
+                script.append('в избранное')
+            elif roll < like_rate + dislike_rate:
+                script.append('в черный список')
+            script.append('следующий')
+            if rng.random() < spam_rate:
+                script.extend(['следующий'] * rng.randint(1, 4))
+        scripts.append((user_id, script))
+
+    # Берём следующее событие у случайного пользователя, сохраняя порядок внутри сценария
+    trace = []
+    active = [[user_id, script, 0] for user_id, script in scripts]
+    while active:
+        i = rng.randrange(len(active))
+        user_id, script, pos = active[i]
+        trace.append((user_id, script[pos]))
+        active[i][2] += 1
+        if active[i][2] == len(script):
+            active[i] = active[-1]
+            active.pop()
+    return trace
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000, help='число пользователей')
+    parser.add_argument('--swipes', type=int, default=10, help='сколько кандидатов листает каждый')
+    parser.add_argument('--workers', type=int, default=8, help='потоков обработки (0 - последовательно)')
+    parser.add_argument('--latency', type=float, default=0.02, help='задержка ответа VK API, с')
+    parser.add_argument('--jitter', type=float, default=0.01, help='случайная добавка к задержке, с')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='доля вызовов VK API с ошибкой')
+    parser.add_argument('--event-rate', type=float, default=0.0,
+                        help='входящих событий в секунду (0 - как можно быстрее)')
+    parser.add_argument('--send-rate', type=float, default=10000.0,
+                        help='лимит исходящих сообщений в секунду')
+    parser.add_argument('--coalesce', type=float, default=0.0, help='окно склейки исходящих сообщений, с')
+    parser.add_argument('--prefetch', type=int, default=3, help='глубина предзагрузки фото')
+    parser.add_argument('--spam', type=float, default=0.0,
+                        help='доля нажатий «Следующий», повторённых 2-5 раз подряд')
+    parser.add_argument('--population', type=int, default=5000, help='число анкет в поддельном поиске')
+    parser.add_argument('--tracemalloc', action='store_true', help='считать память через tracemalloc (медленнее)')
+    parser.add_argument('--log-level', default='CRITICAL', help='уровень логирования бота')
+    parser.add_argument('--log-file', default='', help="файл лога бота ('' - только консоль)")
+    args = parser.parse_args()
+
+    # Логирование как у бота (main.py), по умолчанию без файла лога
+    setup_logging(level=args.log_level.upper(), log_file=args.log_file or None)
+
+    trace = make_trace(args.users, args.swipes, spam_rate=args.spam)
+    tracker = ReplyTracker()
+
+    vk_session = FakeVkApi(latency=0, on_send=tracker.on_send)
+    fake_vk = FakeVkApi(population=args.population, latency=args.latency, jitter=args.jitter,
+                         error_rate=args.error_rate)
+    # Та же политика выполнения запросов, что и у бота: лимит параллельности, повторы, выключатель
+    user_session = resilient(fake_vk, 'user')
+    longpoll = FakeLongPoll(trace, rate=args.event_rate, on_event=tracker.on_event)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    bot = VKinderBot(
+        prefetch_depth=args.prefetch,
+        coalesce_window=args.coalesce,
+        vk_session=vk_session,
+        user_session=user_session,
+        db=SqliteDatabase(),
+        vk_service=FakeVKService(user_session),
+        longpoll=longpoll,
+    )
+    bot.outbound.bucket = TokenBucket(args.send_rate, args.send_rate)
+
+    started = time.perf_counter()
+    bot.run(workers=args.workers)
+    elapsed = time.perf_counter() - started
+
+    latencies = tracker.latencies
+    print(f"пользователей:         {args.users}")
+    print(f"событий:               {len(trace)}")
+    print(f"время:                 {elapsed:.2f} с")
+    print(f"событий в секунду:     {len(trace) / elapsed:.0f}")
+    print(f"ответов:               {tracker.replies}")
+    print(f"задержка ответа p50:   {percentile(latencies, 0.5) * 1000:.1f} мс")
+    print(f"задержка ответа p99:   {percentile(latencies, 0.99) * 1000:.1f} мс")
+    print(f"без ответа:            {len(trace) - len(latencies)} событий")
+    print(f"вызовов VK API:        {dict(sorted(fake_vk.calls.items()))}")
+    print(f"предобработка событий: {bot.preprocessor.stats()}")
+    print(f"пакеты users.get:      {bot.vk_service.profiles.stats()}")
+    print(f"выполнение запросов:   {user_session.stats()}")
+    print(f"сессий в памяти:       {bot.user_states.stats()}")
+    if args.tracemalloc:
+        current, peak = tracemalloc.get_traced_memory()
+        print(f"память (tracemalloc):  {current / 2 ** 20:.1f} МБ, пик {peak / 2 ** 20:.1f} МБ")
+    # ru_maxrss в Linux - в килобайтах
+    print(f"пиковый RSS:           {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} МБ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""
+Кэш ответов VK API
+TTL для каждого метода, вытеснение LRU, кэширование отрицательных ответов
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from vk_executor import VkUnavailable, outage_tracker
+
+logger = logging.getLogger(__name__)
+
+# Время жизни записей по методам (секунды)
+DEFAULT_TTLS = {
+    'get_user_info': 600,
+    'get_popular_photos': 1800,
+}
+# Время жизни отрицательных ответов (закрытый/удалённый профиль, нет данных)
+DEFAULT_NEGATIVE_TTL = 300
+# Сколько ещё хранить устаревшие записи: их отдаём, пока VK недоступен
+DEFAULT_STALE_TTL = 3600
+# Ограничения кэша в памяти
+DEFAULT_MAX_ENTRIES = 50000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Признак отсутствия записи в кэше
+MISSING = object()
+# Значение, которым в кэше помечаются отрицательные ответы
+NEGATIVE = '__negative__'
+
+
+def _encode(value):
+    """Значение кэша в байтах (JSON: файл кэша общий для процессов, и чтение не должно выполнять код)"""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _decode(blob):
+    return json.loads(blob)
+
+
+class MemoryCacheBackend:
+    """Хранилище кэша в памяти процесса: LRU с ограничением по числу записей и объёму"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        """Значение по ключу или MISSING"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISSING
+
+            expires_at, value, size = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self._bytes -= size
+                return MISSING
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        """Сохранение значения на ttl секунд"""
+        size = len(_encode(value))
+
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+
+            self._data[key] = (time.monotonic() + ttl, value, size)
+            self._bytes += size
+
+            # Вытесняем давно не использованные записи
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, _, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[2]
+
+    def size(self):
+        """Число записей и занятый объём (байт)"""
+        with self._lock:
+            return len(self._data), self._bytes
+
+
+class SqliteCacheBackend:
+    """
+    Хранилище кэша в файле SQLite.
+    Один файл могут использовать несколько процессов бота на одной машине.
+    """
+
+    def __init__(self, path='vkinder_cache.sqlite3', max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                expires_at REAL NOT NULL,
+                used_at REAL NOT NULL,
+                value BLOB NOT NULL
+            )
+        """)
+        self._conn.commit()
+        self._writes = 0
+
+    def __getstate__(self):
+        # В другой процесс (режим --shards) передаются только настройки, соединение открывается заново
+        return {'path': self.path, 'max_entries': self.max_entries}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['max_entries'])
+
+    def get(self, key):
+        """Значение по ключу или MISSING"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT expires_at, value FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return MISSING
+
+            if row[0] < now:
+                self._conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+                self._conn.commit()
+                return MISSING
+
+            try:
+                value = _decode(row[1])
+            except ValueError:
+                # Запись не в JSON (например, из версии с pickle) - считаем её отсутствующей
+                self._conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+                self._conn.commit()
+                return MISSING
+
+            self._conn.execute('UPDATE cache SET used_at = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+            return value
+
+    def set(self, key, value, ttl):
+        """Сохранение значения на ttl секунд"""
+        now = time.time()
+        blob = _encode(value)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO cache (key, expires_at, used_at, value) VALUES (?, ?, ?, ?)',
+                (key, now + ttl, now, blob)
+            )
+            self._writes += 1
+            # Периодически удаляем устаревшие и лишние записи
+            if self._writes % 1000 == 0:
+                self._prune(now)
+            self._conn.commit()
+
+    def _prune(self, now):
+        self._conn.execute('DELETE FROM cache WHERE expires_at < ?', (now,))
+        count = self._conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        extra = count - self.max_entries
+        if extra > 0:
+            self._conn.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY used_at LIMIT ?)',
+                (extra,)
+            )
+            self.evictions += extra
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+            self._conn.commit()
+
+    def size(self):
+        """Число записей и занятый объём (байт)"""
+        with self._lock:
+            row = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache').fetchone()
+            return row[0], row[1]
+
+
+class CachedVKService:
+    """
+    Кэширующая обёртка над VKService.
+
+    Кэшируются get_user_info, get_popular_photos и get_popular_photos_many
+    (записи общие с get_popular_photos). Пустые ответы (закрытый или удалённый
+    профиль) кэшируются отдельно на negative_ttl. Остальные методы вызываются
+    напрямую.
+
+    Устаревшая запись хранится ещё stale_ttl секунд: если VK недоступен
+    (см. vk_executor), отдаётся она, а ответ, полученный во время сбоя,
+    в кэш не попадает.
+    """
+
+    def __init__(self, service, backend=None, ttls=None, negative_ttl=DEFAULT_NEGATIVE_TTL,
+                 stale_ttl=DEFAULT_STALE_TTL):
+        self.service = service
+        self.backend = backend or MemoryCacheBackend()
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+
+        self._lock = threading.Lock()
+        self.hits = {}
+        self.misses = {}
+        self.stale = {}
+
+    def __getattr__(self, name):
+        return getattr(self.service, name)
+
+    def _count(self, counters, method, n=1):
+        with self._lock:
+            counters[method] = counters.get(method, 0) + n
+
+    def _lookup(self, method, arg):
+        """
+        (значение или MISSING, свежее ли оно).
+        None - отрицательный ответ; устаревшее значение возвращается с False.
+        """
+        entry = self.backend.get(f'{method}:{arg}')
+        if entry is MISSING:
+            self._count(self.misses, method)
+            return MISSING, False
+
+        if not isinstance(entry, (tuple, list)):
+            # Запись из кэша прежнего формата (без срока свежести) считаем устаревшей;
+            # из JSON запись (срок, значение) читается списком
+            entry = (0, entry)
+        fresh_until, value = entry
+        value = None if value == NEGATIVE else value
+        if fresh_until < time.time():
+            self._count(self.misses, method)
+            return value, False
+
+        self._count(self.hits, method)
+        return value, True
+
+    def _store(self, method, arg, value):
+        ttl = self.ttls[method] if value else self.negative_ttl
+        entry = (time.time() + ttl, value if value else NEGATIVE)
+        self.backend.set(f'{method}:{arg}', entry, ttl + self.stale_ttl)
+
+    def _serve_stale(self, method, stale):
+        self._count(self.stale, method)
+        return stale
+
+    def _cached_call(self, method, arg, loader):
+        value, fresh = self._lookup(method, arg)
+        if fresh:
+            return value
+
+        stale = value
+        with outage_tracker() as outages:
+            try:
+                value = loader(arg)
+            except Exception as e:
+                # Исчерпанные повторы приходят исходной ошибкой VK, но сбой уже отмечен в outages
+                if stale is MISSING or not (outages or isinstance(e, VkUnavailable)):
+                    raise
+                return self._serve_stale(method, stale)
+
+        if outages:
+            # VKService перехватил ошибку сам - его ответ не кэшируем
+            return value if stale is MISSING else self._serve_stale(method, stale)
+        self._store(method, arg, value)
+        return value
+
+    def get_user_info(self, user_id):
+        """Информация о пользователе (с кэшем)"""
+        return self._cached_call('get_user_info', user_id, self.service.get_user_info)
+
+    def get_popular_photos(self, owner_id):
+        """Популярные фото пользователя (с кэшем)"""
+        photos = self._cached_call('get_popular_photos', owner_id, self.service.get_popular_photos)
+        return photos or []
+
+    def get_popular_photos_many(self, owner_ids):
+        """Популярные фото многих пользователей: из VK запрашиваются только отсутствующие в кэше"""
+        result = {}
+        missing = []
+        stale = {}
+        for owner_id in owner_ids:
+            photos, fresh = self._lookup('get_popular_photos', owner_id)
+            if fresh:
+                result[owner_id] = photos or []
+                continue
+            missing.append(owner_id)
+            if photos is not MISSING:
+                stale[owner_id] = photos or []
+
+        if missing:
+            with outage_tracker() as outages:
+                try:
+                    fetched = self.service.get_popular_photos_many(missing)
+                except Exception as e:
+                    if not (outages or isinstance(e, VkUnavailable)):
+                        raise
+                    outages.append('get_popular_photos_many')
+                    fetched = dict.fromkeys(missing)
+            for owner_id in missing:
+                photos = fetched.get(owner_id)
+                if outages and photos is None:
+                    # Пакет не загрузился из-за сбоя VK - отдаём прежние фото, если они есть
+                    if owner_id in stale:
+                        result[owner_id] = self._serve_stale('get_popular_photos', stale[owner_id])
+                    continue
+                if owner_id in fetched:
+                    self._store('get_popular_photos', owner_id, photos)
+                    result[owner_id] = photos
+
+        return result
+
+    def invalidate(self, method, arg):
+        """Удаление записи из кэша"""
+        self.backend.delete(f'{method}:{arg}')
+
+    def stats(self):
+        """Статистика попаданий и промахов"""
+        entries, size = self.backend.size()
+        with self._lock:
+            return {
+                'hits': dict(self.hits),
+                'misses': dict(self.misses),
+                'stale': dict(self.stale),
+                'entries': entries,
+                'bytes': size,
+                'evictions': self.backend.evictions,
+            }
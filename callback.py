@@ -0,0 +1,242 @@
+"""
+Callback API VK
+HTTP-сервер принимает события от VK и отдаёт их боту вместо long poll
+"""
+
+import hmac
+import json
+import logging
+import queue
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from vk_api.longpoll import VkEventType
+
+logger = logging.getLogger(__name__)
+
+# Глубина очереди принятых, но ещё не обработанных событий
+DEFAULT_CALLBACK_QUEUE_SIZE = 10000
+# Сколько event_id помнить для отсева повторных доставок
+SEEN_EVENTS = 10000
+# Максимальный размер тела запроса (байт)
+MAX_BODY_SIZE = 1024 * 1024
+# Диалоги с беседами имеют peer_id больше этого значения
+CHAT_PEER_OFFSET = 2000000000
+
+# Маркер остановки для listen()
+_STOP = object()
+
+
+class CallbackEvent:
+    """Событие message_new Callback API с полями события long poll"""
+
+    __slots__ = ('type', 'to_me', 'user_id', 'text', 'timestamp', 'payload', 'event_id')
+
+    def __init__(self, user_id, text, timestamp=None, payload=None, event_id=None):
+        self.type = VkEventType.MESSAGE_NEW
+        self.to_me = True
+        self.user_id = user_id
+        self.text = text
+        self.timestamp = timestamp
+        self.payload = payload
+        self.event_id = event_id
+
+    @classmethod
+    def from_update(cls, update):
+        """Событие из тела запроса VK; None для всего, кроме личных сообщений боту"""
+        if update.get('type') != 'message_new':
+            return None
+
+        obj = update.get('object') or {}
+        # С версии API 5.103 сообщение вложено в object.message
+        message = obj.get('message', obj)
+        if message.get('out'):
+            return None
+
+        user_id = message.get('from_id') or message.get('user_id')
+        peer_id = message.get('peer_id', user_id)
+        if not user_id or peer_id >= CHAT_PEER_OFFSET:
+            return None
+
+        return cls(
+            user_id=user_id,
+            text=message.get('text') or message.get('body') or '',
+            timestamp=message.get('date'),
+            payload=message.get('payload'),
+            event_id=update.get('event_id'),
+        )
+
+
+class CallbackServer:
+    """
+    Сервер Callback API.
+
+    Интерфейс совпадает с VkLongPoll: listen() отдаёт события по одному,
+    поэтому бот обрабатывает их тем же конвейером. На каждый запрос VK
+    сервер сразу отвечает "ok", а событие кладёт в очередь. При
+    переполненной очереди отвечает 503 - VK повторит доставку позже.
+
+    confirmation - строка подтверждения адреса сервера из настроек группы
+    secret - секретный ключ (если задан, запросы без него отклоняются)
+    group_id - принимать события только этой группы
+    """
+
+    def __init__(self, confirmation, secret=None, group_id=None, host='0.0.0.0', port=8080, path='/',
+                 queue_size=DEFAULT_CALLBACK_QUEUE_SIZE):
+        self.confirmation = confirmation
+        self.secret = secret
+        self.group_id = group_id
+        self.path = path
+        self._events = queue.Queue(maxsize=queue_size)
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+        # Статистика
+        self.accepted = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.overflows = 0
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _is_duplicate(self, event_id):
+        """Повторная доставка того же события (VK повторяет, если не получил "ok" вовремя)"""
+        if not event_id:
+            return False
+        with self._lock:
+            if event_id in self._seen:
+                return True
+            self._seen[event_id] = True
+            if len(self._seen) > SEEN_EVENTS:
+                self._seen.popitem(last=False)
+            return False
+
+    def handle_update(self, update):
+        """
+        Обработка одного запроса VK.
+        Возвращает (HTTP-код, тело ответа).
+        """
+        if not isinstance(update, dict):
+            self._count('rejected')
+            return 400, 'bad request'
+
+        if self.group_id and update.get('group_id') != self.group_id:
+            self._count('rejected')
+            logger.warning(f"Callback API: событие чужой группы {update.get('group_id')}")
+            return 403, 'forbidden'
+
+        if update.get('type') == 'confirmation':
+            return 200, self.confirmation
+
+        if self.secret and not hmac.compare_digest(str(update.get('secret', '')), self.secret):
+            self._count('rejected')
+            logger.warning("Callback API: неверный секретный ключ")
+            return 403, 'forbidden'
+
+        event = CallbackEvent.from_update(update)
+        if event is None:
+            # Остальные типы событий боту не нужны, но VK ждёт подтверждения
+            return 200, 'ok'
+
+        if self._is_duplicate(event.event_id):
+            self._count('duplicates')
+            return 200, 'ok'
+
+        try:
+            self._events.put_nowait(event)
+        except queue.Full:
+            self._count('overflows')
+            with self._lock:
+                self._seen.pop(event.event_id, None)
+            logger.error(f"Callback API: очередь переполнена, событие от {event.user_id} вернётся повтором")
+            return 503, 'busy'
+
+        self._count('accepted')
+        return 200, 'ok'
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path.split('?', 1)[0] != server.path:
+                    self._reply(404, 'not found')
+                    return
+
+                length = int(self.headers.get('Content-Length') or 0)
+                if length > MAX_BODY_SIZE:
+                    self._reply(413, 'too large')
+                    return
+
+                try:
+                    update = json.loads(self.rfile.read(length))
+                except ValueError:
+                    server._count('rejected')
+                    self._reply(400, 'bad request')
+                    return
+
+                status, body = server.handle_update(update)
+                self._reply(status, body)
+
+            def _reply(self, status, body):
+                data = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/plain; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='vkinder-callback', daemon=True)
+        self._thread.start()
+        logger.info(f"Callback API слушает http://{self.httpd.server_address[0]}:{self.port}{self.path}")
+
+    def listen(self):
+        """События message_new по мере поступления (как VkLongPoll.listen)"""
+        self.start()
+        try:
+            while True:
+                event = self._events.get()
+                if event is _STOP:
+                    return
+                yield event
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Остановка приёма событий; listen() завершится после уже принятых событий"""
+        if not self._thread:
+            return
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self._thread = None
+        try:
+            self._events.put_nowait(_STOP)
+        except queue.Full:
+            pass
+
+    def stats(self):
+        return {
+            'accepted': self.accepted,
+            'duplicates': self.duplicates,
+            'rejected': self.rejected,
+            'overflows': self.overflows,
+            'pending': self._events.qsize(),
+        }
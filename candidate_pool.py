@@ -0,0 +1,194 @@
+"""
+Общий пул кандидатов
+Результаты поиска по одинаковым параметрам загружаются один раз и используются всеми пользователями
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from candidate_search import CandidateCursor, PagedCursor, params_key, AGE_RANGE, DEFAULT_PAGE_SIZE, \
+    FIRST_PAGE_SIZE
+from session_store import CandidateRecord
+from vk_executor import VkUnavailable, outage_tracker
+
+logger = logging.getLogger(__name__)
+
+# Время жизни результатов поиска в пуле (секунды)
+DEFAULT_POOL_TTL = 10 * 60
+# Сколько разных наборов параметров держать в пуле
+DEFAULT_MAX_KEYS = 2000
+
+
+def pool_key(user_info):
+    """
+    Ключ пула: точные параметры users.search (пол, возраст от и до, город).
+    Общий пул получают только пользователи, для которых поиск был бы тем же самым.
+    """
+    return params_key(user_info)
+
+
+def representative(key):
+    """Параметры пользователя, для которых search_params даёт поиск с ключом key"""
+    sex, age_from, age_to, city = key
+    return {
+        'sex': 3 - sex if sex else None,
+        # age_from мог упереться в 18, поэтому возраст восстанавливаем по age_to
+        'age': age_to - AGE_RANGE if age_to else None,
+        'city': city,
+    }
+
+
+class PoolEntry:
+    """
+    Результаты поиска для одного набора параметров, догружаются по мере надобности.
+    previous - устаревшая запись с теми же параметрами: если VK недоступен
+    с первого же запроса, запись продолжает её результаты.
+    """
+
+    def __init__(self, session, key, page_size=DEFAULT_PAGE_SIZE, city_resolver=None, previous=None):
+        self.key = key
+        self.cursor = CandidateCursor(session, representative(key), page_size=page_size,
+                                      city_resolver=city_resolver)
+        self.candidates = []
+        self.created_at = time.monotonic()
+        self.previous = previous
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self):
+        return self.cursor.exhausted
+
+    def _adopt_previous(self):
+        """Результаты устаревшей записи вместо новых (под блокировкой записи)"""
+        previous, self.previous = self.previous, None
+        logger.warning(f"VK недоступен, пул {self.key} отдаёт прошлые результаты поиска")
+        self.candidates.extend(previous.candidates)
+        self.cursor = previous.cursor
+        # Запись остаётся устаревшей: после восстановления VK поиск начнётся заново
+        self.created_at = previous.created_at
+
+    def ensure(self, needed):
+        """
+        Догрузка, пока в пуле меньше needed кандидатов.
+        Запросы к VK выполняет только один поток, остальные ждут его результат.
+        """
+        if len(self.candidates) >= needed or self.cursor.exhausted:
+            return
+
+        with self._lock:
+            while len(self.candidates) < needed and not self.cursor.exhausted:
+                count = min(self.cursor.page_size, max(FIRST_PAGE_SIZE, needed - len(self.candidates)))
+                try:
+                    with outage_tracker() as outages:
+                        page = self.cursor.next_page(count)
+                except Exception as e:
+                    unavailable = outages or isinstance(e, VkUnavailable)
+                    if not unavailable or self.previous is None or self.candidates:
+                        raise
+                    self._adopt_previous()
+                    return
+                # VK ответил - прошлые результаты больше не понадобятся
+                self.previous = None
+                # Список только растёт, поэтому читатели обходятся без блокировки
+                self.candidates.extend(CandidateRecord.from_dict(c) for c in page)
+
+
+class PoolCursor(PagedCursor):
+    """
+    Курсор пользователя по общему пулу.
+    Интерфейс совпадает с CandidateCursor: next_page(), exhausted, key, resume_offset(), position(), seek().
+    rank(candidates) -> candidates упорядочивает каждую порцию под пользователя.
+    """
+
+    def __init__(self, entry, offset=0, page_size=DEFAULT_PAGE_SIZE, exclude=None, rank=None):
+        super().__init__(offset)
+        self.entry = entry
+        self.key = entry.key
+        self.page_size = page_size
+        self.exclude = exclude
+        self.rank = rank
+
+    @property
+    def exhausted(self):
+        return self.entry.exhausted and self.offset >= len(self.entry.candidates)
+
+    def next_page(self, count=None):
+        """Следующая порция кандидатов пула с учётом исключений пользователя"""
+        count = count or self.page_size
+        self.entry.ensure(self.offset + count)
+
+        page_offset = self.offset
+        page = self.entry.candidates[self.offset:self.offset + count]
+        self.offset += len(page)
+
+        if self.exclude and page:
+            page = self.exclude(page)
+        if self.rank and page:
+            page = self.rank(page)
+        self._page_loaded(page_offset, len(page))
+        return page
+
+
+class CandidatePool:
+    """
+    Пул результатов поиска, общий для всех пользователей.
+
+    Ключ - нормализованные параметры поиска (pool_key). Результаты живут ttl
+    секунд, после чего следующий поиск по этому ключу начинается заново;
+    уже открытые курсоры дочитывают старые результаты.
+    city_resolver(name) -> id переводит название города в ID без запроса к VK.
+    """
+
+    def __init__(self, session, ttl=DEFAULT_POOL_TTL, max_keys=DEFAULT_MAX_KEYS, city_resolver=None):
+        self.session = session
+        self.city_resolver = city_resolver
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Статистика
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, user_info):
+        return pool_key(user_info)
+
+    def get(self, user_info):
+        """Запись пула для параметров пользователя (создаётся при первом обращении)"""
+        key = pool_key(user_info)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.created_at < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+            self.misses += 1
+            # Устаревшие результаты пригодятся, если VK сейчас недоступен
+            previous = entry
+            if previous is not None and not previous.candidates:
+                previous = previous.previous
+            entry = PoolEntry(self.session, key, city_resolver=self.city_resolver, previous=previous)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+            return entry
+
+    def cursor(self, user_info, offset=0, exclude=None, rank=None):
+        """Курсор пользователя по пулу"""
+        return PoolCursor(self.get(user_info), offset=offset, exclude=exclude, rank=rank)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'keys': len(self._entries),
+                'candidates': sum(len(e.candidates) for e in self._entries.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -0,0 +1,229 @@
+"""
+Постраничный поиск кандидатов
+Кандидаты загружаются страницами users.search по мере просмотра
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date
+
+logger = logging.getLogger(__name__)
+
+# Размер страницы поиска
+DEFAULT_PAGE_SIZE = 20
+# Размер первой страницы: чем меньше, тем быстрее пользователь увидит первого человека
+FIRST_PAGE_SIZE = 10
+# Загружаем следующую страницу, когда непросмотренных кандидатов осталось меньше
+LOOKAHEAD = 5
+# users.search не отдаёт результаты дальше первой тысячи
+MAX_SEARCH_OFFSET = 1000
+# Разброс возраста при поиске (±лет)
+AGE_RANGE = 5
+# Сколько позиций поиска помнить
+MAX_SAVED_POSITIONS = 100000
+
+SEARCH_FIELDS = 'bdate,city,sex,is_closed,last_seen,common_count,counters'
+
+
+def age_from_bdate(bdate, today=None):
+    """Возраст по дате рождения VK (Д.М.ГГГГ); None, если год не указан"""
+    if not bdate:
+        return None
+    parts = bdate.split('.')
+    if len(parts) != 3:
+        return None
+    try:
+        day, month, year = (int(p) for p in parts)
+    except ValueError:
+        return None
+    today = today or date.today()
+    return today.year - year - ((today.month, today.day) < (month, day))
+
+
+def search_params(user_info):
+    """Параметры users.search для пользователя: противоположный пол, возраст ±AGE_RANGE, город"""
+    params = {'has_photo': 1, 'fields': SEARCH_FIELDS}
+
+    sex = user_info.get('sex')
+    if sex in (1, 2):
+        params['sex'] = 3 - sex
+
+    age = user_info.get('age')
+    if age:
+        params['age_from'] = max(18, age - AGE_RANGE)
+        params['age_to'] = age + AGE_RANGE
+
+    return params
+
+
+def params_key(user_info):
+    """Нормализованный ключ параметров поиска"""
+    params = search_params(user_info)
+    return (params.get('sex'), params.get('age_from'), params.get('age_to'),
+            (user_info.get('city') or '').strip().lower())
+
+
+def to_candidate(profile, today=None):
+    """Кандидат из профиля users.search или users.get (None для закрытых профилей)"""
+    if profile.get('is_closed') and not profile.get('can_access_closed'):
+        return None
+    if profile.get('deactivated'):
+        return None
+
+    city = profile.get('city')
+    return {
+        'id': profile['id'],
+        'first_name': profile.get('first_name', ''),
+        'last_name': profile.get('last_name', ''),
+        'age': age_from_bdate(profile.get('bdate'), today),
+        'city': city.get('title') if isinstance(city, dict) else city,
+        'last_seen': (profile.get('last_seen') or {}).get('time'),
+        'common_count': profile.get('common_count'),
+        'photos_count': (profile.get('counters') or {}).get('photos'),
+    }
+
+
+class PagedCursor:
+    """
+    Общая часть курсоров поиска: где в источнике (поиске или пуле) начиналась
+    каждая загруженная страница. По этим началам считается, откуда продолжить
+    поиск, и сохраняется позиция курсора вне процесса.
+    """
+
+    def __init__(self, offset=0):
+        self.offset = offset
+        # (индекс первого кандидата страницы в буфере, смещение страницы в источнике)
+        self._page_starts = []
+        self._buffered = 0
+
+    def _page_loaded(self, page_offset, count):
+        """Учёт страницы из count кандидатов, прочитанной со смещения page_offset"""
+        if count:
+            self._page_starts.append((self._buffered, page_offset))
+            self._buffered += count
+
+    def resume_offset(self, index):
+        """Смещение в источнике, с которого надо продолжить, если показан кандидат index"""
+        offset = self._page_starts[0][1] if self._page_starts else self.offset
+        for first_index, page_offset in self._page_starts:
+            if first_index > index:
+                break
+            offset = page_offset
+        return offset
+
+    def position(self):
+        """Позиция курсора (смещение и начала загруженных страниц) для сохранения вне процесса"""
+        return self.offset, list(self._page_starts), self._buffered
+
+    def seek(self, position):
+        """Продолжение с позиции, сохранённой position()"""
+        self.offset, page_starts, self._buffered = position
+        self._page_starts = [tuple(start) for start in page_starts]
+
+
+class CandidateCursor(PagedCursor):
+    """
+    Курсор по результатам users.search.
+
+    Каждый вызов next_page() запрашивает одну страницу со следующего смещения.
+    Позиция (offset) сохраняется, чтобы новый поиск мог продолжить с того же места.
+    exclude(candidates) -> candidates убирает из страницы неподходящих кандидатов,
+    rank(candidates) -> candidates упорядочивает страницу,
+    city_resolver(name) -> id находит ID города без запроса к VK (см. cities.CityIndex).
+    """
+
+    def __init__(self, session, user_info, offset=0, page_size=DEFAULT_PAGE_SIZE, exclude=None, rank=None,
+                 city_resolver=None):
+        super().__init__(offset)
+        self.session = session
+        self.user_info = user_info
+        self.city_resolver = city_resolver
+        self.exclude = exclude
+        self.rank = rank
+        self.key = params_key(user_info)
+        self.page_size = page_size
+        self.exhausted = False
+        self._city_id = None
+
+    def _resolve_city_id(self):
+        """ID города VK по названию из настроек пользователя"""
+        if self.user_info.get('city_id'):
+            return self.user_info['city_id']
+        city = (self.user_info.get('city') or '').strip()
+        if not city:
+            return None
+        if self._city_id is None and self.city_resolver:
+            self._city_id = self.city_resolver(city) or 0
+        if self._city_id is None:
+            response = self.session.method('database.getCities', {
+                'country_id': 1,
+                'q': city,
+                'count': 1
+            })
+            items = response.get('items') or []
+            self._city_id = items[0]['id'] if items else 0
+        return self._city_id or None
+
+    def next_page(self, count=None):
+        """Следующая страница кандидатов (пустой список, если результаты закончились)"""
+        if self.exhausted:
+            return []
+
+        count = count or self.page_size
+        count = min(count, MAX_SEARCH_OFFSET - self.offset)
+        if count <= 0:
+            self.exhausted = True
+            return []
+
+        params = search_params(self.user_info)
+        params.update({'offset': self.offset, 'count': count})
+        city_id = self._resolve_city_id()
+        if city_id:
+            params['city'] = city_id
+
+        response = self.session.method('users.search', params)
+        items = response.get('items') or []
+
+        page_offset = self.offset
+        self.offset += len(items)
+        if not items or self.offset >= min(response.get('count', 0), MAX_SEARCH_OFFSET):
+            self.exhausted = True
+
+        today = date.today()
+        candidates = [c for c in (to_candidate(p, today) for p in items) if c]
+        if self.exclude and candidates:
+            candidates = self.exclude(candidates)
+        if self.rank and candidates:
+            candidates = self.rank(candidates)
+        self._page_loaded(page_offset, len(candidates))
+        return candidates
+
+
+class SearchPositions:
+    """Сохранённые позиции поиска пользователей (ограниченный LRU)"""
+
+    def __init__(self, max_size=MAX_SAVED_POSITIONS):
+        self.max_size = max_size
+        self._positions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, key):
+        """Смещение для продолжения поиска с теми же параметрами"""
+        with self._lock:
+            saved = self._positions.get(user_id)
+            if saved is None or saved[0] != key:
+                return 0
+            self._positions.move_to_end(user_id)
+            return saved[1]
+
+    def save(self, user_id, key, offset):
+        with self._lock:
+            self._positions[user_id] = (key, offset)
+            self._positions.move_to_end(user_id)
+            while len(self._positions) > self.max_size:
+                self._positions.popitem(last=False)
+
+    def reset(self, user_id):
+        with self._lock:
+            self._positions.pop(user_id, None)
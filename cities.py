@@ -0,0 +1,240 @@
+"""
+Справочник городов
+Название города -> ID города VK: точный поиск, подсказки по началу названия и исправление опечаток
+"""
+
+import bisect
+import difflib
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Крупные города России с ID VK - доступны без обращения к API
+BUNDLED_CITIES = {
+    1: 'Москва',
+    2: 'Санкт-Петербург',
+    99: 'Новосибирск',
+    49: 'Екатеринбург',
+    60: 'Казань',
+    95: 'Нижний Новгород',
+    158: 'Челябинск',
+    123: 'Самара',
+    104: 'Омск',
+    119: 'Ростов-на-Дону',
+    151: 'Уфа',
+    73: 'Красноярск',
+    42: 'Воронеж',
+    110: 'Пермь',
+    10: 'Волгоград',
+    72: 'Краснодар',
+    125: 'Саратов',
+    147: 'Тюмень',
+    144: 'Тольятти',
+    56: 'Ижевск',
+}
+# Файл с городами, найденными через database.getCities
+CITY_CACHE_FILE = 'vkinder_cities.json'
+# Страна поиска (Россия)
+COUNTRY_ID = 1
+# Насколько похожим должно быть название, чтобы считать его опечаткой (0..1)
+TYPO_CUTOFF = 0.8
+# Сколько вариантов предлагать
+SUGGESTIONS = 5
+
+USER_CITY_COLUMN_SQL = "ALTER TABLE users ADD COLUMN IF NOT EXISTS city_id INTEGER"
+USER_CITY_UPDATE_SQL = "UPDATE users SET city_id = %s WHERE user_id = %s"
+
+
+def normalize_city(name):
+    """Ключ названия: нижний регистр, ё -> е, дефисы и лишние пробелы не важны"""
+    name = (name or '').lower().replace('ё', 'е').replace('-', ' ')
+    return ' '.join(name.split())
+
+
+class City:
+    """Город VK"""
+
+    __slots__ = ('id', 'title')
+
+    def __init__(self, id, title):
+        self.id = id
+        self.title = title
+
+    def __repr__(self):
+        return f'City({self.id}, {self.title!r})'
+
+
+class CityIndex:
+    """
+    Индекс городов.
+
+    get() - точный поиск за O(1) по нормализованному названию,
+    suggest() - города, начинающиеся с введённого текста (бинарный поиск
+    по отсортированным ключам), similar() - похожие названия (опечатки),
+    resolve() - всё вместе плюс запрос database.getCities для городов,
+    которых ещё нет в индексе. Найденные через API города сохраняются
+    в cache_path и при следующем запуске загружаются без запросов.
+    """
+
+    def __init__(self, session=None, cache_path=CITY_CACHE_FILE, bundled=BUNDLED_CITIES):
+        self.session = session
+        self.cache_path = cache_path
+        self._by_key = {}
+        self._keys = []
+        # Названия, которых нет и в VK - повторно не запрашиваем
+        self._missing = set()
+        self._lock = threading.Lock()
+
+        for city_id, title in bundled.items():
+            self._add(City(city_id, title))
+        self._load()
+
+    def _add(self, city):
+        """Добавление города (под блокировкой или при инициализации); True, если он новый"""
+        key = normalize_city(city.title)
+        if not key or key in self._by_key:
+            return False
+        self._by_key[key] = city
+        bisect.insort(self._keys, key)
+        return True
+
+    def _load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                for city_id, title in json.load(f):
+                    self._add(City(city_id, title))
+        except Exception as e:
+            logger.error(f"Ошибка чтения кэша городов {self.cache_path}: {e}")
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        try:
+            data = [[c.id, c.title] for c in self._by_key.values() if c.id not in BUNDLED_CITIES]
+            tmp_path = f'{self.cache_path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logger.error(f"Ошибка записи кэша городов {self.cache_path}: {e}")
+
+    def __len__(self):
+        return len(self._by_key)
+
+    def get(self, name):
+        """Город по точному названию или None"""
+        return self._by_key.get(normalize_city(name))
+
+    def suggest(self, prefix, limit=SUGGESTIONS):
+        """Города, название которых начинается с prefix"""
+        prefix = normalize_city(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            start = bisect.bisect_left(self._keys, prefix)
+            result = []
+            for key in self._keys[start:start + limit]:
+                if not key.startswith(prefix):
+                    break
+                result.append(self._by_key[key])
+        return result
+
+    def similar(self, name, limit=SUGGESTIONS, cutoff=TYPO_CUTOFF):
+        """Города с похожим названием (по убыванию сходства)"""
+        with self._lock:
+            keys = list(self._keys)
+        matches = difflib.get_close_matches(normalize_city(name), keys, n=limit, cutoff=cutoff)
+        return [self._by_key[key] for key in matches]
+
+    def fetch(self, name):
+        """
+        Поиск города через database.getCities; найденные города добавляются в индекс.
+        Ошибка VK передаётся вызывающему: пустой список означает, что VK такого города не знает.
+        """
+        if self.session is None:
+            return []
+        response = self.session.method('database.getCities', {
+            'country_id': COUNTRY_ID,
+            'q': name,
+            'count': SUGGESTIONS
+        })
+
+        cities = [City(item['id'], item['title']) for item in response.get('items') or []]
+        with self._lock:
+            added = [self._add(city) for city in cities]
+            if any(added):
+                self._save()
+        return cities
+
+    def city_id(self, name, fetch=True):
+        """
+        ID города VK по названию (None, если город неизвестен).
+        Ошибка VK передаётся вызывающему: иначе поиск пошёл бы по всей стране.
+        """
+        city = self.get(name)
+        key = normalize_city(name)
+        if city is None and fetch and key and key not in self._missing:
+            city = next((c for c in self.fetch(name) if normalize_city(c.title) == key), None)
+            if city is None:
+                # Запоминаем только ответ VK «такого города нет», но не ошибку запроса
+                self._missing.add(key)
+        return city.id if city else None
+
+    def resolve(self, text):
+        """
+        Город по введённому тексту.
+        Возвращает (город или None, варианты для подсказки).
+        """
+        city = self.get(text)
+        if city:
+            return city, []
+
+        # Города нет в индексе - сначала ищем точное название в VK (Томск не должен стать Омском)
+        key = normalize_city(text)
+        try:
+            fetched = self.fetch(text)
+            vk_answered = True
+        except Exception as e:
+            logger.error(f"Ошибка поиска города '{text}' в VK: {e}")
+            fetched = []
+            vk_answered = False
+        for candidate in fetched:
+            if normalize_city(candidate.title) == key:
+                return candidate, []
+
+        # Опечатка в известном городе: единственный близкий вариант принимаем сразу,
+        # но только если VK подтвердил, что точного названия нет - иначе только предлагаем
+        similar = self.similar(text)
+        if len(similar) == 1 and vk_answered:
+            return similar[0], []
+
+        suggestions = []
+        for candidate in similar + self.suggest(text) + fetched:
+            if candidate.id not in {c.id for c in suggestions}:
+                suggestions.append(candidate)
+        return None, suggestions[:SUGGESTIONS]
+
+
+class UserCities:
+    """ID города в записи пользователя (колонка users.city_id)"""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def ensure_column(self):
+        try:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(USER_CITY_COLUMN_SQL)
+        except Exception as e:
+            logger.error(f"Ошибка добавления колонки users.city_id: {e}")
+
+    def set_city_id(self, user_id, city_id):
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(USER_CITY_UPDATE_SQL, (city_id, user_id))
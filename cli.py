@@ -0,0 +1,100 @@
+"""
+Параметры запуска VKinder
+Разбор и проверка командной строки отдельно от main, чтобы её можно было проверить без клиентов VK и БД
+"""
+
+import argparse
+
+from dispatcher import DEFAULT_WORKERS, DEFAULT_QUEUE_SIZE
+from preprocess import DEFAULT_MAX_EVENT_AGE, DEFAULT_SHED_THRESHOLD
+from prefetch import DEFAULT_PREFETCH_DEPTH
+from outbound import DEFAULT_COALESCE_WINDOW
+from shared_sessions import SESSION_DB_FILE
+from snapshot import SNAPSHOT_FILE, SNAPSHOT_INTERVAL
+from vk_executor import DEFAULT_HANDLER_BUDGET
+from log_setup import LOG_FILE
+
+# Параметры запуска, которые асинхронный движок (--async) не поддерживает
+ASYNC_UNSUPPORTED_OPTIONS = (
+    'workers', 'queue_size', 'prefetch', 'coalesce', 'db_pool', 'write_behind', 'metrics_port',
+    'callback_port', 'callback_host', 'callback_path', 'shards', 'session_db', 'snapshot', 'snapshot_interval',
+    'vk_budget', 'max_event_age', 'shed_threshold',
+)
+# Параметры, которые в режиме --shards не действуют: метрики одного порта не собрать
+# с нескольких процессов, а сессии и так хранятся в общем файле --session-db
+SHARDS_UNSUPPORTED_OPTIONS = ('metrics_port', 'snapshot', 'snapshot_interval')
+
+
+def build_parser():
+    """Парсер параметров командной строки"""
+    parser = argparse.ArgumentParser(description="VKinder - бот для знакомств ВКонтакте")
+    parser.add_argument('--workers', type=int, default=0,
+                        help=f"число потоков обработки (0 - последовательно, например {DEFAULT_WORKERS}); "
+                             "повторные нажатия склеиваются только при workers > 0, пока события ждут в очереди")
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="глубина очереди каждого потока обработки")
+    parser.add_argument('--prefetch', type=int, default=DEFAULT_PREFETCH_DEPTH,
+                        help="на сколько кандидатов вперёд загружать фото (0 - отключить)")
+    parser.add_argument('--coalesce', type=float, default=DEFAULT_COALESCE_WINDOW,
+                        help="окно склейки сообщений одному пользователю, секунды (0 - отключить)")
+    parser.add_argument('--db-pool', type=int, default=0,
+                        help="размер пула соединений с БД (0 - одно общее соединение)")
+    parser.add_argument('--write-behind', action='store_true',
+                        help="пакетная отложенная запись избранных, черного списка и просмотренных")
+    parser.add_argument('--cache-db', default=None,
+                        help="файл SQLite для кэша ответов VK, общего для нескольких процессов")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="порт HTTP-эндпоинта метрик Prometheus (/metrics, /profile/start, /profile/stop)")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="асинхронный движок на asyncio (нужен aiohttp; из остальных параметров "
+                             "поддерживает только --cache-db, --log-level и --log-file)")
+    parser.add_argument('--callback-port', type=int, default=None,
+                        help="принимать события через Callback API на этом порту вместо long poll")
+    parser.add_argument('--callback-host', default='0.0.0.0',
+                        help="адрес HTTP-сервера Callback API")
+    parser.add_argument('--callback-path', default='/',
+                        help="путь, на который VK присылает события")
+    parser.add_argument('--shards', type=int, default=0,
+                        help="число процессов обработки; события распределяются по user_id, лимит отправки "
+                             "сообщений делится между процессами (0 - один процесс; "
+                             "несовместимо с --metrics-port и --snapshot)")
+    parser.add_argument('--session-db', default=SESSION_DB_FILE,
+                        help="файл SQLite с сессиями, общий для процессов в режиме --shards")
+    parser.add_argument('--snapshot', default=SNAPSHOT_FILE,
+                        help="файл снимка сессий для продолжения просмотра после перезапуска ('' - отключить)")
+    parser.add_argument('--snapshot-interval', type=float, default=SNAPSHOT_INTERVAL,
+                        help="как часто сохранять снимок сессий, секунды")
+    parser.add_argument('--vk-budget', type=float, default=DEFAULT_HANDLER_BUDGET,
+                        help="сколько секунд обработчик может ждать ответов VK с учётом повторов")
+    parser.add_argument('--max-event-age', type=float, default=DEFAULT_MAX_EVENT_AGE,
+                        help="навигация старше стольких секунд не выполняется, оценки и ввод - всегда (0 - выполнять все)")
+    parser.add_argument('--shed-threshold', type=int, default=DEFAULT_SHED_THRESHOLD,
+                        help="при стольких событиях в очередях справка и меню отбрасываются (0 - никогда)")
+    parser.add_argument('--log-level', default='INFO',
+                        help="уровень логирования (DEBUG, INFO, WARNING, ERROR)")
+    parser.add_argument('--log-file', default=LOG_FILE,
+                        help="файл лога (JSON, ротация раз в сутки и по размеру)")
+    return parser
+
+
+def _changed(parser, args, names):
+    """Параметры из names, заданные не по умолчанию (в виде --имя)"""
+    return ['--' + name.replace('_', '-') for name in names if getattr(args, name) != parser.get_default(name)]
+
+
+def parse_args(argv=None):
+    """Разбор параметров; несовместимые сочетания завершают программу с ошибкой (код 2)"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.use_async:
+        # Асинхронный движок принимает события только через long poll и сам управляет параллельностью
+        unsupported = _changed(parser, args, ASYNC_UNSUPPORTED_OPTIONS)
+        if unsupported:
+            parser.error(f"с --async нельзя использовать: {', '.join(unsupported)}")
+    elif args.shards > 0:
+        unsupported = _changed(parser, args, SHARDS_UNSUPPORTED_OPTIONS)
+        if unsupported:
+            parser.error(f"с --shards нельзя использовать: {', '.join(unsupported)}")
+
+    return args
@@ -0,0 +1,282 @@
+"""
+Пул соединений с базой данных и отложенная пакетная запись
+"""
+
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# Размер пула по умолчанию
+DEFAULT_POOL_SIZE = 8
+# Сколько записей копить до сброса в БД
+DEFAULT_BATCH_SIZE = 200
+# Максимальная задержка записи (секунды)
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+
+class PooledDatabase:
+    """
+    Пул объектов Database для параллельных обработчиков.
+
+    Интерфейс тот же, что у Database: каждый вызов метода берёт свободное
+    соединение из пула и возвращает его после выполнения. Соединения
+    создаются по мере необходимости, но не больше size.
+    """
+
+    def __init__(self, factory, size=DEFAULT_POOL_SIZE):
+        self.factory = factory
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+
+        if create:
+            try:
+                return self.factory()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle.get()
+
+    @contextmanager
+    def connection(self):
+        """Объект Database из пула на время блока with"""
+        db = self._acquire()
+        try:
+            yield db
+        finally:
+            self._idle.put(db)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def pooled(*args, **kwargs):
+            with self.connection() as db:
+                return getattr(db, name)(*args, **kwargs)
+
+        return pooled
+
+    def close(self):
+        """Закрытие всех соединений пула"""
+        while True:
+            try:
+                db = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                db.close()
+            except Exception as e:
+                logger.error(f"Ошибка закрытия соединения с БД: {e}")
+
+
+class ConnectionPool:
+    """
+    Пул соединений psycopg2 для запросов в обход Database.
+
+    ThreadedConnectionPool не ждёт свободного соединения, а бросает PoolError,
+    поэтому число одновременно выданных соединений ограничено семафором:
+    лишние потоки (обработчики, сброс буфера записи, задачи запуска)
+    ждут, пока кто-то вернёт соединение.
+    """
+
+    def __init__(self, db_config, size=DEFAULT_POOL_SIZE):
+        self._pool = ThreadedConnectionPool(1, size, **db_config)
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self):
+        """Соединение на время блока with: commit при успехе, rollback при ошибке"""
+        self._slots.acquire()
+        try:
+            conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            try:
+                self._pool.putconn(conn)
+            finally:
+                # Место возвращается, даже если пул не принял соединение
+                self._slots.release()
+
+    def close(self):
+        self._pool.closeall()
+
+
+class WriteBehindBuffer:
+    """
+    Отложенная запись избранных, черного списка и просмотренных кандидатов.
+
+    Записи копятся в памяти и сбрасываются многострочным
+    INSERT ... ON CONFLICT DO NOTHING, когда их набирается batch_size
+    или проходит flush_interval секунд. При потере соединения записи
+    остаются в буфере до следующего сброса; если БД отвергает данные,
+    пакет делится пополам, пока не найдутся плохие строки - они
+    записываются в лог и отбрасываются.
+    """
+
+    def __init__(self, pool, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._favorites = {}
+        self._blacklist = set()
+        self._viewed = set()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name='vkinder-write-behind', daemon=True)
+        self._thread.start()
+
+        # Статистика
+        self.flushed = 0
+        self.flush_errors = 0
+        self.dropped = 0
+
+    def add_favorite(self, user_id, candidate_id, first_name, last_name):
+        """Добавление в избранное; False, если запись уже ждёт сброса"""
+        with self._cond:
+            key = (user_id, candidate_id)
+            if key in self._favorites:
+                return False
+            self._favorites[key] = (first_name, last_name)
+            self._notify_if_full()
+        return True
+
+    def add_blacklist(self, user_id, candidate_id):
+        with self._cond:
+            self._blacklist.add((user_id, candidate_id))
+            self._notify_if_full()
+
+    def add_viewed(self, user_id, candidate_id):
+        with self._cond:
+            self._viewed.add((user_id, candidate_id))
+            self._notify_if_full()
+
+    def clear_favorites(self, user_id, clear):
+        """
+        Очистка избранных пользователя: несброшенные записи отбрасываются, clear(user_id) удаляет сохранённые.
+        Выполняется под блокировкой сброса, чтобы идущий сброс не дописал избранных после очистки.
+        """
+        with self._flush_lock:
+            with self._cond:
+                for key in [k for k in self._favorites if k[0] == user_id]:
+                    del self._favorites[key]
+            clear(user_id)
+
+    def pending(self):
+        with self._cond:
+            return len(self._favorites) + len(self._blacklist) + len(self._viewed)
+
+    def _notify_if_full(self):
+        if len(self._favorites) + len(self._blacklist) + len(self._viewed) >= self.batch_size:
+            self._cond.notify()
+
+    def _write(self, sql, rows):
+        """
+        Запись строк одним INSERT; возвращает число записанных.
+        Если БД отвергла данные, пакет делится пополам, а отдельная плохая строка отбрасывается.
+        Ошибки соединения пробрасываются - строки нужно вернуть в буфер.
+        """
+        try:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    execute_values(cur, sql, rows)
+            return len(rows)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            raise
+        except psycopg2.Error as e:
+            if len(rows) == 1:
+                self.dropped += 1
+                logger.error(f"Строка {rows[0]} отброшена при пакетной записи в БД: {e}")
+                return 0
+            middle = len(rows) // 2
+            return self._write(sql, rows[:middle]) + self._write(sql, rows[middle:])
+
+    def flush(self):
+        """Сброс накопленных записей в БД"""
+        with self._flush_lock:
+            with self._cond:
+                favorites, self._favorites = self._favorites, {}
+                blacklist, self._blacklist = self._blacklist, set()
+                viewed, self._viewed = self._viewed, set()
+
+            count = 0
+            try:
+                if favorites:
+                    count += self._write(
+                        "INSERT INTO favorites (user_id, candidate_id, first_name, last_name) "
+                        "VALUES %s ON CONFLICT DO NOTHING",
+                        [(u, c, f, l) for (u, c), (f, l) in favorites.items()]
+                    )
+                    favorites = {}
+                if blacklist:
+                    count += self._write(
+                        "INSERT INTO blacklist (user_id, candidate_id) VALUES %s ON CONFLICT DO NOTHING",
+                        list(blacklist)
+                    )
+                    blacklist = set()
+                if viewed:
+                    count += self._write(
+                        "INSERT INTO viewed_profiles (user_id, candidate_id) VALUES %s ON CONFLICT DO NOTHING",
+                        list(viewed)
+                    )
+                    viewed = set()
+            except psycopg2.Error as e:
+                self.flush_errors += 1
+                logger.error(f"Ошибка пакетной записи в БД ({len(favorites) + len(blacklist) + len(viewed)} строк): {e}")
+                # Возвращаем несброшенные записи в буфер - попробуем в следующий раз
+                with self._cond:
+                    for key, value in favorites.items():
+                        self._favorites.setdefault(key, value)
+                    self._blacklist.update(blacklist)
+                    self._viewed.update(viewed)
+
+            self.flushed += count
+            return count
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                if self._running:
+                    self._cond.wait(self.flush_interval)
+                running = self._running
+            self.flush()
+            if not running:
+                return
+
+    def close(self, timeout=None):
+        """Остановка с финальным сбросом"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout)
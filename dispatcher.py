@@ -0,0 +1,162 @@
+"""
+Диспетчер событий VKinder
+Параллельная обработка сообщений разных пользователей на ограниченном пуле потоков
+"""
+
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Количество рабочих потоков по умолчанию
+DEFAULT_WORKERS = 8
+# Глубина очереди одного рабочего потока по умолчанию
+DEFAULT_QUEUE_SIZE = 1000
+# Сколько ждать места в очереди, прежде чем отбросить событие (секунды)
+DEFAULT_SUBMIT_TIMEOUT = 5.0
+
+# Маркер остановки рабочего потока
+_STOP = object()
+
+
+class SynchronizedProxy:
+    """Потокобезопасная обёртка: вызовы методов объекта выполняются под общей блокировкой"""
+
+    def __init__(self, target, lock=None):
+        self._target = target
+        self._lock = lock or threading.RLock()
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def locked(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+
+        return locked
+
+
+class EventDispatcher:
+    """
+    Диспетчер событий long poll.
+
+    Каждый пользователь закреплён за одним рабочим потоком (по user_id),
+    поэтому события одного пользователя обрабатываются строго по порядку,
+    а события разных пользователей - параллельно. Состояние пользователя
+    (user_states[user_id]) в итоге изменяет только его рабочий поток.
+    """
+
+    def __init__(self, handler, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+                 submit_timeout=DEFAULT_SUBMIT_TIMEOUT):
+        if workers < 1:
+            raise ValueError("Количество рабочих потоков должно быть не меньше 1")
+
+        self.handler = handler
+        self.workers = workers
+        self.queue_size = queue_size
+        self.submit_timeout = submit_timeout
+
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._threads = []
+        self._running = False
+        self._lock = threading.Lock()
+
+        # Статистика
+        self.submitted = 0
+        self.processed = 0
+        self.dropped = 0
+
+    def _worker_index(self, user_id):
+        """Номер рабочего потока, за которым закреплён пользователь"""
+        return hash(user_id) % self.workers
+
+    def _worker_loop(self, worker_queue):
+        """Цикл рабочего потока"""
+        while True:
+            event = worker_queue.get()
+            try:
+                if event is _STOP:
+                    return
+                self.handler(event)
+            except Exception as e:
+                logger.error(f"Ошибка обработки события в диспетчере: {e}")
+            finally:
+                if event is not _STOP:
+                    with self._lock:
+                        self.processed += 1
+                worker_queue.task_done()
+
+    def start(self):
+        """Запуск рабочих потоков"""
+        if self._running:
+            return
+
+        self._running = True
+        for i, worker_queue in enumerate(self._queues):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                args=(worker_queue,),
+                name=f"vkinder-worker-{i}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+        logger.info(f"Диспетчер запущен: {self.workers} потоков, очередь {self.queue_size}")
+
+    def submit(self, event):
+        """
+        Постановка события в очередь рабочего потока.
+        Возвращает False, если очередь переполнена и событие отброшено.
+        """
+        if not self._running:
+            raise RuntimeError("Диспетчер не запущен")
+
+        worker_queue = self._queues[self._worker_index(event.user_id)]
+        try:
+            worker_queue.put(event, timeout=self.submit_timeout)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            logger.error(f"Очередь диспетчера переполнена, событие от {event.user_id} отброшено")
+            return False
+
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def pending(self):
+        """Количество событий, ожидающих обработки"""
+        return sum(q.qsize() for q in self._queues)
+
+    def stop(self, drain=True, timeout=None):
+        """
+        Остановка диспетчера.
+        При drain=True сначала обрабатываются все уже принятые события.
+        """
+        if not self._running:
+            return
+
+        self._running = False
+
+        if not drain:
+            for worker_queue in self._queues:
+                try:
+                    while True:
+                        worker_queue.get_nowait()
+                        worker_queue.task_done()
+                except queue.Empty:
+                    pass
+
+        # Маркер остановки встаёт в конец очереди, после уже принятых событий
+        for worker_queue in self._queues:
+            worker_queue.put(_STOP)
+
+        for thread in self._threads:
+            thread.join(timeout)
+
+        self._threads = []
+        logger.info(f"Диспетчер остановлен: обработано {self.processed}, отброшено {self.dropped}")
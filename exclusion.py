@@ -0,0 +1,213 @@
+"""
+Индекс исключений пользователя
+Черный список, избранные и уже просмотренные кандидаты в памяти процесса
+"""
+
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Для скольких пользователей держать индекс в памяти
+DEFAULT_MAX_USERS = 50000
+# Сколько новых id копить до слияния с отсортированным массивом
+MERGE_THRESHOLD = 64
+# Через сколько секунд повторять загрузку, если БД была недоступна
+RELOAD_INTERVAL = 30.0
+
+_BLACKLIST_IDS_SQL = "SELECT candidate_id FROM blacklist WHERE user_id = %s"
+_FAVORITE_IDS_SQL = "SELECT candidate_id FROM favorites WHERE user_id = %s"
+_VIEWED_IDS_SQL = "SELECT candidate_id FROM viewed_profiles WHERE user_id = %s"
+
+
+class IdSet:
+    """
+    Компактное множество id: отсортированный массив int64 плюс небольшой буфер
+    новых id, который периодически вливается в массив.
+    """
+
+    __slots__ = ('_sorted', '_pending')
+
+    def __init__(self, ids=()):
+        self._sorted = array('q', sorted(set(ids)))
+        self._pending = set()
+
+    def __contains__(self, item):
+        if item in self._pending:
+            return True
+        i = bisect_left(self._sorted, item)
+        return i < len(self._sorted) and self._sorted[i] == item
+
+    def add(self, item):
+        if item in self:
+            return
+        self._pending.add(item)
+        if len(self._pending) >= MERGE_THRESHOLD:
+            self._merge()
+
+    def update(self, ids):
+        self._pending.update(ids)
+        self._merge()
+
+    def _merge(self):
+        self._sorted = array('q', sorted(set(self._sorted).union(self._pending)))
+        self._pending = set()
+
+    def __len__(self):
+        return len(self._sorted) + len(self._pending)
+
+    def __iter__(self):
+        yield from self._sorted
+        yield from self._pending
+
+
+class UserExclusions:
+    """
+    Исключения одного пользователя.
+    reload_at - если не 0, данные из БД не загружены (БД была недоступна)
+    и загрузку стоит повторить после этого момента (time.monotonic()).
+    """
+
+    __slots__ = ('blacklist', 'favorites', 'seen', 'reload_at')
+
+    def __init__(self, blacklist=(), favorites=(), seen=(), reload_at=0.0):
+        self.blacklist = IdSet(blacklist)
+        self.favorites = IdSet(favorites)
+        self.seen = IdSet(seen)
+        self.reload_at = reload_at
+
+    def excludes(self, candidate_id):
+        return candidate_id in self.blacklist or candidate_id in self.favorites or candidate_id in self.seen
+
+
+def _candidate_id(row):
+    if isinstance(row, dict):
+        return row['candidate_id']
+    if isinstance(row, (tuple, list)):
+        return row[0]
+    return int(row)
+
+
+def _candidate_ids(rows):
+    """id кандидатов из строк БД (словарей с candidate_id, кортежей или чисел)"""
+    return [_candidate_id(row) for row in rows or ()]
+
+
+class ExclusionIndex:
+    """
+    Индекс исключений для всех пользователей.
+
+    Загружается из таблиц blacklist/favorites/viewed_profiles при первом обращении
+    к пользователю, дальше обновляется при каждой записи. Хранится не больше
+    max_users пользователей: вытесненный пользователь при следующем обращении
+    заново загрузится из БД.
+
+    Таблицы читаются через пул соединений pool; без пула - через db.get_blacklist
+    и db.get_favorites (их должна уметь переданная готовая БД), а просмотренные
+    тогда живут только в памяти процесса. Если БД недоступна,
+    в индексе остаётся пустая запись, в которую продолжают попадать новые исключения;
+    через reload_interval секунд загрузка повторяется и данные из БД добавляются к ней.
+    """
+
+    def __init__(self, db, max_users=DEFAULT_MAX_USERS, pool=None, reload_interval=RELOAD_INTERVAL):
+        self.db = db
+        self.pool = pool
+        self.max_users = max_users
+        self.reload_interval = reload_interval
+        self._users = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _load(self, user_id):
+        """(черный список, избранные, просмотренные) пользователя из БД"""
+        if self.pool is None:
+            return _candidate_ids(self.db.get_blacklist(user_id)), _candidate_ids(self.db.get_favorites(user_id)), ()
+
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(_BLACKLIST_IDS_SQL, (user_id,))
+                blacklist = _candidate_ids(cur.fetchall())
+                cur.execute(_FAVORITE_IDS_SQL, (user_id,))
+                favorites = _candidate_ids(cur.fetchall())
+                cur.execute(_VIEWED_IDS_SQL, (user_id,))
+                seen = _candidate_ids(cur.fetchall())
+        return blacklist, favorites, seen
+
+    def _get(self, user_id):
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                self._users.move_to_end(user_id)
+                if not entry.reload_at or entry.reload_at > time.monotonic():
+                    return entry
+                # Повторную загрузку делает один поток, остальные пока работают с тем, что есть
+                entry.reload_at = time.monotonic() + self.reload_interval
+
+        # Загрузка из БД - без блокировки индекса
+        try:
+            blacklist, favorites, seen = self._load(user_id)
+        except Exception as e:
+            logger.error(f"Ошибка загрузки исключений пользователя {user_id}: {e}")
+            blacklist = favorites = seen = None
+
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                entry = self._users[user_id] = UserExclusions()
+                entry.reload_at = time.monotonic() + self.reload_interval
+            if blacklist is not None and entry.reload_at:
+                # Записи, сделанные без данных из БД, остаются в той же записи индекса
+                entry.blacklist.update(blacklist)
+                entry.favorites.update(favorites)
+                entry.seen.update(seen)
+                entry.reload_at = 0.0
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+            return entry
+
+    def filter(self, user_id, candidates):
+        """Кандидаты без черного списка, избранных и уже просмотренных"""
+        entry = self._get(user_id)
+        with self._lock:
+            return [c for c in candidates if not entry.excludes(c['id'])]
+
+    def is_favorite(self, user_id, candidate_id):
+        entry = self._get(user_id)
+        with self._lock:
+            return candidate_id in entry.favorites
+
+    def add_blacklist(self, user_id, candidate_id):
+        entry = self._get(user_id)
+        with self._lock:
+            entry.blacklist.add(candidate_id)
+
+    def add_favorite(self, user_id, candidate_id):
+        entry = self._get(user_id)
+        with self._lock:
+            entry.favorites.add(candidate_id)
+
+    def mark_seen(self, user_id, candidate_id):
+        entry = self._get(user_id)
+        with self._lock:
+            entry.seen.add(candidate_id)
+
+    def clear_favorites(self, user_id):
+        entry = self._get(user_id)
+        with self._lock:
+            entry.favorites = IdSet()
+
+    def forget(self, user_id):
+        """Удаление пользователя из индекса (перечитается из БД)"""
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'users': len(self._users),
+                'ids': sum(len(e.blacklist) + len(e.favorites) + len(e.seen) for e in self._users.values()),
+            }
@@ -0,0 +1,143 @@
+"""
+Постраничный просмотр избранных
+Страницы читаются из БД по ключу (created_at, id) без OFFSET и без загрузки всего списка
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Сколько избранных показывать на одной странице
+FAVORITES_PAGE_SIZE = 10
+
+FAVORITES_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS favorites_user_created_id_idx "
+    "ON favorites (user_id, created_at, id)"
+)
+
+_PAGE_COLUMNS = "id, candidate_id, first_name, last_name, created_at"
+_FORWARD_SQL = (
+    f"SELECT {_PAGE_COLUMNS} FROM favorites "
+    "WHERE user_id = %s AND (created_at, id) > (%s, %s) "
+    "ORDER BY created_at, id LIMIT %s"
+)
+_FIRST_SQL = (
+    f"SELECT {_PAGE_COLUMNS} FROM favorites "
+    "WHERE user_id = %s "
+    "ORDER BY created_at, id LIMIT %s"
+)
+_BACKWARD_SQL = (
+    f"SELECT {_PAGE_COLUMNS} FROM favorites "
+    "WHERE user_id = %s AND (created_at, id) < (%s, %s) "
+    "ORDER BY created_at DESC, id DESC LIMIT %s"
+)
+_COUNT_SQL = "SELECT count(*) FROM favorites WHERE user_id = %s"
+
+
+def _row_to_favorite(row):
+    fav_id, candidate_id, first_name, last_name, created_at = row
+    return {
+        'id': fav_id,
+        'candidate_id': candidate_id,
+        'first_name': first_name,
+        'last_name': last_name,
+        'created_at': created_at,
+    }
+
+
+class FavoritesRepository:
+    """
+    Избранные пользователя страницами.
+
+    get_favorites_page(user_id, after=...) - страница после ключа (created_at, id),
+    get_favorites_page(user_id, before=...) - страница перед ключом.
+    Возвращает (избранные по возрастанию ключа, есть ли ещё записи в направлении чтения).
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def ensure_index(self):
+        """Индекс, по которому читаются страницы и считается количество"""
+        try:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(FAVORITES_INDEX_SQL)
+        except Exception as e:
+            logger.error(f"Ошибка создания индекса избранных: {e}")
+
+    def get_favorites_page(self, user_id, after=None, before=None, limit=FAVORITES_PAGE_SIZE):
+        # Лишняя запись показывает, есть ли следующая страница
+        if before is not None:
+            sql, params = _BACKWARD_SQL, (user_id, before[0], before[1], limit + 1)
+        elif after is not None:
+            sql, params = _FORWARD_SQL, (user_id, after[0], after[1], limit + 1)
+        else:
+            sql, params = _FIRST_SQL, (user_id, limit + 1)
+
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                rows = cur.fetchall()
+
+        has_more = len(rows) > limit
+        favorites = [_row_to_favorite(row) for row in rows[:limit]]
+        if before is not None:
+            favorites.reverse()
+        return favorites, has_more
+
+    def count_favorites(self, user_id):
+        """Число избранных (index-only scan по индексу пользователя)"""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(_COUNT_SQL, (user_id,))
+                return cur.fetchone()[0]
+
+
+class FavoritesPager:
+    """
+    Листание избранных.
+    Состояние листания (ключи границ текущей страницы, номер первой записи,
+    общее число) хранится в сессии пользователя.
+    """
+
+    def __init__(self, store, page_size=FAVORITES_PAGE_SIZE):
+        self.store = store
+        self.page_size = page_size
+
+    def first(self, user_id):
+        """Первая страница и новое состояние листания"""
+        favorites, has_next = self.store.get_favorites_page(user_id, limit=self.page_size)
+        # Считаем записи в БД, только если они не поместились на одну страницу
+        total = self.store.count_favorites(user_id) if has_next else len(favorites)
+        return favorites, self._state(favorites, 0, total, has_prev=False, has_next=has_next)
+
+    def next(self, user_id, state):
+        """Следующая страница (с начала, если записи после текущей страницы пропали)"""
+        favorites, has_next = self.store.get_favorites_page(user_id, after=state['last'], limit=self.page_size)
+        if not favorites:
+            return self.first(user_id)
+        offset = state['offset'] + state['size']
+        return favorites, self._state(favorites, offset, state['total'], has_prev=True, has_next=has_next)
+
+    def prev(self, user_id, state):
+        """Предыдущая страница"""
+        favorites, has_prev = self.store.get_favorites_page(user_id, before=state['first'], limit=self.page_size)
+        if not favorites:
+            return self.first(user_id)
+        offset = max(0, state['offset'] - len(favorites))
+        return favorites, self._state(favorites, offset, state['total'], has_prev=has_prev, has_next=True)
+
+    @staticmethod
+    def _state(favorites, offset, total, has_prev, has_next):
+        first = favorites[0] if favorites else None
+        last = favorites[-1] if favorites else None
+        return {
+            'first': (first['created_at'], first['id']) if first else None,
+            'last': (last['created_at'], last['id']) if last else None,
+            'offset': offset,
+            'size': len(favorites),
+            'total': max(total, offset + len(favorites)),
+            'has_prev': has_prev,
+            'has_next': has_next,
+        }
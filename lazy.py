@@ -0,0 +1,114 @@
+"""
+Отложенное создание клиентов VKinder
+Сессии VK, long poll и соединения с БД создаются в фоне параллельно, бот начинает работу не дожидаясь их
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Сколько клиентов создавать одновременно при запуске
+STARTUP_THREADS = 4
+
+
+class LazyClient:
+    """
+    Клиент, который создаётся при первом обращении.
+
+    start(executor) начинает создание заранее в фоновом потоке; обращение
+    к атрибуту (client.method(...)) дожидается готового объекта. Если создать
+    клиент не удалось, ошибка достаётся вызывающему, а следующее обращение
+    пробует снова.
+    """
+
+    def __init__(self, factory, name):
+        self._factory = factory
+        self._name = name
+        self._value = None
+        self._future = None
+        self._lock = threading.Lock()
+
+    def _build(self):
+        started = time.perf_counter()
+        try:
+            value = self._factory()
+        except Exception as e:
+            logger.error(f"Ошибка создания клиента {self._name}: {e}")
+            raise
+        logger.info(f"Клиент {self._name} создан за {time.perf_counter() - started:.2f} с")
+        return value
+
+    def start(self, executor):
+        """Создание клиента в фоне (не ждёт, если клиент уже создаёт другой поток)"""
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if self._value is None and self._future is None:
+                self._future = executor.submit(self._build)
+        finally:
+            self._lock.release()
+
+    def get(self):
+        """Готовый клиент (создаётся или дожидается фонового создания)"""
+        value = self._value
+        if value is not None:
+            return value
+
+        with self._lock:
+            if self._value is None:
+                future, self._future = self._future, None
+                # Фоновое создание идёт не под блокировкой, ждём его результата здесь
+                self._value = future.result() if future is not None else self._build()
+            return self._value
+
+    def close(self):
+        """Закрытие клиента, если он уже создан или создаётся (несозданный не создаётся ради закрытия)"""
+        with self._lock:
+            future, self._future = self._future, None
+            if future is not None and not future.cancel():
+                try:
+                    self._value = future.result()
+                except Exception:
+                    pass
+            value, self._value = self._value, None
+        if value is not None:
+            value.close()
+
+    @property
+    def ready(self):
+        return self._value is not None
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __repr__(self):
+        return f"LazyClient({self._name}, ready={self.ready})"
+
+
+class Startup:
+    """Параллельное создание клиентов и фоновые задачи запуска (индексы, колонки БД)"""
+
+    def __init__(self, threads=STARTUP_THREADS):
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='vkinder-startup')
+
+    def start(self, *clients):
+        """Начать создание клиентов (уже готовые объекты пропускаются)"""
+        for client in clients:
+            if isinstance(client, LazyClient):
+                client.start(self._executor)
+
+    def submit(self, func, name):
+        """Фоновая задача запуска; ошибка только логируется"""
+        def task():
+            try:
+                func()
+            except Exception as e:
+                logger.error(f"Ошибка задачи запуска {name}: {e}")
+
+        self._executor.submit(task)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
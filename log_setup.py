@@ -0,0 +1,217 @@
+"""
+Неблокирующее логирование VKinder
+Записи уходят в очередь, на диск их пишет отдельный поток; файл в формате JSON с ротацией
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+
+# Файл лога и ротация: новый файл раз в сутки или при превышении размера
+LOG_FILE = 'vkinder.log'
+LOG_MAX_BYTES = 20 * 1024 * 1024
+LOG_BACKUP_COUNT = 7
+LOG_ROTATE_WHEN = 'midnight'
+# Глубина очереди записей; при переполнении новые записи отбрасываются
+LOG_QUEUE_SIZE = 10000
+# Сколько записей в секунду пропускать с одного места в коде (остальные отбрасываются)
+SAMPLE_RATE = 20
+SAMPLE_BURST = 100
+# Поля контекста, которые попадают в каждую запись
+CONTEXT_FIELDS = ('user_id', 'handler', 'latency')
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_context = contextvars.ContextVar('vkinder_log_context', default={})
+
+
+@contextmanager
+def log_context(**fields):
+    """Поля (user_id, handler), добавляемые ко всем записям внутри блока"""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Добавляет к записи поля текущего контекста (выполняется в потоке, создавшем запись)"""
+
+    def filter(self, record):
+        for name, value in _context.get().items():
+            if not hasattr(record, name):
+                setattr(record, name, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Ограничение частоты записей с одного места в коде.
+
+    У каждой строки, вызвавшей логгер, свой лимит (маркерная корзина):
+    в среднем rate записей в секунду, всплеск до burst. Лишние записи
+    отбрасываются, их число добавляется к следующей пропущенной записи
+    (поле suppressed). Записи уровня exempt_level и выше не отбрасываются.
+    """
+
+    def __init__(self, rate=SAMPLE_RATE, burst=SAMPLE_BURST, exempt_level=logging.CRITICAL):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.exempt_level = exempt_level
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+        # Статистика
+        self.suppressed = 0
+
+    def filter(self, record):
+        if record.levelno >= self.exempt_level:
+            return True
+
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now, 0]
+            tokens, updated, dropped = bucket
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                bucket[:] = [tokens, now, dropped + 1]
+                self.suppressed += 1
+                return False
+            bucket[:] = [tokens - 1, now, 0]
+
+        if dropped:
+            record.suppressed = dropped
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной строкой JSON"""
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for name in CONTEXT_FIELDS + ('suppressed',):
+            value = getattr(record, name, None)
+            if value is not None:
+                data[name] = value
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class RotatingFileHandler(TimedRotatingFileHandler):
+    """Ротация по времени (when) и по размеру файла (max_bytes)"""
+
+    def __init__(self, filename, max_bytes=LOG_MAX_BYTES, when=LOG_ROTATE_WHEN,
+                 backup_count=LOG_BACKUP_COUNT):
+        super().__init__(filename, when=when, backupCount=backup_count, encoding='utf-8', delay=True)
+        self.max_bytes = max_bytes
+
+    def shouldRollover(self, record):
+        if super().shouldRollover(record):
+            return True
+        if self.max_bytes and self.stream is not None:
+            return self.stream.tell() >= self.max_bytes
+        return False
+
+    def rotation_filename(self, default_name):
+        # При ротации по размеру в пределах одного периода имя уже может быть занято
+        name, n = default_name, 1
+        while os.path.exists(name):
+            name = f'{default_name}.{n}'
+            n += 1
+        return name
+
+    def getFilesToDelete(self):
+        # Имена архивов не упорядочены по возрасту (после удаления старых освобождается имя без номера),
+        # поэтому удаляем самые старые по времени изменения
+        dir_name, base_name = os.path.split(self.baseFilename)
+        prefix = base_name + '.'
+        files = []
+        for name in os.listdir(dir_name):
+            if name.startswith(prefix):
+                path = os.path.join(dir_name, name)
+                files.append((os.stat(path).st_mtime_ns, path))
+        if len(files) <= self.backupCount:
+            return []
+        files.sort()
+        return [path for _, path in files[:len(files) - self.backupCount]]
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler, который при переполненной очереди отбрасывает запись, а не ждёт"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BackgroundListener(QueueListener):
+    """Фоновый поток записи; повторная остановка ничего не делает"""
+
+    def enqueue_sentinel(self):
+        # Очередь может быть заполнена - ждём, пока поток записи освободит место
+        self.queue.put(self._sentinel)
+
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
+
+
+def setup_logging(level=logging.INFO, log_file=LOG_FILE, console=True, sample_rate=SAMPLE_RATE,
+                  sample_burst=SAMPLE_BURST, queue_size=LOG_QUEUE_SIZE):
+    """
+    Настройка логирования: логгеры только кладут записи в очередь,
+    в файл (JSON) и на консоль (текст) их пишет фоновый поток.
+    Возвращает QueueListener; он останавливается при выходе из программы.
+    """
+    handlers = []
+    if log_file:
+        file_handler = RotatingFileHandler(log_file)
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        handlers.append(console_handler)
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = DroppingQueueHandler(log_queue)
+    if sample_rate:
+        queue_handler.addFilter(SamplingFilter(sample_rate, sample_burst))
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = BackgroundListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -5,98 +5,357 @@ VKinder - бот для поиска людей для знакомств в В
 
 import os
 import logging
-from datetime import datetime
 import vk_api
 from vk_api.longpoll import VkLongPoll, VkEventType
-from vk_api.keyboard import VkKeyboard, VkKeyboardColor
-from vk_api.utils import get_random_id
 
 from database import Database
-from vk_service import VKService
+from db_pool import PooledDatabase, ConnectionPool, WriteBehindBuffer, DEFAULT_POOL_SIZE
+from favorites import FavoritesRepository, FavoritesPager
+from cities import CityIndex, UserCities
+from dispatcher import EventDispatcher, SynchronizedProxy, DEFAULT_QUEUE_SIZE
+from preprocess import EventPreprocessor, DEFAULT_MAX_EVENT_AGE, DEFAULT_SHED_THRESHOLD
+from prefetch import PhotoPrefetcher, DEFAULT_PREFETCH_DEPTH
+from outbound import OutboundQueue, DEFAULT_COALESCE_WINDOW, DEFAULT_RATE, DEFAULT_BURST
+from vk_batch import BatchVKService
+from photo_ranking import EXECUTE_BATCH_SIZE
+from cache import CachedVKService, MemoryCacheBackend, SqliteCacheBackend
+from session_store import SessionStore, CandidateList
+from shared_sessions import SharedSessionStore, SharedSearchPositions
+from sharding import ShardedRunner
+from snapshot import SessionSnapshot, SNAPSHOT_INTERVAL
+from lazy import LazyClient, Startup
+from vk_executor import resilient, call_budget, DEFAULT_HANDLER_BUDGET
+from exclusion import ExclusionIndex
+from candidate_search import SearchPositions, FIRST_PAGE_SIZE, LOOKAHEAD
+from candidate_pool import CandidatePool
+from ranking import CandidateRanker
+from metrics import BotMetrics, MetricsServer
+from callback import CallbackServer
+from router import CommandRouter, KeyboardCache, event_payload
+from cli import parse_args
+from log_setup import setup_logging, log_context
 from config import VK_GROUP_TOKEN, VK_USER_TOKEN, DB_CONFIG
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('vkinder.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
+# Тексты сообщений
+WELCOME_TEMPLATE = """👋 Привет, {first_name}!
+
+🤖 Я VKinder - бот для поиска людей для знакомств в ВКонтакте!
+
+✨ Что я умею:
+• Искать людей для знакомств по вашим параметрам
+• Показывать самые популярные фото профилей
+• Сохранять понравившихся людей в избранное
+• Добавлять неподходящих в черный список
+
+🚀 Давайте начнем! Выберите действие:"""
+
+CHANGE_SEX_TEXT = """🚻 Укажите ваш пол:
+
+Отправьте:
+1 - Женский
+2 - Мужской
+
+Это нужно, чтобы подбирать вам подходящих людей."""
+
+CHANGE_AGE_TEXT = """🎂 Укажите ваш возраст:
+
+Отправьте число от 18 до 80.
+Например: 25"""
+
+CHANGE_CITY_TEXT = """🏙️ Укажите ваш город:
+
+Отправьте название города.
+Например: Москва
+
+Подойдёт любой город России, опечатки исправляются автоматически."""
+
+HELP_TEXT = """ℹ️ Справка по VKinder:
+
+🔍 Поиск - поиск людей для знакомства
+❤️ Избранные - управление списком избранных
+⚙️ Настройки - настройки профиля (в разработке)
+
+Во время поиска:
+❤️ В избранное - добавить человека в избранные
+👎 В черный список - больше не показывать
+▶️ Следующий - перейти к следующему человеку
+
+📞 Техподдержка: karalash.anka@yandex.ru"""
+
 
 class VKinderBot:
     """Главный класс бота VKinder"""
 
-    def __init__(self):
-        """Инициализация бота"""
-        self.vk_session = vk_api.VkApi(token=VK_GROUP_TOKEN)
-        self.vk = self.vk_session.get_api()
-        self.longpoll = VkLongPoll(self.vk_session)
-        self.db = Database(**DB_CONFIG)
+    def __init__(self, prefetch_depth=DEFAULT_PREFETCH_DEPTH, cache_backend=None,
+                 coalesce_window=DEFAULT_COALESCE_WINDOW, db_pool_size=0, write_behind=False,
+                 ranking_weights=None, vk_session=None, user_session=None, db=None, vk_service=None,
+                 longpoll=None, session_backend=None, snapshot_path=None, snapshot_interval=SNAPSHOT_INTERVAL,
+                 handler_budget=DEFAULT_HANDLER_BUDGET, max_event_age=DEFAULT_MAX_EVENT_AGE,
+                 shed_threshold=DEFAULT_SHED_THRESHOLD, outbound_rate=DEFAULT_RATE, outbound_burst=DEFAULT_BURST):
+        """
+        Инициализация бота.
+        cache_backend - хранилище кэша ответов VK (по умолчанию в памяти процесса)
+        coalesce_window - окно склейки сообщений одному пользователю (секунды, 0 - не склеивать)
+        db_pool_size - размер пула соединений с БД (0 - одно общее соединение)
+        write_behind - пакетная отложенная запись избранных, черного списка и просмотренных
+        ranking_weights - веса признаков при ранжировании кандидатов (см. ranking.DEFAULT_WEIGHTS)
+        vk_session, user_session, db, vk_service, longpoll - готовые клиенты вместо создаваемых
+        по config (например, поддельные для нагрузочного теста)
+        session_backend - общее хранилище сессий и позиций поиска для нескольких процессов
+        (см. shared_sessions.SqliteSessionBackend); по умолчанию всё хранится в памяти процесса
+        snapshot_path - файл снимка сессий: сессии сохраняются в него раз в snapshot_interval секунд
+        и при остановке, а после перезапуска восстанавливаются при следующем событии пользователя
+        handler_budget - сколько секунд обработчик может ждать запросов к VK (повторы, очередь
+        за лимитом параллельности); дальше запрос завершается ошибкой
+        max_event_age - события старше стольких секунд отбрасываются (0 - обрабатывать все)
+        shed_threshold - при стольких событиях в очередях обработки справка и меню
+        отбрасываются (0 - не отбрасывать)
+        outbound_rate, outbound_burst - лимит отправки сообщений этим процессом (в секунду и пачкой);
+        в режиме --shards лимит токена группы делится между процессами
+
+        Клиенты VK и соединения с БД создаются в фоне параллельно: конструктор
+        не ждёт сети, обработчики дожидаются только нужного им клиента.
+        """
+        # Метрики: время обработчиков, вызовов VK и БД, задержка событий
+        self.metrics = BotMetrics()
+
+        # Таблица команд и клавиатуры, сериализованные один раз
+        self.router = CommandRouter()
+        self.keyboards = KeyboardCache()
+
+        # Склейка повторных нажатий, устаревшие события и сброс нагрузки
+        self.preprocessor = EventPreprocessor(self.router, max_age=max_event_age, shed_threshold=shed_threshold)
+
+        # Клиенты, которые не передали готовыми, создаются в фоне (см. lazy.LazyClient)
+        self.startup = Startup()
+
+        self.vk_session = vk_session or LazyClient(lambda: vk_api.VkApi(token=VK_GROUP_TOKEN), 'vk_session')
+        self.vk = LazyClient(lambda: self.vk_session.get_api(), 'vk')
+
+        # Исходящие сообщения отправляются отдельным потоком с учётом лимитов VK
+        self.outbound = OutboundQueue(self.vk, rate=outbound_rate, burst=outbound_burst,
+                                      coalesce_window=coalesce_window)
+        self.outbound.start()
+
+        # Подключение к long poll - сетевой запрос, его ждёт только run()
+        self.longpoll = longpoll or LazyClient(lambda: VkLongPoll(self.vk_session), 'longpoll')
+        injected_db = db is not None
+        database = None
+        if injected_db:
+            db = SynchronizedProxy(db)
+        elif db_pool_size > 0:
+            db = PooledDatabase(lambda: Database(**DB_CONFIG), size=db_pool_size)
+        else:
+            # Соединение с БД одно на все обработчики - сериализуем запросы
+            database = LazyClient(lambda: Database(**DB_CONFIG), 'database')
+            db = SynchronizedProxy(database)
+        self.db = self.metrics.instrument(db, 'database')
+
+        # Пул соединений для запросов в обход Database: страницы избранных и пакетная запись
+        self.db_pool = None
+        self.write_behind = None
+        if not injected_db:
+            self.db_pool = LazyClient(lambda: ConnectionPool(DB_CONFIG, size=db_pool_size or DEFAULT_POOL_SIZE),
+                                      'db_pool')
+        if write_behind and self.db_pool:
+            self.write_behind = WriteBehindBuffer(self.db_pool)
+
+        # Избранные читаются из БД страницами; готовая БД должна сама уметь отдавать страницы
+        favorites_index = None
+        if self.db_pool:
+            favorites_store = FavoritesRepository(self.db_pool)
+            favorites_index = favorites_store.ensure_index
+        else:
+            favorites_store = db
+        self.favorites = FavoritesPager(self.metrics.instrument(favorites_store, 'favorites'))
 
         # Создаём отдельную сессию для поиска (с пользовательским токеном)
-        self.user_session = vk_api.VkApi(token=VK_USER_TOKEN)
-        self.vk_service = VKService(self.vk_session, self.user_session)
-
-        # Состояния пользователей
-        self.user_states = {}
+        user_session = user_session or LazyClient(lambda: vk_api.VkApi(token=VK_USER_TOKEN), 'user_session')
+        # Запросы VKService, поиска и справочника городов идут через слой выполнения (vk_executor):
+        # адаптивная параллельность, повторы, выключатель и бюджет времени обработчика.
+        # Отправка сообщений (self.vk) повторяет ошибки сама, long poll работает напрямую
+        self.user_session = resilient(user_session, 'user')
+        self.group_api = resilient(self.vk_session, 'group')
+        self.handler_budget = handler_budget
+        if vk_service is None:
+            vk_service = LazyClient(lambda: BatchVKService(self.group_api, self.user_session), 'vk_service')
+        self.response_cache = CachedVKService(vk_service, backend=cache_backend or MemoryCacheBackend())
+        self.vk_service = self.metrics.instrument(self.response_cache, 'vk_service')
+
+        # Фоновая загрузка фото следующих кандидатов
+        self.prefetcher = PhotoPrefetcher(self.vk_service.get_popular_photos, depth=prefetch_depth)
+
+        # Состояния пользователей (простаивающие сессии удаляются автоматически)
+        if session_backend is not None:
+            self.user_states = SharedSessionStore(session_backend, restore_cursor=self.restore_cursor,
+                                                  on_evict=self.prefetcher.cancel)
+        else:
+            self.user_states = SessionStore(on_evict=self.prefetcher.cancel, restore=self.restore_session)
+
+        # Снимок сессий: после перезапуска пользователь продолжит с того же кандидата
+        self.snapshot = None
+        self.snapshot_interval = snapshot_interval
+        if snapshot_path and session_backend is None:
+            self.snapshot = SessionSnapshot(snapshot_path)
+
+        # Результаты поиска, общие для пользователей с одинаковыми параметрами
+        # Справочник городов: ID города для поиска берётся из него, а не из VK
+        self.cities = CityIndex(self.user_session)
+        self.user_cities = None
+        if self.db_pool:
+            self.user_cities = UserCities(self.db_pool)
+        self.candidate_pool = CandidatePool(self.user_session, city_resolver=self.cities.city_id)
+
+        # Порядок показа кандидатов
+        self.ranker = CandidateRanker(ranking_weights)
+
+        # Где остановился каждый пользователь в результатах поиска
+        if session_backend is not None:
+            self.search_positions = SharedSearchPositions(session_backend)
+        else:
+            self.search_positions = SearchPositions()
+
+        # Черный список, избранные и просмотренные - для фильтрации результатов поиска
+        self.exclusions = ExclusionIndex(self.db, pool=self.db_pool)
+
+        self.metrics.instrument_handlers(self, extra=('show_next_candidate', 'process_settings_input'))
+        registry = self.metrics.registry
+        registry.gauge('vkinder_user_states', 'Число сессий пользователей', lambda: len(self.user_states))
+        registry.gauge('vkinder_user_states_bytes', 'Объём кандидатов в сессиях, байт',
+                       lambda: self.user_states.stats()['bytes'])
+        registry.gauge('vkinder_outbound_queue_depth', 'Сообщений в очереди отправки', self.outbound.depth)
+        registry.gauge('vkinder_outbound_latency_p99_seconds', 'Задержка messages.send с учётом очереди (p99)',
+                       lambda: self.outbound.stats()['latency_p99'])
+        registry.counter_func('vkinder_prefetch_hits_total', 'Фото кандидатов, найденные в предзагрузке',
+                              lambda: self.prefetcher.hits)
+        registry.counter_func('vkinder_prefetch_misses_total', 'Фото кандидатов, загруженные синхронно',
+                              lambda: self.prefetcher.misses)
+        registry.counter_func('vkinder_cache_hits_total', 'Ответы VK, отданные из кэша',
+                              lambda: self.response_cache.stats()['hits'], labelname='method')
+        registry.counter_func('vkinder_cache_misses_total', 'Запросы к VK мимо кэша (нет записи или она устарела)',
+                              lambda: self.response_cache.stats()['misses'], labelname='method')
+        registry.counter_func('vkinder_cache_stale_total', 'Устаревшие ответы, отданные при недоступности VK',
+                              lambda: self.response_cache.stats()['stale'], labelname='method')
+        registry.gauge('vkinder_cache_entries', 'Записей в кэше ответов VK',
+                       lambda: self.response_cache.stats()['entries'])
+        registry.gauge('vkinder_vk_concurrency_limit', 'Лимит параллельных запросов VK (токен пользователя)',
+                       lambda: self.user_session.limiter.limit)
+        registry.gauge('vkinder_vk_circuit_open', 'Выключатель запросов VK разомкнут (токен пользователя)',
+                       lambda: int(self.user_session.breaker.state != 'closed'))
+        registry.counter_func('vkinder_events_coalesced_total', 'Повторные нажатия, склеенные с предыдущим событием',
+                              lambda: self.preprocessor.coalesced)
+        registry.counter_func('vkinder_events_shed_total', 'Команды справки и меню, отброшенные при перегрузке',
+                              lambda: self.preprocessor.shed)
+        registry.counter_func('vkinder_events_stale_total', 'Устаревшие навигационные команды, отброшенные без выполнения',
+                              lambda: self.preprocessor.stale)
+
+        # Зависимые клиенты запускаются после тех, от которых зависят
+        self.startup.start(self.vk_session, user_session, database, self.db_pool,
+                           self.longpoll, self.vk, vk_service)
+        # Задачи с БД - после запуска клиентов: иначе задача создаст пул сама, и start() будет его ждать
+        if favorites_index:
+            self.startup.submit(favorites_index, 'favorites_index')
+        if self.user_cities:
+            self.startup.submit(self.user_cities.ensure_column, 'user_city_column')
 
     def get_main_keyboard(self):
-        """Создание главной клавиатуры"""
-        keyboard = VkKeyboard(one_time=True)
-        keyboard.add_button('🔍 Поиск', VkKeyboardColor.PRIMARY)
-        keyboard.add_button('❤️ Избранные', VkKeyboardColor.POSITIVE)
-        keyboard.add_line()
-        keyboard.add_button('Настройки', VkKeyboardColor.SECONDARY)  # Убрали эмодзи
-        keyboard.add_button('ℹ️ Помощь', VkKeyboardColor.SECONDARY)
-        return keyboard.get_keyboard()
+        """Главная клавиатура"""
+        return self.keyboards['main']
 
     def get_search_keyboard(self):
-        """Создание клавиатуры для поиска"""
-        keyboard = VkKeyboard(one_time=True)
-        keyboard.add_button('❤️ В избранное', VkKeyboardColor.POSITIVE)
-        keyboard.add_button('👎 В черный список', VkKeyboardColor.NEGATIVE)
-        keyboard.add_line()
-        keyboard.add_button('▶️ Следующий', VkKeyboardColor.PRIMARY)
-        keyboard.add_button('🏠 Главное меню', VkKeyboardColor.SECONDARY)
-        return keyboard.get_keyboard()
+        """Клавиатура для поиска"""
+        return self.keyboards['search']
 
     def get_settings_keyboard(self):
-        """Создание клавиатуры для настроек"""
-        keyboard = VkKeyboard(one_time=True)
-        keyboard.add_button('🚻 Изменить пол', VkKeyboardColor.PRIMARY)
-        keyboard.add_button('🎂 Изменить возраст', VkKeyboardColor.PRIMARY)
-        keyboard.add_line()
-        keyboard.add_button('🏙️ Изменить город', VkKeyboardColor.PRIMARY)
-        keyboard.add_button('📊 Показать настройки', VkKeyboardColor.SECONDARY)
-        keyboard.add_line()
-        keyboard.add_button('🏠 Главное меню', VkKeyboardColor.SECONDARY)
-        return keyboard.get_keyboard()
+        """Клавиатура для настроек"""
+        return self.keyboards['settings']
 
     def get_favorites_keyboard(self):
-        """Создание клавиатуры для избранных"""
-        keyboard = VkKeyboard(one_time=True)
-        keyboard.add_button('📋 Показать избранных', VkKeyboardColor.PRIMARY)
-        keyboard.add_button('🗑️ Очистить избранных', VkKeyboardColor.NEGATIVE)
-        keyboard.add_line()
-        keyboard.add_button('🏠 Главное меню', VkKeyboardColor.SECONDARY)
-        return keyboard.get_keyboard()
+        """Клавиатура для избранных"""
+        return self.keyboards['favorites']
+
+    def get_favorites_page_keyboard(self, page):
+        """Клавиатура страницы избранных с кнопками листания"""
+        if page['has_prev'] and page['has_next']:
+            return self.keyboards['favorites_both']
+        if page['has_prev']:
+            return self.keyboards['favorites_prev']
+        if page['has_next']:
+            return self.keyboards['favorites_next']
+        return self.keyboards['favorites']
+
+    def get_sex_keyboard(self):
+        """Клавиатура выбора пола"""
+        return self.keyboards['sex']
+
+    def get_cancel_keyboard(self):
+        """Клавиатура с кнопкой отмены"""
+        return self.keyboards['cancel']
+
+    def get_city_keyboard(self):
+        """Клавиатура выбора города"""
+        return self.keyboards['city']
+
+    def format_candidate(self, candidate, photos):
+        """Формирование карточки кандидата: текст сообщения и attachment с фотографиями"""
+        message = f"""👤 {candidate['first_name']} {candidate['last_name']}
+🎂 {candidate.get('age', 'Не указан')} лет
+🏙️ {candidate.get('city', 'Город не указан')}
+🔗 https://vk.com/id{candidate['id']}
+
+📸 Популярные фотографии профиля:"""
+
+        # Формируем attachment для фотографий
+        attachments = []
+        for photo in photos[:3]:  # Максимум 3 фото
+            attachments.append(f"photo{photo['owner_id']}_{photo['id']}")
+
+        attachment = ','.join(attachments) if attachments else None
+        return message, attachment
+
+    def format_favorites(self, favorites, page=None):
+        """Формирование страницы списка избранных"""
+        offset = page['offset'] if page else 0
+        message = "❤️ Ваши избранные:\n\n"
+        for i, fav in enumerate(favorites, offset + 1):
+            message += f"{i}. {fav['first_name']} {fav['last_name']}\n"
+            message += f"   🔗 https://vk.com/id{fav['candidate_id']}\n\n"
+
+        if page and (page['has_prev'] or page['has_next']):
+            message += f"Показаны {offset + 1}–{offset + len(favorites)} из {page['total']}"
+
+        return message
+
+    def format_city_not_found(self, text, suggestions):
+        """Ответ на неизвестный город с вариантами"""
+        message = f"❌ Город '{text}' не найден."
+        if suggestions:
+            message += "\n\nВозможно, вы имели в виду:\n" + "\n".join(f"• {c.title}" for c in suggestions)
+        else:
+            message += " Проверьте название и отправьте его ещё раз."
+        return message
+
+    def format_settings(self, user_info):
+        """Формирование текста с настройками поиска"""
+        sex_text = "Не указан"
+        if user_info.get('sex') == 1:
+            sex_text = "Женский"
+        elif user_info.get('sex') == 2:
+            sex_text = "Мужской"
+
+        return f"""⚙️ Ваши настройки поиска:
+
+🚻 Пол: {sex_text}
+🎂 Возраст: {user_info.get('age', 'Не указан')} лет
+🏙️ Город: {user_info.get('city', 'Не указан')}
+
+Выберите, что хотите изменить:"""
 
     def send_message(self, user_id, message, keyboard=None, attachment=None):
-        """Отправка сообщения пользователю"""
-        try:
-            self.vk.messages.send(
-                user_id=user_id,
-                message=message,
-                keyboard=keyboard,
-                attachment=attachment,
-                random_id=get_random_id()
-            )
-        except Exception as e:
-            logger.error(f"Ошибка отправки сообщения пользователю {user_id}: {e}")
+        """Отправка сообщения пользователю (через очередь исходящих)"""
+        self.outbound.send(user_id, message, keyboard, attachment)
 
     def handle_start(self, user_id):
         """Обработка команды /start"""
@@ -110,17 +369,7 @@ class VKinderBot:
             # Сохраняем пользователя в БД
             self.db.add_user(user_info)
 
-            welcome_msg = f"""👋 Привет, {user_info['first_name']}!
-
-🤖 Я VKinder - бот для поиска людей для знакомств в ВКонтакте!
-
-✨ Что я умею:
-• Искать людей для знакомств по вашим параметрам
-• Показывать самые популярные фото профилей
-• Сохранять понравившихся людей в избранное
-• Добавлять неподходящих в черный список
-
-🚀 Давайте начнем! Выберите действие:"""
+            welcome_msg = WELCOME_TEMPLATE.format(first_name=user_info['first_name'])
 
             self.send_message(user_id, welcome_msg, self.get_main_keyboard())
 
@@ -137,11 +386,23 @@ class VKinderBot:
                 self.send_message(user_id, "❌ Сначала нужно запустить бота командой /start")
                 return
 
+            # Результаты предыдущего поиска больше не нужны
+            self.prefetcher.cancel(user_id)
+
             # Ищем людей для знакомств
             self.send_message(user_id, "🔍 Ищу подходящих людей для знакомства...")
 
-            candidates = self.vk_service.search_people(user_info)
+            # Продолжаем с того места, где пользователь остановился в прошлый раз
+            offset = self.search_positions.get(user_id, self.candidate_pool.key(user_info))
+            cursor = self.make_cursor(user_id, user_info, offset)
+
+            # Первая страница маленькая - первого человека покажем сразу после неё
+            candidates = CandidateList(cursor.next_page(FIRST_PAGE_SIZE))
+            while not candidates and not cursor.exhausted:
+                candidates.extend(cursor.next_page())
+
             if not candidates:
+                self.search_positions.reset(user_id)
                 self.send_message(
                     user_id,
                     "😔 К сожалению, не нашел подходящих кандидатов. Попробуйте изменить параметры поиска в настройках.",
@@ -149,19 +410,47 @@ class VKinderBot:
                 )
                 return
 
-            # Сохраняем кандидатов в состоянии пользователя
+            # Сохраняем кандидатов и курсор поиска в состоянии пользователя
             self.user_states[user_id] = {
                 'candidates': candidates,
+                'cursor': cursor,
                 'current_index': 0,
                 'mode': 'search'
             }
 
+            # Фото первой страницы кандидатов - одним запросом execute
+            first_page = [candidate['id'] for candidate in candidates[:EXECUTE_BATCH_SIZE]]
+            self.prefetcher.warm(user_id, self.vk_service.get_popular_photos_many(first_page))
+
             self.show_next_candidate(user_id)
 
         except Exception as e:
             logger.error(f"Ошибка в handle_search для пользователя {user_id}: {e}")
             self.send_message(user_id, "❌ Ошибка при поиске. Попробуйте позже.")
 
+    def make_cursor(self, user_id, user_info, offset=0):
+        """Курсор поиска пользователя по общему пулу кандидатов"""
+        return self.candidate_pool.cursor(
+            user_info, offset=offset,
+            exclude=lambda page: self.exclusions.filter(user_id, page),
+            rank=lambda page: self.ranker.rank(page, user_info)
+        )
+
+    def restore_session(self, user_id):
+        """Сессия пользователя из снимка, сохранённого до перезапуска"""
+        if self.snapshot is None:
+            return None
+        return self.snapshot.take(user_id, lambda position: self.restore_cursor(user_id, position))
+
+    def restore_cursor(self, user_id, position):
+        """Курсор поиска сессии, загруженной из общего хранилища (None - дальше буфера не листать)"""
+        user_info = self.db.get_user(user_id)
+        if not user_info:
+            return None
+        cursor = self.make_cursor(user_id, user_info)
+        cursor.seek(position)
+        return cursor
+
     def show_next_candidate(self, user_id):
         """Показ следующего кандидата"""
         try:
@@ -173,48 +462,60 @@ class VKinderBot:
             candidates = state['candidates']
             current_index = state['current_index']
 
+            # Буфер закончился раньше, чем подгрузилась следующая страница
             if current_index >= len(candidates):
+                self.load_more_candidates(state, current_index + 1)
+
+            if current_index >= len(candidates):
+                self.search_positions.reset(user_id)
                 self.send_message(
                     user_id,
                     "🎉 Вы просмотрели всех найденных людей!\n\nХотите начать новый поиск?",
                     self.get_main_keyboard()
                 )
                 del self.user_states[user_id]
+                self.prefetcher.cancel(user_id)
                 return
 
             candidate = candidates[current_index]
 
-            # Получаем фотографии кандидата
-            photos = self.vk_service.get_popular_photos(candidate['id'])
-
-            # Формируем сообщение
-            message = f"""👤 {candidate['first_name']} {candidate['last_name']}
-🎂 {candidate.get('age', 'Не указан')} лет
-🏙️ {candidate.get('city', 'Город не указан')}
-🔗 https://vk.com/id{candidate['id']}
-
-📸 Популярные фотографии профиля:"""
-
-            # Формируем attachment для фотографий
-            attachments = []
-            for photo in photos[:3]:  # Максимум 3 фото
-                attachments.append(f"photo{photo['owner_id']}_{photo['id']}")
+            # Получаем фотографии кандидата (обычно уже загружены заранее)
+            photos = self.prefetcher.get(user_id, candidate['id'])
 
-            attachment = ','.join(attachments) if attachments else None
+            message, attachment = self.format_candidate(candidate, photos)
 
             self.send_message(user_id, message, self.get_search_keyboard(), attachment)
 
             # Сохраняем текущего кандидата
             state['current_candidate'] = candidate
+            self.exclusions.mark_seen(user_id, candidate['id'])
+            if self.write_behind:
+                self.write_behind.add_viewed(user_id, candidate['id'])
+
+            # Запоминаем позицию, чтобы новый поиск продолжился отсюда
+            cursor = state.get('cursor')
+            if cursor:
+                self.search_positions.save(user_id, cursor.key, cursor.resume_offset(current_index))
+
+            # Пока пользователь смотрит карточку, подгружаем следующую страницу и фото
+            self.load_more_candidates(state, current_index + 1 + LOOKAHEAD)
+            self.prefetcher.schedule(user_id, candidates, current_index + 1)
 
         except Exception as e:
             logger.error(f"Ошибка в show_next_candidate для пользователя {user_id}: {e}")
             self.send_message(user_id, "❌ Ошибка при показе кандидата.")
 
-    def handle_next_candidate(self, user_id):
-        """Переход к следующему кандидату"""
+    def load_more_candidates(self, state, needed):
+        """Подгрузка страниц поиска, пока в буфере меньше needed кандидатов"""
+        cursor = state.get('cursor')
+        candidates = state['candidates']
+        while cursor and not cursor.exhausted and len(candidates) < needed:
+            candidates.extend(cursor.next_page())
+
+    def handle_next_candidate(self, user_id, steps=1):
+        """Переход к следующему кандидату (steps > 1 - склеенные нажатия: пропускаем steps - 1 карточек)"""
         if user_id in self.user_states:
-            self.user_states[user_id]['current_index'] += 1
+            self.user_states[user_id]['current_index'] += steps
             self.show_next_candidate(user_id)
         else:
             self.send_message(user_id, "❌ Сначала начните поиск", self.get_main_keyboard())
@@ -234,12 +535,7 @@ class VKinderBot:
             candidate = state['current_candidate']
 
             # Добавляем в избранное в БД с именами
-            success = self.db.add_to_favorites(
-                user_id,
-                candidate['id'],
-                candidate['first_name'],
-                candidate['last_name']
-            )
+            success = self.save_favorite(user_id, candidate)
 
             if success:
                 self.send_message(user_id, f"❤️ {candidate['first_name']} добавлен(а) в избранное!")
@@ -253,6 +549,35 @@ class VKinderBot:
             logger.error(f"Ошибка в handle_add_to_favorites для пользователя {user_id}: {e}")
             self.send_message(user_id, "❌ Ошибка при добавлении в избранное.")
 
+    def save_favorite(self, user_id, candidate):
+        """Сохранение в избранное; False, если человек уже в избранных"""
+        if self.write_behind:
+            # Дубликат определяем по индексу и буферу - без запроса к БД
+            if self.exclusions.is_favorite(user_id, candidate['id']):
+                return False
+            success = self.write_behind.add_favorite(
+                user_id, candidate['id'], candidate['first_name'], candidate['last_name']
+            )
+        else:
+            success = self.db.add_to_favorites(
+                user_id,
+                candidate['id'],
+                candidate['first_name'],
+                candidate['last_name']
+            )
+
+        if success:
+            self.exclusions.add_favorite(user_id, candidate['id'])
+        return success
+
+    def save_blacklist(self, user_id, candidate):
+        """Сохранение в черный список"""
+        if self.write_behind:
+            self.write_behind.add_blacklist(user_id, candidate['id'])
+        else:
+            self.db.add_to_blacklist(user_id, candidate['id'])
+        self.exclusions.add_blacklist(user_id, candidate['id'])
+
     def handle_add_to_blacklist(self, user_id):
         """Добавление в черный список"""
         try:
@@ -268,7 +593,7 @@ class VKinderBot:
             candidate = state['current_candidate']
 
             # Добавляем в черный список в БД
-            self.db.add_to_blacklist(user_id, candidate['id'])
+            self.save_blacklist(user_id, candidate)
             self.send_message(user_id, f"👎 {candidate['first_name']} добавлен(а) в черный список")
 
             # Автоматически переходим к следующему
@@ -279,9 +604,26 @@ class VKinderBot:
             self.send_message(user_id, "❌ Ошибка при добавлении в черный список.")
 
     def handle_show_favorites(self, user_id):
-        """Показ списка избранных"""
+        """Показ первой страницы избранных"""
+        self._show_favorites_page(user_id, lambda state: self.favorites.first(user_id))
+
+    def handle_favorites_next(self, user_id):
+        """Следующая страница избранных"""
+        self._show_favorites_page(user_id, lambda state: self.favorites.next(user_id, state))
+
+    def handle_favorites_prev(self, user_id):
+        """Предыдущая страница избранных"""
+        self._show_favorites_page(user_id, lambda state: self.favorites.prev(user_id, state))
+
+    def _show_favorites_page(self, user_id, load):
+        """Загрузка страницы избранных; положение листания хранится в сессии"""
         try:
-            favorites = self.db.get_favorites(user_id)
+            session = self.user_states.get(user_id)
+            state = session.get('favorites_page') if session else None
+            if state is None or state['first'] is None:
+                favorites, page = self.favorites.first(user_id)
+            else:
+                favorites, page = load(state)
 
             if not favorites:
                 self.send_message(
@@ -291,15 +633,12 @@ class VKinderBot:
                 )
                 return
 
-            message = "❤️ Ваши избранные:\n\n"
-            for i, fav in enumerate(favorites[:10], 1):  # Показываем максимум 10
-                message += f"{i}. {fav['first_name']} {fav['last_name']}\n"
-                message += f"   🔗 https://vk.com/id{fav['candidate_id']}\n\n"
+            if session is None:
+                session = {}
+                self.user_states[user_id] = session
+            session['favorites_page'] = page
 
-            if len(favorites) > 10:
-                message += f"... и еще {len(favorites) - 10} человек(а)"
-
-            self.send_message(user_id, message, self.get_favorites_keyboard())
+            self.send_message(user_id, self.format_favorites(favorites, page), self.get_favorites_page_keyboard(page))
 
         except Exception as e:
             logger.error(f"Ошибка в handle_show_favorites для пользователя {user_id}: {e}")
@@ -308,7 +647,14 @@ class VKinderBot:
     def handle_clear_favorites(self, user_id):
         """Очистка списка избранных"""
         try:
-            self.db.clear_favorites(user_id)
+            if self.write_behind:
+                self.write_behind.clear_favorites(user_id, self.db.clear_favorites)
+            else:
+                self.db.clear_favorites(user_id)
+            self.exclusions.clear_favorites(user_id)
+            session = self.user_states.get(user_id)
+            if session:
+                session.pop('favorites_page', None)
             self.send_message(
                 user_id,
                 "🗑️ Список избранных очищен!",
@@ -327,21 +673,7 @@ class VKinderBot:
                 self.send_message(user_id, "❌ Сначала запустите бота командой /start")
                 return
 
-            sex_text = "Не указан"
-            if user_info.get('sex') == 1:
-                sex_text = "Женский"
-            elif user_info.get('sex') == 2:
-                sex_text = "Мужской"
-
-            settings_text = f"""⚙️ Ваши настройки поиска:
-
-🚻 Пол: {sex_text}
-🎂 Возраст: {user_info.get('age', 'Не указан')} лет
-🏙️ Город: {user_info.get('city', 'Не указан')}
-
-Выберите, что хотите изменить:"""
-
-            self.send_message(user_id, settings_text, self.get_settings_keyboard())
+            self.send_message(user_id, self.format_settings(user_info), self.get_settings_keyboard())
 
         except Exception as e:
             logger.error(f"Ошибка в handle_settings для пользователя {user_id}: {e}")
@@ -352,22 +684,9 @@ class VKinderBot:
         try:
             # Сохраняем состояние - ожидаем ввод пола
             self.user_states[user_id] = {'mode': 'waiting_sex'}
+            self.prefetcher.cancel(user_id)
 
-            message = """🚻 Укажите ваш пол:
-
-Отправьте:
-1 - Женский
-2 - Мужской
-
-Это нужно, чтобы подбирать вам подходящих людей."""
-
-            keyboard = VkKeyboard(one_time=True)
-            keyboard.add_button('1 - Женский', VkKeyboardColor.POSITIVE)
-            keyboard.add_button('2 - Мужской', VkKeyboardColor.PRIMARY)
-            keyboard.add_line()
-            keyboard.add_button('❌ Отмена', VkKeyboardColor.NEGATIVE)
-
-            self.send_message(user_id, message, keyboard.get_keyboard())
+            self.send_message(user_id, CHANGE_SEX_TEXT, self.get_sex_keyboard())
 
         except Exception as e:
             logger.error(f"Ошибка в handle_change_sex: {e}")
@@ -378,16 +697,9 @@ class VKinderBot:
         try:
             # Сохраняем состояние - ожидаем ввод возраста
             self.user_states[user_id] = {'mode': 'waiting_age'}
+            self.prefetcher.cancel(user_id)
 
-            message = """🎂 Укажите ваш возраст:
-
-Отправьте число от 18 до 80.
-Например: 25"""
-
-            keyboard = VkKeyboard(one_time=True)
-            keyboard.add_button('❌ Отмена', VkKeyboardColor.NEGATIVE)
-
-            self.send_message(user_id, message, keyboard.get_keyboard())
+            self.send_message(user_id, CHANGE_AGE_TEXT, self.get_cancel_keyboard())
 
         except Exception as e:
             logger.error(f"Ошибка в handle_change_age: {e}")
@@ -398,28 +710,9 @@ class VKinderBot:
         try:
             # Сохраняем состояние - ожидаем ввод города
             self.user_states[user_id] = {'mode': 'waiting_city'}
+            self.prefetcher.cancel(user_id)
 
-            message = """🏙️ Укажите ваш город:
-
-Отправьте название города.
-Например: Москва
-
-Доступные города:
-• Москва
-• Санкт-Петербург
-• Новосибирск
-• Красноярск"""
-
-            keyboard = VkKeyboard(one_time=True)
-            keyboard.add_button('Москва', VkKeyboardColor.PRIMARY)
-            keyboard.add_button('Санкт-Петербург', VkKeyboardColor.PRIMARY)
-            keyboard.add_line()
-            keyboard.add_button('Новосибирск', VkKeyboardColor.PRIMARY)
-            keyboard.add_button('Красноярск', VkKeyboardColor.PRIMARY)
-            keyboard.add_line()
-            keyboard.add_button('❌ Отмена', VkKeyboardColor.NEGATIVE)
-
-            self.send_message(user_id, message, keyboard.get_keyboard())
+            self.send_message(user_id, CHANGE_CITY_TEXT, self.get_city_keyboard())
 
         except Exception as e:
             logger.error(f"Ошибка в handle_change_city: {e}")
@@ -468,26 +761,19 @@ class VKinderBot:
 
             # Обработка ввода города
             elif mode == 'waiting_city':
-                city = text.strip().lower()  # Приводим к нижнему регистру
-
-                # Проверяем, есть ли такой город в списке
-                if city in ['москва', 'санкт-петербург', 'новосибирск', 'пермь', 'казань',
-                            'нижний новгород', 'челябинск', 'самара', 'омск', 'ростов-на-дону',
-                            'уфа', 'красноярск', 'воронеж', 'волгоград', 'краснодар', 'саратов',
-                            'тюмень', 'тольятти', 'ижевск', 'елабуга', 'набережные челны', 'екатеринбург']:
+                city, suggestions = self.cities.resolve(text)
 
-                    self.db.update_user_city(user_id, city)
+                if city:
+                    self.db.update_user_city(user_id, city.title.lower())
+                    if self.user_cities:
+                        self.user_cities.set_city_id(user_id, city.id)
+                    logger.debug(f"Город пользователя {user_id} изменён на '{city.title}' ({city.id})")
 
-                    # Проверяем что сохранилось
-                    updated_user = self.db.get_user(user_id)
-                    logger.info(f"После обновления город в БД: '{updated_user.get('city')}'")
-
-                    self.send_message(user_id, f"✅ Город изменён на: {city.title()}", self.get_settings_keyboard())
+                    self.send_message(user_id, f"✅ Город изменён на: {city.title}", self.get_settings_keyboard())
                     del self.user_states[user_id]
                     return True
                 else:
-                    self.send_message(user_id,
-                                      f"❌ Город '{city}' не найден в списке. Выберите из доступных или напишите точное название.")
+                    self.send_message(user_id, self.format_city_not_found(text, suggestions))
                     return True
 
             return False
@@ -498,98 +784,63 @@ class VKinderBot:
 
     def handle_help(self, user_id):
         """Показ справки"""
-        help_text = """ℹ️ Справка по VKinder:
-
-🔍 Поиск - поиск людей для знакомства
-❤️ Избранные - управление списком избранных
-⚙️ Настройки - настройки профиля (в разработке)
-
-Во время поиска:
-❤️ В избранное - добавить человека в избранные
-👎 В черный список - больше не показывать
-▶️ Следующий - перейти к следующему человеку
-
-📞 Техподдержка: karalash.anka@yandex.ru"""
+        self.send_message(user_id, HELP_TEXT, self.get_main_keyboard())
 
-        self.send_message(user_id, help_text, self.get_main_keyboard())
-
-    def handle_message(self, event):
-        """Обработка входящих сообщений"""
+    def handle_cancel(self, user_id):
+        """Отмена текущего действия"""
+        if user_id in self.user_states:
+            del self.user_states[user_id]
+        self.prefetcher.cancel(user_id)
+        self.send_message(user_id, "❌ Отменено", self.get_main_keyboard())
+
+    def handle_favorites_menu(self, user_id):
+        """Меню избранных"""
+        self.send_message(user_id, "❤️ Избранные:", self.get_favorites_keyboard())
+
+    def handle_main_menu(self, user_id):
+        """Возврат в главное меню"""
+        self.prefetcher.cancel(user_id)
+        self.send_message(user_id, "🏠 Главное меню:", self.get_main_keyboard())
+
+    def handle_unknown(self, user_id, text):
+        """Ответ на неизвестную команду"""
+        # Логируем неизвестную команду для отладки
+        logger.info(f"Неизвестная команда от {user_id}: '{text}'")
+        self.send_message(
+            user_id,
+            f"🤔 Не понимаю команду '{text}'.\n\nВыберите действие из меню:",
+            self.get_main_keyboard()
+        )
+
+    def process_pending(self, item):
+        """Обработка события из очереди (см. preprocess.EventPreprocessor)"""
+        event, repeat = self.preprocessor.take(item)
+        if event is not None:
+            self.handle_message(event, repeat)
+
+    def handle_message(self, event, repeat=1):
+        """Обработка входящих сообщений; repeat - сколько одинаковых нажатий склеено в событии"""
         user_id = event.user_id
         message = event.text.lower().strip()
+        self.metrics.observe_event(event)
+
+        with log_context(user_id=user_id), self.user_states.session(user_id), call_budget(self.handler_budget):
+            self._handle_message(event, user_id, message, repeat)
 
+    def _handle_message(self, event, user_id, message, repeat=1):
         try:
-            # Сначала проверяем, не ожидаем ли мы ввод настроек
-            if self.process_settings_input(user_id, message):
-                return
+            handler = self.router.resolve(message, event_payload(event))
 
-            # Отмена
-            if message in ['❌ отмена', 'отмена']:
-                if user_id in self.user_states:
-                    del self.user_states[user_id]
-                self.send_message(user_id, "❌ Отменено", self.get_main_keyboard())
+            # Ввод настроек ожидается до любой команды, кроме отмены
+            if handler != 'handle_cancel' and self.process_settings_input(user_id, message):
                 return
 
-            # Команды и кнопки
-            if message in ['/start', 'начать', 'привет', 'старт']:
-                self.handle_start(user_id)
-
-            elif message in ['🔍 поиск', 'поиск']:
-                self.handle_search(user_id)
-
-            elif message in ['▶️ следующий', 'следующий', 'далее']:
-                self.handle_next_candidate(user_id)
-
-            elif message in ['❤️ в избранное', 'в избранное', 'лайк']:
-                self.handle_add_to_favorites(user_id)
-
-            elif message in ['👎 в черный список', 'в черный список', 'дизлайк']:
-                self.handle_add_to_blacklist(user_id)
-
-            elif message in ['❤️ избранные', 'избранные']:
-                self.send_message(user_id, "❤️ Избранные:", self.get_favorites_keyboard())
-
-            elif message in ['📋 показать избранных', 'показать избранных']:
-                self.handle_show_favorites(user_id)
-
-            elif message in ['🗑️ очистить избранных', 'очистить избранных']:
-                self.handle_clear_favorites(user_id)
-
-            elif message in ['⚙️ настройки', 'настройки', '⚙ настройки', 'настройки⚙️', 'настройка']:
-                self.handle_settings(user_id)
-
-            elif message in ['🚻 изменить пол', 'изменить пол', 'пол']:
-                self.handle_change_sex(user_id)
-
-            elif message in ['🎂 изменить возраст', 'изменить возраст', 'возраст']:
-                self.handle_change_age(user_id)
-
-            elif message in ['🏙️ изменить город', 'изменить город', 'город', '🏙 изменить город']:
-                self.handle_change_city(user_id)
-
-            elif message in ['📊 показать настройки', 'показать настройки']:
-                self.handle_settings(user_id)
-
-            elif message in ['🏠 главное меню', 'главное меню', 'меню']:
-                self.send_message(
-                    user_id,
-                    "🏠 Главное меню:",
-                    self.get_main_keyboard()
-                )
-
-            elif message in ['ℹ️ помощь', 'помощь', 'help']:
-                self.handle_help(user_id)
-
+            if handler and repeat > 1:
+                getattr(self, handler)(user_id, repeat)
+            elif handler:
+                getattr(self, handler)(user_id)
             else:
-                # Логируем неизвестную команду для отладки
-                logger.info(f"Неизвестная команда от {user_id}: '{message}'")
-
-                # Неизвестная команда
-                self.send_message(
-                    user_id,
-                    f"🤔 Не понимаю команду '{event.text}'.\n\nВыберите действие из меню:",
-                    self.get_main_keyboard()
-                )
+                self.handle_unknown(user_id, event.text)
 
         except Exception as e:
             logger.error(f"Ошибка при обработке сообщения от {user_id}: {e}")
@@ -599,15 +850,40 @@ class VKinderBot:
                 self.get_main_keyboard()
             )
 
-    def run(self):
-        """Запуск бота"""
+    def run(self, workers=0, queue_size=DEFAULT_QUEUE_SIZE, metrics_port=None):
+        """
+        Запуск бота.
+        При workers > 0 сообщения обрабатываются параллельно пулом из workers потоков;
+        только в этом режиме повторные нажатия, ждущие в очереди, склеиваются (см. preprocess).
+        При заданном metrics_port метрики доступны по http://127.0.0.1:<port>/metrics.
+        """
         logger.info("VKinder bot запущен!")
         print("🤖 VKinder bot запущен! Нажмите Ctrl+C для остановки.")
 
+        metrics_server = None
+        if metrics_port:
+            metrics_server = MetricsServer(self.metrics.registry, port=metrics_port)
+            metrics_server.start()
+
+        if self.snapshot is not None:
+            self.snapshot.start(self.user_states, self.snapshot_interval)
+
+        dispatcher = None
+        if workers > 0:
+            dispatcher = EventDispatcher(self.process_pending, workers=workers, queue_size=queue_size)
+            dispatcher.start()
+
         try:
             for event in self.longpoll.listen():
                 if event.type == VkEventType.MESSAGE_NEW and event.to_me:
-                    self.handle_message(event)
+                    item = self.preprocessor.admit(event, dispatcher.pending() if dispatcher else 0)
+                    if item is None:
+                        continue
+                    if dispatcher:
+                        if not dispatcher.submit(item):
+                            self.preprocessor.discard(item)
+                    else:
+                        self.process_pending(item)
 
         except KeyboardInterrupt:
             logger.info("VKinder bot остановлен пользователем")
@@ -618,9 +894,66 @@ class VKinderBot:
             print(f"❌ Критическая ошибка: {e}")
 
         finally:
+            if dispatcher:
+                # Дожидаемся обработки уже принятых событий
+                dispatcher.stop(drain=True)
+            self.prefetcher.shutdown()
+            if self.snapshot is not None:
+                # Последний снимок - после обработки всех принятых событий
+                self.snapshot.stop(self.user_states)
+            # Отправляем оставшиеся в очереди сообщения
+            self.outbound.stop()
+            if self.write_behind:
+                self.write_behind.close()
+            if self.db_pool:
+                self.db_pool.close()
+            if metrics_server:
+                metrics_server.stop()
             self.db.close()
+            self.startup.shutdown()
 
 
 if __name__ == "__main__":
-    bot = VKinderBot()
-    bot.run()
\ No newline at end of file
+    args = parse_args()
+
+    # Логи пишет фоновый поток, обработчики только кладут записи в очередь
+    setup_logging(level=args.log_level.upper(), log_file=args.log_file)
+
+    cache_backend = SqliteCacheBackend(args.cache_db) if args.cache_db else None
+
+    longpoll = None
+    if args.callback_port:
+        # Строка подтверждения и секретный ключ берутся из настроек Callback API группы
+        group_id = os.getenv('VK_GROUP_ID')
+        longpoll = CallbackServer(
+            confirmation=os.getenv('VK_CALLBACK_CONFIRMATION', ''),
+            secret=os.getenv('VK_CALLBACK_SECRET'),
+            group_id=int(group_id) if group_id else None,
+            host=args.callback_host,
+            port=args.callback_port,
+            path=args.callback_path,
+        )
+
+    if args.use_async:
+        from async_bot import AsyncVKinderBot
+        AsyncVKinderBot(cache_backend=cache_backend).run()
+    elif args.shards > 0:
+        # События принимает этот процесс, обрабатывают args.shards процессов с общими сессиями
+        runner = ShardedRunner(
+            args.shards, VKinderBot,
+            bot_kwargs=dict(prefetch_depth=args.prefetch, cache_backend=cache_backend,
+                            coalesce_window=args.coalesce, db_pool_size=args.db_pool,
+                            write_behind=args.write_behind, handler_budget=args.vk_budget,
+                            max_event_age=args.max_event_age, shed_threshold=args.shed_threshold),
+            session_db=args.session_db, workers=args.workers, worker_queue_size=args.queue_size,
+            log_level=args.log_level.upper(), log_file=args.log_file,
+        )
+        runner.run(longpoll or VkLongPoll(vk_api.VkApi(token=VK_GROUP_TOKEN)))
+    else:
+        bot = VKinderBot(prefetch_depth=args.prefetch, cache_backend=cache_backend,
+                         coalesce_window=args.coalesce, db_pool_size=args.db_pool,
+                         write_behind=args.write_behind, longpoll=longpoll,
+                         snapshot_path=args.snapshot, snapshot_interval=args.snapshot_interval,
+                         handler_budget=args.vk_budget, max_event_age=args.max_event_age,
+                         shed_threshold=args.shed_threshold)
+        bot.run(workers=args.workers, queue_size=args.queue_size, metrics_port=args.metrics_port)
\ No newline at end of file
@@ -0,0 +1,420 @@
+"""
+Метрики и профилирование VKinder
+Гистограммы задержек, счётчики ошибок, HTTP-эндпоинт в формате Prometheus
+"""
+
+import logging
+import sys
+import threading
+import time
+from collections import Counter as StackCounter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from log_setup import log_context
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержек (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Интервал семплирования профилировщика (секунды)
+PROFILER_INTERVAL = 0.01
+# Обработчики дольше этого времени попадают в лог (секунды)
+SLOW_HANDLER_SECONDS = 2.0
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{n}="{str(v)}"'.replace('\n', ' ') for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class _Metric:
+    """Общая часть метрик с метками"""
+
+    type_name = ''
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """Счётчик"""
+
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def render(self):
+        lines = self._header()
+        for key, child in list(self._children.items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {child.value}')
+        return lines
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    """Гистограмма"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def render(self):
+        lines = self._header()
+        for key, child in list(self._children.items()):
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                labels = _format_labels(self.labelnames + ('le',), key + (bound,))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames + ('le',), key + ('+Inf',))
+            lines.append(f'{self.name}_bucket{labels} {count}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Gauge(_Metric):
+    """Показатель, значение которого читается функцией в момент запроса"""
+
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, func):
+        super().__init__(name, documentation)
+        self.func = func
+
+    def render(self):
+        try:
+            value = self.func()
+        except Exception as e:
+            logger.error(f"Ошибка чтения метрики {self.name}: {e}")
+            return []
+        return self._header() + [f'{self.name} {value}']
+
+
+class CounterFunc(Gauge):
+    """
+    Счётчик, который ведёт сам компонент (например, prefetcher.hits): значение читается функцией.
+    С labelname функция возвращает словарь значение метки -> число.
+    """
+
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, func, labelname=None):
+        super().__init__(name, documentation, func)
+        self.labelnames = (labelname,) if labelname else ()
+
+    def render(self):
+        if not self.labelnames:
+            return super().render()
+        try:
+            values = self.func()
+        except Exception as e:
+            logger.error(f"Ошибка чтения метрики {self.name}: {e}")
+            return []
+        return self._header() + [f'{self.name}{_format_labels(self.labelnames, (key,))} {value}'
+                                 for key, value in sorted(values.items())]
+
+
+class MetricsRegistry:
+    """Набор метрик бота"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, func):
+        return self._register(Gauge(name, documentation, func))
+
+    def counter_func(self, name, documentation, func, labelname=None):
+        return self._register(CounterFunc(name, documentation, func, labelname))
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class BotMetrics:
+    """Метрики горячего пути бота"""
+
+    def __init__(self, registry=None):
+        self.registry = registry or MetricsRegistry()
+        self.handler_seconds = self.registry.histogram(
+            'vkinder_handler_seconds', 'Время работы обработчиков', ('handler',))
+        self.call_seconds = self.registry.histogram(
+            'vkinder_call_seconds', 'Время вызовов VKService и Database', ('component', 'method'))
+        self.call_errors = self.registry.counter(
+            'vkinder_call_errors_total', 'Ошибки вызовов VKService и Database', ('component', 'method'))
+        self.event_lag = self.registry.histogram(
+            'vkinder_event_lag_seconds', 'Возраст события long poll в момент обработки',
+            buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0))
+
+    def instrument(self, target, component):
+        """Обёртка, измеряющая время и ошибки всех методов объекта"""
+        return InstrumentedProxy(target, component, self.call_seconds, self.call_errors)
+
+    def instrument_handlers(self, bot, prefix='handle_', extra=()):
+        """Подмена обработчиков бота на версии с измерением времени"""
+        names = [n for n in dir(type(bot)) if n.startswith(prefix)] + list(extra)
+        for name in names:
+            method = getattr(bot, name)
+            if callable(method):
+                setattr(bot, name, self._timed_handler(name, method))
+
+    def _timed_handler(self, name, method):
+        histogram = self.handler_seconds.labels(handler=name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                with log_context(handler=name):
+                    return method(*args, **kwargs)
+            finally:
+                latency = time.perf_counter() - start
+                histogram.observe(latency)
+                if latency > SLOW_HANDLER_SECONDS:
+                    logger.warning(f"Медленный обработчик {name}: {latency:.2f} с",
+                                   extra={'handler': name, 'latency': round(latency, 3)})
+
+        timed.__name__ = name
+        timed.__doc__ = method.__doc__
+        return timed
+
+    def observe_event(self, event):
+        """Задержка между отправкой сообщения и началом его обработки"""
+        timestamp = getattr(event, 'timestamp', None)
+        if timestamp:
+            self.event_lag.observe(max(0.0, time.time() - timestamp))
+
+
+class InstrumentedProxy:
+    """Обёртка, измеряющая время и считающая ошибки вызовов методов объекта"""
+
+    def __init__(self, target, component, seconds, errors):
+        self._target = target
+        self._component = component
+        self._seconds = seconds
+        self._errors = errors
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr) or name.startswith('_'):
+            return attr
+
+        histogram = self._seconds.labels(component=self._component, method=name)
+        errors = self._errors.labels(component=self._component, method=name)
+
+        def measured(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - start)
+
+        return measured
+
+
+class SamplingProfiler:
+    """
+    Семплирующий профилировщик: периодически снимает стеки всех потоков
+    и считает, сколько раз встретился каждый стек.
+    """
+
+    def __init__(self, interval=PROFILER_INTERVAL):
+        self.interval = interval
+        self._stacks = StackCounter()
+        self._thread = None
+        self._running = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._running.is_set()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self._stacks = StackCounter()
+            self._running.set()
+            self._thread = threading.Thread(target=self._loop, name='vkinder-profiler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            self._running.clear()
+            if self._thread:
+                self._thread.join()
+                self._thread = None
+
+    def _loop(self):
+        own_id = threading.get_ident()
+        while self._running.is_set():
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_filename.rsplit("/", 1)[-1]}:{code.co_name}')
+                    frame = frame.f_back
+                self._stacks[';'.join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def report(self, limit=50):
+        """Самые частые стеки в "свёрнутом" формате (для flamegraph)"""
+        return '\n'.join(f'{stack} {count}' for stack, count in self._stacks.most_common(limit)) + '\n'
+
+
+class MetricsServer:
+    """
+    HTTP-сервер метрик.
+
+    GET /metrics        - метрики в формате Prometheus
+    GET /profile/start  - включить семплирующий профилировщик
+    GET /profile/stop   - выключить профилировщик и получить отчёт
+    GET /profile        - текущий отчёт профилировщика
+    """
+
+    def __init__(self, registry, host='127.0.0.1', port=9100, profiler=None):
+        self.registry = registry
+        self.profiler = profiler or SamplingProfiler()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path == '/metrics':
+                    body = server.registry.render()
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                elif path == '/profile/start':
+                    server.profiler.start()
+                    body, content_type = 'profiler started\n', 'text/plain; charset=utf-8'
+                elif path == '/profile/stop':
+                    server.profiler.stop()
+                    body, content_type = server.profiler.report(), 'text/plain; charset=utf-8'
+                elif path == '/profile':
+                    body, content_type = server.profiler.report(), 'text/plain; charset=utf-8'
+                else:
+                    self.send_error(404)
+                    return
+
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='vkinder-metrics', daemon=True)
+        self._thread.start()
+        logger.info(f"Метрики доступны на http://{self.httpd.server_address[0]}:{self.port}/metrics")
+
+    def stop(self):
+        self.profiler.stop()
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,264 @@
+"""
+Очередь исходящих сообщений
+Ограничение частоты messages.send, повтор при ошибках лимитов, склейка сообщений
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+from vk_api.exceptions import ApiError
+from vk_api.utils import get_random_id
+
+logger = logging.getLogger(__name__)
+
+# Лимит VK для ключа сообщества: 20 запросов в секунду
+DEFAULT_RATE = 20
+DEFAULT_BURST = 20
+# Окно склейки текстовых сообщений одному пользователю (секунды, 0 - не склеивать)
+DEFAULT_COALESCE_WINDOW = 0.0
+# Повторы при ошибке "слишком много запросов в секунду"
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+# Коды ошибок VK, после которых запрос стоит повторить: 6 - слишком много запросов в секунду.
+# Обычно её повторяет сам vk_api (или VkExecutor), сюда она доходит, только если их повторы исчерпаны.
+# 9 (слишком много однотипных действий) не повторяем: ограничение снимается не раньше чем через часы
+RETRY_ERROR_CODES = (6,)
+# Сколько последних задержек отправки хранить для статистики
+LATENCY_WINDOW = 1000
+
+
+class TokenBucket:
+    """Ограничитель частоты: rate токенов в секунду, не больше burst про запас"""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        """Ожидание свободного токена; False, если не дождались за timeout секунд"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class OutboundMessage:
+    """Сообщение в очереди отправки"""
+
+    __slots__ = ('user_id', 'message', 'keyboard', 'attachment', 'enqueued_at', 'attempts', 'not_before')
+
+    def __init__(self, user_id, message, keyboard=None, attachment=None):
+        self.user_id = user_id
+        self.message = message
+        self.keyboard = keyboard
+        self.attachment = attachment
+        self.enqueued_at = time.monotonic()
+        # Число неудачных попыток и время, раньше которого повтор не отправляется
+        self.attempts = 0
+        self.not_before = 0.0
+
+    def can_merge(self, other):
+        """Можно ли дописать other к этому сообщению"""
+        return (self.user_id == other.user_id and self.attachment is None
+                and (self.keyboard is None or other.keyboard is None))
+
+    def merge(self, other):
+        """Склейка с последующим сообщением тому же пользователю"""
+        self.message = f"{self.message}\n\n{other.message}" if self.message else other.message
+        self.keyboard = other.keyboard or self.keyboard
+        self.attachment = other.attachment
+
+
+class OutboundQueue:
+    """
+    Очередь исходящих сообщений с отдельным потоком отправки.
+
+    Частота messages.send ограничена TokenBucket. При ошибке 6 сообщение
+    откладывается с экспоненциальной задержкой, а поток отправки тем временем
+    отправляет сообщения другим пользователям; следующие сообщения тому же
+    пользователю ждут повтора, чтобы не нарушить порядок. Если задано окно
+    coalesce_window, подряд идущие сообщения одному пользователю, пришедшие
+    в пределах окна, отправляются одним запросом (текст склеивается, клавиатура
+    и фото берутся из последнего).
+    """
+
+    def __init__(self, vk, rate=DEFAULT_RATE, burst=DEFAULT_BURST,
+                 coalesce_window=DEFAULT_COALESCE_WINDOW, max_size=None):
+        self.vk = vk
+        self.bucket = TokenBucket(rate, burst)
+        self.coalesce_window = coalesce_window
+        self.max_size = max_size
+
+        self._queue = deque()
+        # user_id -> отложенное до повтора сообщение
+        self._deferred = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+
+        # Статистика
+        self.sent = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.retries = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def start(self):
+        """Запуск потока отправки"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._loop, name='vkinder-outbound', daemon=True)
+        self._thread.start()
+
+    def send(self, user_id, message, keyboard=None, attachment=None):
+        """Постановка сообщения в очередь"""
+        item = OutboundMessage(user_id, message, keyboard, attachment)
+        with self._cond:
+            if self.max_size and len(self._queue) >= self.max_size:
+                self.failed += 1
+                logger.error(f"Очередь отправки переполнена, сообщение пользователю {user_id} отброшено")
+                return False
+            self._queue.append(item)
+            self._cond.notify()
+        return True
+
+    def _next_ready(self, now):
+        """Сообщение, которое можно отправить сейчас, или None (вызывается под self._cond)"""
+        for user_id, item in self._deferred.items():
+            if item.not_before <= now:
+                del self._deferred[user_id]
+                return item
+        if not self._deferred:
+            return self._queue.popleft() if self._queue else None
+        # Пропускаем сообщения пользователей, у которых предыдущее сообщение ждёт повтора
+        for i, item in enumerate(self._queue):
+            if item.user_id not in self._deferred:
+                del self._queue[i]
+                return item
+        return None
+
+    def _take(self):
+        """Следующее сообщение для отправки (с учётом склейки); None при остановке"""
+        with self._cond:
+            while True:
+                item = self._next_ready(time.monotonic())
+                if item is not None:
+                    break
+                if not self._running and not self._queue and not self._deferred:
+                    return None
+                if self._deferred:
+                    wait = min(deferred.not_before for deferred in self._deferred.values()) - time.monotonic()
+                    self._cond.wait(max(wait, 0))
+                else:
+                    self._cond.wait()
+
+            if not self.coalesce_window:
+                return item
+
+            # Ждём окончания окна склейки, подхватывая новые сообщения тому же пользователю
+            deadline = item.enqueued_at + self.coalesce_window
+            while True:
+                while self._queue and item.can_merge(self._queue[0]):
+                    item.merge(self._queue.popleft())
+                    self.coalesced += 1
+                if self._queue or not self._running or item.attachment is not None:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return item
+
+    def _defer(self, item):
+        """Откладывание сообщения до повтора, не задерживая остальных пользователей"""
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** item.attempts)
+        item.attempts += 1
+        item.not_before = time.monotonic() + delay * (0.5 + random.random() / 2)
+        with self._cond:
+            self.retries += 1
+            self._deferred[item.user_id] = item
+            self._cond.notify()
+
+    def _deliver(self, item):
+        """Отправка сообщения: True - отправлено, False - ошибка, None - отложено до повтора"""
+        self.bucket.acquire()
+        try:
+            self.vk.messages.send(
+                user_id=item.user_id,
+                message=item.message,
+                keyboard=item.keyboard,
+                attachment=item.attachment,
+                random_id=get_random_id()
+            )
+            return True
+        except ApiError as e:
+            if e.code in RETRY_ERROR_CODES and item.attempts < MAX_RETRIES:
+                self._defer(item)
+                return None
+            logger.error(f"Ошибка отправки сообщения пользователю {item.user_id}: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"Ошибка отправки сообщения пользователю {item.user_id}: {e}")
+            return False
+
+    def _loop(self):
+        while True:
+            item = self._take()
+            if item is None:
+                return
+
+            delivered = self._deliver(item)
+            if delivered is None:
+                continue
+            if delivered:
+                self.sent += 1
+            else:
+                self.failed += 1
+            self._latencies.append(time.monotonic() - item.enqueued_at)
+
+    def depth(self):
+        """Число сообщений в очереди (вместе с ожидающими повтора)"""
+        with self._cond:
+            return len(self._queue) + len(self._deferred)
+
+    def stats(self):
+        """Глубина очереди, задержка отправки и счётчики"""
+        latencies = sorted(self._latencies)
+        p50 = latencies[len(latencies) // 2] if latencies else 0.0
+        p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0.0
+        return {
+            'depth': self.depth(),
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'failed': self.failed,
+            'retries': self.retries,
+            'latency_p50': p50,
+            'latency_p99': p99,
+        }
+
+    def stop(self, timeout=None):
+        """Остановка: оставшиеся сообщения отправляются до выхода"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,238 @@
+"""
+Ранжирование фото профиля
+Фото читаются постранично, в памяти остаются только k лучших; результат пересчитывается,
+только когда у владельца изменилось число фото
+"""
+
+import heapq
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Сколько самых популярных фото возвращать
+TOP_PHOTOS = 3
+# Размер страницы photos.get при потоковом чтении альбома
+PHOTOS_PAGE_SIZE = 200
+# Сколько фото профиля запрашивать у одного владельца внутри execute (максимум photos.get);
+# альбомы больше этого дочитываются страницами PHOTOS_PAGE_SIZE
+PHOTOS_PER_OWNER = 1000
+# Ограничение VK: не более 25 обращений к API внутри одного execute
+EXECUTE_BATCH_SIZE = 25
+# Сколько владельцев держать в кэше рейтингов
+DEFAULT_MAX_OWNERS = 50000
+
+
+def photo_popularity(photo):
+    """Популярность фото: лайки + комментарии"""
+    return photo.get('likes', {}).get('count', 0) + photo.get('comments', {}).get('count', 0)
+
+
+class TopK:
+    """
+    k самых популярных фото из потока.
+    Куча на k элементов: память O(k), добавление O(log k).
+    При равной популярности выше то фото, что пришло раньше.
+    """
+
+    def __init__(self, k=TOP_PHOTOS):
+        self.k = k
+        self._heap = []
+        self._seen = 0
+
+    def add(self, photos):
+        for photo in photos:
+            # Ключи уникальны, поэтому сами фото (словари) в куче не сравниваются
+            key = (photo_popularity(photo), -self._seen)
+            self._seen += 1
+            if len(self._heap) < self.k:
+                heapq.heappush(self._heap, (key, photo))
+            elif key > self._heap[0][0]:
+                heapq.heapreplace(self._heap, (key, photo))
+
+    def result(self):
+        """Лучшие фото по убыванию популярности"""
+        return [photo for _, photo in sorted(self._heap, key=lambda e: e[0], reverse=True)]
+
+
+def _photos_params(owner_id, count):
+    return json.dumps({'owner_id': int(owner_id), 'album_id': 'profile', 'extended': 1, 'count': count})
+
+
+def build_photos_code(owner_ids, count=PHOTOS_PER_OWNER):
+    """VKScript-код, запрашивающий фото профиля для каждого владельца"""
+    calls = [f'API.photos.get({_photos_params(owner_id, count)})' for owner_id in owner_ids]
+    return f"return [{', '.join(calls)}];"
+
+
+def build_count_code(owner_ids):
+    """VKScript-код, возвращающий только число фото профиля каждого владельца"""
+    calls = [f'API.photos.get({_photos_params(owner_id, 1)}).count' for owner_id in owner_ids]
+    return f"return [{', '.join(calls)}];"
+
+
+class PhotoRanker:
+    """
+    Самые популярные фото профиля с кэшем по числу фото.
+
+    Для каждого владельца запоминается (число фото, лучшие фото). Число фото
+    работает как ETag: при повторном запросе сначала узнаём только его
+    (один лёгкий запрос или один execute на 25 владельцев) и читаем альбом
+    заново, лишь если оно изменилось.
+    """
+
+    def __init__(self, session, k=TOP_PHOTOS, page_size=PHOTOS_PAGE_SIZE, max_owners=DEFAULT_MAX_OWNERS):
+        self.session = session
+        self.k = k
+        self.page_size = page_size
+        self.max_owners = max_owners
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Статистика
+        self.fresh = 0
+        self.reranked = 0
+
+    def _cached(self, owner_id):
+        with self._lock:
+            entry = self._cache.get(owner_id)
+            if entry is not None:
+                self._cache.move_to_end(owner_id)
+            return entry
+
+    def _remember(self, owner_id, count, photos):
+        with self._lock:
+            self._cache[owner_id] = (count, photos)
+            self._cache.move_to_end(owner_id)
+            while len(self._cache) > self.max_owners:
+                self._cache.popitem(last=False)
+
+    def forget(self, owner_id):
+        with self._lock:
+            self._cache.pop(owner_id, None)
+
+    def _photos_page(self, owner_id, offset, count):
+        return self.session.method('photos.get', {
+            'owner_id': owner_id,
+            'album_id': 'profile',
+            'extended': 1,
+            'offset': offset,
+            'count': count
+        })
+
+    def _read_rest(self, owner_id, top, offset, total):
+        """Дочитывание альбома страницами с offset до total"""
+        while offset < total:
+            items = self._photos_page(owner_id, offset, self.page_size).get('items') or []
+            if not items:
+                break
+            top.add(items)
+            offset += len(items)
+
+    def _stream(self, owner_id):
+        """Чтение альбома страницами; возвращает (число фото, лучшие фото)"""
+        top = TopK(self.k)
+        page = self._photos_page(owner_id, 0, self.page_size)
+        items = page.get('items') or []
+        top.add(items)
+        total = page.get('count', 0)
+        self._read_rest(owner_id, top, len(items), total)
+        return total, top.result()
+
+    def get_popular_photos(self, owner_id):
+        """Лучшие фото владельца (исключения VK пробрасываются вызывающему)"""
+        cached = self._cached(owner_id)
+        if cached is not None:
+            probe = self._photos_page(owner_id, 0, 1)
+            if probe.get('count', 0) == cached[0]:
+                self.fresh += 1
+                return cached[1]
+
+        count, photos = self._stream(owner_id)
+        self.reranked += 1
+        self._remember(owner_id, count, photos)
+        return photos
+
+    def _execute(self, code):
+        response = self.session.method('execute', {'code': code}, raw=True)
+        if response.get('execute_errors'):
+            logger.info(f"Пропущено закрытых/удалённых профилей в пакете: "
+                        f"{len(response['execute_errors'])}")
+        return response.get('response') or []
+
+    def get_popular_photos_many(self, owner_ids):
+        """
+        Лучшие фото многих владельцев через execute.
+        Возвращает словарь owner_id -> список фото; None для закрытых
+        и удалённых профилей и для пакетов, завершившихся ошибкой.
+        execute отдаёт не больше PHOTOS_PER_OWNER фото владельца,
+        остальные дочитываются страницами, как в get_popular_photos.
+        """
+        owner_ids = list(dict.fromkeys(owner_ids))
+        result = {}
+
+        # Сначала узнаём число фото у тех, кто уже есть в кэше
+        cached = {owner_id: entry for owner_id in owner_ids
+                  if (entry := self._cached(owner_id)) is not None}
+        changed = [owner_id for owner_id in owner_ids if owner_id not in cached]
+        cached_ids = list(cached)
+        for start in range(0, len(cached_ids), EXECUTE_BATCH_SIZE):
+            chunk = cached_ids[start:start + EXECUTE_BATCH_SIZE]
+            try:
+                counts = self._execute(build_count_code(chunk))
+            except Exception as e:
+                logger.error(f"Ошибка пакетной проверки фото для {len(chunk)} пользователей: {e}")
+                result.update(dict.fromkeys(chunk))
+                continue
+
+            for i, owner_id in enumerate(chunk):
+                count = counts[i] if i < len(counts) else None
+                if count is None or count is False:
+                    # Профиль закрыли или удалили
+                    self.forget(owner_id)
+                    result[owner_id] = None
+                elif count == cached[owner_id][0]:
+                    self.fresh += 1
+                    result[owner_id] = cached[owner_id][1]
+                else:
+                    changed.append(owner_id)
+
+        for start in range(0, len(changed), EXECUTE_BATCH_SIZE):
+            chunk = changed[start:start + EXECUTE_BATCH_SIZE]
+            try:
+                items = self._execute(build_photos_code(chunk))
+            except Exception as e:
+                logger.error(f"Ошибка пакетного получения фото для {len(chunk)} пользователей: {e}")
+                result.update(dict.fromkeys(chunk))
+                continue
+
+            for i, owner_id in enumerate(chunk):
+                item = items[i] if i < len(items) else None
+                # Неудачный вызов внутри execute возвращает false
+                if not item:
+                    result[owner_id] = None
+                    continue
+                items_read = item.get('items') or []
+                total = item.get('count', 0)
+                top = TopK(self.k)
+                top.add(items_read)
+                try:
+                    self._read_rest(owner_id, top, len(items_read), total)
+                except Exception as e:
+                    # Рейтинг по неполному альбому отдаём, но не запоминаем
+                    logger.error(f"Ошибка дочитывания фото пользователя {owner_id}: {e}")
+                    result[owner_id] = top.result()
+                    continue
+                photos = top.result()
+                self.reranked += 1
+                self._remember(owner_id, total, photos)
+                result[owner_id] = photos
+
+        return result
+
+    def stats(self):
+        with self._lock:
+            owners = len(self._cache)
+        return {'owners': owners, 'fresh': self.fresh, 'reranked': self.reranked}
@@ -0,0 +1,88 @@
+"""
+Предзагрузка фотографий кандидатов
+Пока пользователь смотрит текущего кандидата, фото следующих загружаются в фоне
+"""
+
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# На сколько кандидатов вперёд загружать фотографии
+DEFAULT_PREFETCH_DEPTH = 3
+# Потоки для фоновой загрузки
+DEFAULT_PREFETCH_WORKERS = 4
+
+
+class PhotoPrefetcher:
+    """
+    Фоновая загрузка фотографий следующих кандидатов.
+
+    fetch - функция owner_id -> список фото (обычно VKService.get_popular_photos).
+    Для каждого пользователя хранятся Future по id кандидатов; cancel(user_id)
+    отменяет ещё не начатые загрузки и отбрасывает результаты уже идущих.
+    """
+
+    def __init__(self, fetch, depth=DEFAULT_PREFETCH_DEPTH, workers=DEFAULT_PREFETCH_WORKERS):
+        self.fetch = fetch
+        self.depth = depth
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='vkinder-prefetch')
+        self._futures = {}
+        self._lock = threading.Lock()
+
+        # Статистика
+        self.hits = 0
+        self.misses = 0
+
+    def schedule(self, user_id, candidates, start):
+        """Запуск загрузки фото для candidates[start:start + depth]"""
+        if self.depth <= 0:
+            return
+
+        wanted = [c['id'] for c in candidates[start:start + self.depth]]
+
+        with self._lock:
+            futures = self._futures.setdefault(user_id, {})
+            for candidate_id in wanted:
+                if candidate_id not in futures:
+                    futures[candidate_id] = self._executor.submit(self.fetch, candidate_id)
+
+    def warm(self, user_id, photos_by_owner):
+        """Сохранение уже загруженных фото (например, пакетной загрузкой)"""
+        with self._lock:
+            futures = self._futures.setdefault(user_id, {})
+            for owner_id, photos in photos_by_owner.items():
+                if owner_id in futures or photos is None:
+                    continue
+                future = Future()
+                future.set_result(photos)
+                futures[owner_id] = future
+
+    def get(self, user_id, candidate_id):
+        """Фото кандидата: из предзагрузки, если есть, иначе синхронный запрос"""
+        with self._lock:
+            future = self._futures.get(user_id, {}).pop(candidate_id, None)
+
+        if future is not None and not future.cancelled():
+            try:
+                photos = future.result()
+                self.hits += 1
+                return photos
+            except Exception as e:
+                logger.error(f"Ошибка предзагрузки фото кандидата {candidate_id}: {e}")
+
+        self.misses += 1
+        return self.fetch(candidate_id)
+
+    def cancel(self, user_id):
+        """Отмена предзагрузки пользователя (выход из поиска или новый поиск)"""
+        with self._lock:
+            futures = self._futures.pop(user_id, {})
+
+        for future in futures.values():
+            future.cancel()
+
+    def shutdown(self):
+        """Остановка фоновых потоков"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
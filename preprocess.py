@@ -0,0 +1,151 @@
+"""
+Предварительная обработка входящих событий
+Склейка повторных нажатий, отбрасывание устаревших событий и сброс нагрузки при перегрузке
+"""
+
+import logging
+import threading
+import time
+
+from router import event_payload
+
+logger = logging.getLogger(__name__)
+
+# Навигацию старше стольких секунд уже не выполняем (пользователь давно ждёт другого)
+DEFAULT_MAX_EVENT_AGE = 60.0
+# Сколько событий в очередях обработки считается перегрузкой
+DEFAULT_SHED_THRESHOLD = 2000
+
+# Переходы: подряд идущие нажатия склеиваются в один переход на N шагов
+ADVANCE_COMMANDS = frozenset({'handle_next_candidate'})
+# Повтор этих команд ничего не меняет: подряд идущие дубликаты выполняются один раз
+IDEMPOTENT_COMMANDS = frozenset({
+    'handle_search', 'handle_main_menu', 'handle_help', 'handle_settings',
+    'handle_favorites_menu', 'handle_show_favorites',
+})
+# Справка и меню: при перегрузке отбрасываются первыми, поиск и оценки продолжают работать
+LOW_PRIORITY_COMMANDS = frozenset({
+    'handle_help', 'handle_main_menu', 'handle_settings', 'handle_favorites_menu',
+})
+# Навигация: устаревшие нажатия отбрасываются, остальные команды (оценки, ввод настроек) выполняются всегда
+NAVIGATION_COMMANDS = ADVANCE_COMMANDS | IDEMPOTENT_COMMANDS
+
+
+class PendingEvent:
+    """Событие в очереди обработки; repeat - сколько одинаковых нажатий в нём склеено"""
+
+    __slots__ = ('event', 'handler', 'repeat', 'received_at', 'started')
+
+    def __init__(self, event, handler, received_at):
+        self.event = event
+        self.handler = handler
+        self.repeat = 1
+        self.received_at = received_at
+        self.started = False
+
+    @property
+    def user_id(self):
+        return self.event.user_id
+
+
+class EventPreprocessor:
+    """
+    Этап между получением события и очередью обработки.
+
+    admit() решает, что делать с новым событием:
+    - навигация (NAVIGATION_COMMANDS) старше max_age отбрасывается, остальные команды
+      выполняются даже с опозданием, чтобы не терять оценки и ввод пользователя;
+    - при очереди длиннее shed_threshold отбрасываются команды LOW_PRIORITY_COMMANDS;
+    - если последнее ещё не начатое событие пользователя - та же команда,
+      новое склеивается с ним: ADVANCE_COMMANDS превращаются в переход на N шагов,
+      IDEMPOTENT_COMMANDS выполняются один раз.
+    take() вызывает поток обработки перед началом работы: после этого
+    к событию больше ничего не приклеивается.
+    """
+
+    def __init__(self, router, max_age=DEFAULT_MAX_EVENT_AGE, shed_threshold=DEFAULT_SHED_THRESHOLD):
+        self.router = router
+        self.max_age = max_age
+        self.shed_threshold = shed_threshold
+        # user_id -> последнее принятое, но ещё не начатое событие
+        self._tail = {}
+        self._lock = threading.Lock()
+
+        # Статистика
+        self.admitted = 0
+        self.coalesced = 0
+        self.shed = 0
+        self.stale = 0
+
+    def _age(self, event, received_at, now):
+        timestamp = getattr(event, 'timestamp', None)
+        if timestamp:
+            return now - min(timestamp, received_at)
+        return now - received_at
+
+    def _is_stale(self, handler, event, received_at, now):
+        return (bool(self.max_age) and handler in NAVIGATION_COMMANDS
+                and self._age(event, received_at, now) > self.max_age)
+
+    def admit(self, event, load=0):
+        """
+        Новое событие; load - сколько событий уже ждёт обработки.
+        Возвращает PendingEvent для очереди или None, если событие склеено или отброшено.
+        """
+        now = time.time()
+        handler = self.router.resolve(event.text.lower().strip(), event_payload(event))
+
+        with self._lock:
+            if self._is_stale(handler, event, now, now):
+                self.stale += 1
+                return None
+            if self.shed_threshold and load >= self.shed_threshold and handler in LOW_PRIORITY_COMMANDS:
+                self.shed += 1
+                return None
+
+            tail = self._tail.get(event.user_id)
+            if tail is not None and not tail.started and handler is not None and handler == tail.handler:
+                if handler in ADVANCE_COMMANDS:
+                    tail.repeat += 1
+                    self.coalesced += 1
+                    return None
+                if handler in IDEMPOTENT_COMMANDS:
+                    self.coalesced += 1
+                    return None
+
+            item = PendingEvent(event, handler, now)
+            self._tail[event.user_id] = item
+            self.admitted += 1
+            return item
+
+    def take(self, item):
+        """
+        Начало обработки: (событие, число склеенных нажатий)
+        или (None, 0), если навигация устарела, пока ждала в очереди.
+        """
+        now = time.time()
+        with self._lock:
+            item.started = True
+            if self._tail.get(item.user_id) is item:
+                del self._tail[item.user_id]
+            if self._is_stale(item.handler, item.event, item.received_at, now):
+                self.stale += 1
+                return None, 0
+        return item.event, item.repeat
+
+    def discard(self, item):
+        """Событие не попало в очередь обработки (очередь переполнена)"""
+        with self._lock:
+            item.started = True
+            if self._tail.get(item.user_id) is item:
+                del self._tail[item.user_id]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'admitted': self.admitted,
+                'coalesced': self.coalesced,
+                'shed': self.shed,
+                'stale': self.stale,
+                'pending_users': len(self._tail),
+            }
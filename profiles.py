@@ -0,0 +1,134 @@
+"""
+Пакетная загрузка профилей VK
+Запросы профилей из разных потоков собираются за короткое окно и выполняются одним users.get
+"""
+
+import logging
+import threading
+from concurrent.futures import Future
+
+from candidate_search import age_from_bdate
+from vk_executor import VkUnavailable, outage_tracker
+
+logger = logging.getLogger(__name__)
+
+# users.get принимает до 1000 ID за вызов
+MAX_IDS_PER_CALL = 1000
+# Сколько ждать других запросов перед отправкой пакета (секунды)
+DEFAULT_BATCH_WINDOW = 0.005
+# Поля профиля: из них считаются возраст, пол и город
+PROFILE_FIELDS = 'bdate,city,sex'
+
+
+def to_profile(user, today=None):
+    """Профиль пользователя в формате VKService.get_user_info"""
+    city = user.get('city')
+    if isinstance(city, dict):
+        city = city.get('title')
+    return {
+        'user_id': user['id'],
+        'first_name': user.get('first_name', ''),
+        'last_name': user.get('last_name', ''),
+        'age': age_from_bdate(user.get('bdate'), today),
+        'sex': user.get('sex'),
+        'city': city.lower() if city else None,
+    }
+
+
+class ProfileBatcher:
+    """
+    Сборщик запросов профилей.
+
+    Если других запросов users.get сейчас нет, поток отправляет свой ID сразу.
+    Иначе он ждёт до window секунд (или пока не наберётся max_ids) и отправляет
+    одним users.get все ID, накопленные за это время всеми потоками. Потоки,
+    чьи ID уже забрал другой пакет, ждут его ответа. Так при малой нагрузке
+    задержка не растёт, а при большой число вызовов падает до одного на пакет.
+    Одинаковые ещё не отправленные ID запрашиваются один раз.
+    """
+
+    def __init__(self, session, window=DEFAULT_BATCH_WINDOW, max_ids=MAX_IDS_PER_CALL, fields=PROFILE_FIELDS):
+        self.session = session
+        self.window = window
+        self.max_ids = max_ids
+        self.fields = fields
+        # user_id -> Future с пользователем из ответа users.get (None - не найден)
+        self._pending = {}
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+        # Статистика
+        self.requested = 0
+        self.calls = 0
+
+    def _enqueue(self, user_ids):
+        """Future для каждого ID (одинаковые ID, ещё не отправленные, получают общий Future)"""
+        with self._cond:
+            futures = {}
+            for user_id in user_ids:
+                future = self._pending.get(user_id)
+                if future is None:
+                    future = self._pending[user_id] = Future()
+                futures[user_id] = future
+            self.requested += len(user_ids)
+            if len(self._pending) >= self.max_ids:
+                self._cond.notify_all()
+            return futures
+
+    def _send_pending(self, futures, window):
+        """
+        Отправка накопленных ID, пока среди них есть ID вызывающего потока.
+        Пока выполняется другой пакет, ждём до window секунд, чтобы собрать запросы других потоков;
+        ID, которые уже забрал другой поток, дожидаются его ответа.
+        """
+        if window:
+            with self._cond:
+                if self._in_flight:
+                    self._cond.wait_for(lambda: len(self._pending) >= self.max_ids, window)
+
+        while True:
+            with self._cond:
+                if not any(self._pending.get(user_id) is future for user_id, future in futures.items()):
+                    return
+                batch = dict(list(self._pending.items())[:self.max_ids])
+                for user_id in batch:
+                    del self._pending[user_id]
+                self.calls += 1
+                self._in_flight += 1
+            try:
+                self._fetch(batch)
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+
+    def _fetch(self, batch):
+        try:
+            with outage_tracker() as outages:
+                users = self.session.method('users.get', {
+                    'user_ids': ','.join(str(user_id) for user_id in batch),
+                    'fields': self.fields,
+                })
+            found = {user['id']: user for user in users or [] if 'id' in user}
+        except Exception as e:
+            if outages and not isinstance(e, VkUnavailable):
+                # Повторы исчерпаны: для всех ждущих потоков это недоступность VK
+                error = VkUnavailable(f"users.get: {e}")
+                error.__cause__ = e
+                e = error
+            for future in batch.values():
+                future.set_exception(e)
+            return
+
+        for user_id, future in batch.items():
+            future.set_result(found.get(user_id))
+
+    def get(self, user_id):
+        """Профиль пользователя (None, если пользователь не найден)"""
+        futures = self._enqueue([user_id])
+        self._send_pending(futures, self.window)
+        user = futures[user_id].result()
+        return to_profile(user) if user is not None else None
+
+    def stats(self):
+        with self._cond:
+            return {'requested': self.requested, 'calls': self.calls, 'pending': len(self._pending)}
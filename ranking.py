@@ -0,0 +1,126 @@
+"""
+Ранжирование кандидатов
+Признаки кандидатов собираются в массивы NumPy, оценка считается одним векторным проходом
+"""
+
+import logging
+import math
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Веса признаков (отрицательный вес - чем больше значение, тем хуже)
+DEFAULT_WEIGHTS = {
+    'age_delta': -0.5,   # разница в возрасте, лет
+    'city_match': 2.0,   # тот же город
+    'photos': 0.5,       # log(1 + число фото)
+    'recency': 1.5,      # насколько недавно был в сети, от 0 до 1
+    'common': 1.0,       # log(1 + число общих друзей)
+}
+# За сколько секунд "свежесть" последнего визита падает вдвое
+RECENCY_HALF_LIFE = 3 * 24 * 3600
+# Разница в возрасте для кандидатов без даты рождения
+UNKNOWN_AGE_DELTA = 5
+
+
+def _field(candidate, name):
+    value = candidate.get(name)
+    return value if value is not None else 0
+
+
+class CandidateRanker:
+    """
+    Векторное ранжирование кандидатов.
+
+    features() переводит список кандидатов в массивы признаков, scores()
+    считает взвешенную сумму, rank() возвращает кандидатов по убыванию
+    оценки (при заданном k - только лучшие k, отобранные через argpartition).
+    """
+
+    def __init__(self, weights=None, half_life=RECENCY_HALF_LIFE):
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.half_life = half_life
+
+    def features(self, candidates, user_info, now=None):
+        """Массивы признаков кандидатов"""
+        now = now or time.time()
+        n = len(candidates)
+        user_age = user_info.get('age')
+        user_city = (user_info.get('city') or '').strip().lower()
+
+        ages = np.fromiter((c.get('age') or -1 for c in candidates), dtype=np.float64, count=n)
+        if user_age:
+            age_delta = np.where(ages >= 0, np.abs(ages - user_age), UNKNOWN_AGE_DELTA)
+        else:
+            age_delta = np.zeros(n)
+
+        city_match = np.fromiter(
+            ((c.get('city') or '').lower() == user_city for c in candidates), dtype=np.float64, count=n
+        ) if user_city else np.zeros(n)
+
+        photos = np.fromiter((_field(c, 'photos_count') for c in candidates), dtype=np.float64, count=n)
+        last_seen = np.fromiter((_field(c, 'last_seen') for c in candidates), dtype=np.float64, count=n)
+        common = np.fromiter((_field(c, 'common_count') for c in candidates), dtype=np.float64, count=n)
+
+        # Кандидаты без данных о последнем визите получают нулевую "свежесть"
+        elapsed = np.maximum(now - last_seen, 0)
+        recency = np.where(last_seen > 0, np.exp2(-elapsed / self.half_life), 0.0)
+
+        return {
+            'age_delta': age_delta,
+            'city_match': city_match,
+            'photos': np.log1p(photos),
+            'recency': recency,
+            'common': np.log1p(common),
+        }
+
+    def scores(self, features):
+        """Взвешенная сумма признаков"""
+        total = None
+        for name, weight in self.weights.items():
+            term = weight * features[name]
+            total = term if total is None else total + term
+        return total
+
+    def rank(self, candidates, user_info, k=None, now=None):
+        """Кандидаты по убыванию оценки; при заданном k - только лучшие k"""
+        n = len(candidates)
+        if n < 2:
+            return list(candidates)
+
+        scores = self.scores(self.features(candidates, user_info, now))
+        if k is not None and k < n:
+            top = np.argpartition(-scores, k - 1)[:k]
+            order = top[np.argsort(-scores[top], kind='stable')]
+        else:
+            order = np.argsort(-scores, kind='stable')
+        return [candidates[i] for i in order]
+
+
+def naive_score(candidate, user_info, weights=None, half_life=RECENCY_HALF_LIFE, now=None):
+    """Та же оценка, посчитанная для одного кандидата без NumPy (для сравнения в бенчмарке)"""
+    weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+    now = now or time.time()
+
+    user_age = user_info.get('age')
+    age = candidate.get('age')
+    if not user_age:
+        age_delta = 0
+    elif age is None:
+        age_delta = UNKNOWN_AGE_DELTA
+    else:
+        age_delta = abs(age - user_age)
+
+    user_city = (user_info.get('city') or '').strip().lower()
+    city_match = 1.0 if user_city and (candidate.get('city') or '').lower() == user_city else 0.0
+
+    last_seen = _field(candidate, 'last_seen')
+    recency = 2 ** (-max(now - last_seen, 0) / half_life) if last_seen > 0 else 0.0
+
+    return (weights['age_delta'] * age_delta
+            + weights['city_match'] * city_match
+            + weights['photos'] * math.log1p(_field(candidate, 'photos_count'))
+            + weights['recency'] * recency
+            + weights['common'] * math.log1p(_field(candidate, 'common_count')))
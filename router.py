@@ -0,0 +1,160 @@
+"""
+Маршрутизация команд бота
+Текст сообщения или payload кнопки сопоставляется с обработчиком одним поиском в словаре
+"""
+
+import json
+import logging
+
+from vk_api.keyboard import VkKeyboard, VkKeyboardColor
+
+logger = logging.getLogger(__name__)
+
+# Команды: (обработчик, варианты текста). Варианты сравниваются после normalize_command,
+# поэтому эмодзи и регистр не важны
+COMMANDS = {
+    'start': ('handle_start', ('/start', 'начать', 'привет', 'старт')),
+    'cancel': ('handle_cancel', ('отмена',)),
+    'search': ('handle_search', ('поиск',)),
+    'next': ('handle_next_candidate', ('следующий', 'далее')),
+    'favorite': ('handle_add_to_favorites', ('в избранное', 'лайк')),
+    'blacklist': ('handle_add_to_blacklist', ('в черный список', 'дизлайк')),
+    'favorites_menu': ('handle_favorites_menu', ('избранные',)),
+    'show_favorites': ('handle_show_favorites', ('показать избранных',)),
+    'clear_favorites': ('handle_clear_favorites', ('очистить избранных',)),
+    'favorites_prev': ('handle_favorites_prev', ('назад', 'предыдущая страница')),
+    'favorites_next': ('handle_favorites_next', ('вперёд', 'вперед', 'следующая страница')),
+    'settings': ('handle_settings', ('настройки', 'настройка', 'показать настройки')),
+    'change_sex': ('handle_change_sex', ('изменить пол', 'пол')),
+    'change_age': ('handle_change_age', ('изменить возраст', 'возраст')),
+    'change_city': ('handle_change_city', ('изменить город', 'город')),
+    'main_menu': ('handle_main_menu', ('главное меню', 'меню')),
+    'help': ('handle_help', ('помощь', 'help')),
+}
+
+# Клавиатуры: ряды кнопок (текст, цвет, команда). Команда уходит в payload кнопки
+KEYBOARDS = {
+    'main': [
+        [('🔍 Поиск', 'PRIMARY', 'search'), ('❤️ Избранные', 'POSITIVE', 'favorites_menu')],
+        [('Настройки', 'SECONDARY', 'settings'), ('ℹ️ Помощь', 'SECONDARY', 'help')],
+    ],
+    'search': [
+        [('❤️ В избранное', 'POSITIVE', 'favorite'), ('👎 В черный список', 'NEGATIVE', 'blacklist')],
+        [('▶️ Следующий', 'PRIMARY', 'next'), ('🏠 Главное меню', 'SECONDARY', 'main_menu')],
+    ],
+    'settings': [
+        [('🚻 Изменить пол', 'PRIMARY', 'change_sex'), ('🎂 Изменить возраст', 'PRIMARY', 'change_age')],
+        [('🏙️ Изменить город', 'PRIMARY', 'change_city'), ('📊 Показать настройки', 'SECONDARY', 'settings')],
+        [('🏠 Главное меню', 'SECONDARY', 'main_menu')],
+    ],
+    'favorites': [
+        [('📋 Показать избранных', 'PRIMARY', 'show_favorites'),
+         ('🗑️ Очистить избранных', 'NEGATIVE', 'clear_favorites')],
+        [('🏠 Главное меню', 'SECONDARY', 'main_menu')],
+    ],
+    # Листание избранных: набор кнопок зависит от того, есть ли соседние страницы
+    'favorites_prev': [
+        [('⬅️ Назад', 'SECONDARY', 'favorites_prev')],
+        [('🗑️ Очистить избранных', 'NEGATIVE', 'clear_favorites'), ('🏠 Главное меню', 'SECONDARY', 'main_menu')],
+    ],
+    'favorites_next': [
+        [('Вперёд ➡️', 'SECONDARY', 'favorites_next')],
+        [('🗑️ Очистить избранных', 'NEGATIVE', 'clear_favorites'), ('🏠 Главное меню', 'SECONDARY', 'main_menu')],
+    ],
+    'favorites_both': [
+        [('⬅️ Назад', 'SECONDARY', 'favorites_prev'), ('Вперёд ➡️', 'SECONDARY', 'favorites_next')],
+        [('🗑️ Очистить избранных', 'NEGATIVE', 'clear_favorites'), ('🏠 Главное меню', 'SECONDARY', 'main_menu')],
+    ],
+    # Кнопки ввода настроек передают только текст - его разбирает process_settings_input
+    'sex': [
+        [('1 - Женский', 'POSITIVE', None), ('2 - Мужской', 'PRIMARY', None)],
+        [('❌ Отмена', 'NEGATIVE', 'cancel')],
+    ],
+    'cancel': [
+        [('❌ Отмена', 'NEGATIVE', 'cancel')],
+    ],
+    'city': [
+        [('Москва', 'PRIMARY', None), ('Санкт-Петербург', 'PRIMARY', None)],
+        [('Новосибирск', 'PRIMARY', None), ('Красноярск', 'PRIMARY', None)],
+        [('❌ Отмена', 'NEGATIVE', 'cancel')],
+    ],
+}
+
+
+def normalize_command(text):
+    """Текст команды без эмодзи, знаков и лишних пробелов, в нижнем регистре"""
+    text = text.lower()
+    cleaned = ''.join(ch for ch in text if ch.isalnum() or ch in ' /-')
+    return ' '.join(cleaned.split())
+
+
+def event_payload(event):
+    """Payload нажатой кнопки (dict) или None"""
+    payload = getattr(event, 'payload', None)
+    if payload is None:
+        payload = (getattr(event, 'extra_values', None) or {}).get('payload')
+    if not payload:
+        return None
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            return None
+    return payload if isinstance(payload, dict) else None
+
+
+class CommandRouter:
+    """
+    Таблица команд.
+
+    resolve() возвращает имя обработчика: сначала по payload кнопки,
+    затем по тексту сообщения (точное совпадение, потом нормализованное).
+    """
+
+    def __init__(self, commands=COMMANDS, keyboards=KEYBOARDS):
+        self._by_command = {}
+        self._by_text = {}
+        for command, (handler, aliases) in commands.items():
+            self._by_command[command] = handler
+            for alias in aliases:
+                self._by_text[normalize_command(alias)] = handler
+
+        # Подписи кнопок как есть - нажатие кнопки находится без нормализации
+        for rows in keyboards.values():
+            for row in rows:
+                for label, _, command in row:
+                    if command:
+                        self._by_text[label.lower()] = self._by_command[command]
+
+    def resolve(self, text, payload=None):
+        """Имя обработчика для сообщения; None, если команда неизвестна"""
+        if payload:
+            handler = self._by_command.get(payload.get('command'))
+            if handler:
+                return handler
+
+        handler = self._by_text.get(text)
+        if handler is None:
+            handler = self._by_text.get(normalize_command(text))
+        return handler
+
+
+class KeyboardCache:
+    """Клавиатуры, сериализованные в JSON один раз при запуске"""
+
+    def __init__(self, layouts=KEYBOARDS):
+        self._json = {name: self._build(rows) for name, rows in layouts.items()}
+
+    @staticmethod
+    def _build(rows):
+        keyboard = VkKeyboard(one_time=True)
+        for i, row in enumerate(rows):
+            if i:
+                keyboard.add_line()
+            for label, color, command in row:
+                payload = {'command': command} if command else None
+                keyboard.add_button(label, getattr(VkKeyboardColor, color), payload=payload)
+        return keyboard.get_keyboard()
+
+    def __getitem__(self, name):
+        return self._json[name]
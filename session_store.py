@@ -0,0 +1,326 @@
+"""
+Хранилище состояний пользователей
+Ограничение по времени простоя и общему объёму, компактное хранение кандидатов
+"""
+
+import logging
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import partial
+
+logger = logging.getLogger(__name__)
+
+# Через сколько секунд простоя сессия удаляется
+DEFAULT_IDLE_TIMEOUT = 30 * 60
+# Общий бюджет памяти на кандидатов во всех сессиях (байт)
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+# Как часто проверять простаивающие сессии (секунды)
+SWEEP_INTERVAL = 30
+
+
+class CandidateRecord:
+    """
+    Компактная запись о кандидате.
+    Поддерживает чтение как словарь (candidate['id'], candidate.get('age')),
+    поэтому обработчики работают с ней так же, как с ответом VK.
+    """
+
+    __slots__ = ('id', 'first_name', 'last_name', 'age', 'city', 'last_seen', 'common_count', 'photos_count')
+
+    def __init__(self, id, first_name='', last_name='', age=None, city=None,
+                 last_seen=None, common_count=None, photos_count=None):
+        self.id = id
+        self.first_name = first_name
+        self.last_name = last_name
+        self.age = age
+        self.city = city
+        # Признаки для ранжирования
+        self.last_seen = last_seen
+        self.common_count = common_count
+        self.photos_count = photos_count
+
+    @classmethod
+    def from_dict(cls, candidate):
+        """Создание записи из словаря профиля"""
+        if isinstance(candidate, cls):
+            return candidate
+        city = candidate.get('city')
+        # users.search возвращает город объектом {'id': ..., 'title': ...}
+        if isinstance(city, dict):
+            city = city.get('title')
+        return cls(
+            candidate['id'],
+            candidate.get('first_name', ''),
+            candidate.get('last_name', ''),
+            candidate.get('age'),
+            city,
+            candidate.get('last_seen'),
+            candidate.get('common_count'),
+            candidate.get('photos_count')
+        )
+
+    def __getitem__(self, key):
+        try:
+            value = getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return key in self.__slots__ and getattr(self, key) is not None
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        """Восстановление полного словаря профиля"""
+        return {key: getattr(self, key) for key in self.__slots__ if getattr(self, key) is not None}
+
+    def nbytes(self):
+        """Примерный объём записи в памяти (байт)"""
+        return sys.getsizeof(self) + sys.getsizeof(self.first_name) + sys.getsizeof(self.last_name) + \
+            (sys.getsizeof(self.city) if self.city is not None else 0)
+
+    def __repr__(self):
+        return f"CandidateRecord(id={self.id}, first_name={self.first_name!r})"
+
+
+class CandidateList:
+    """
+    Список кандидатов сессии: массив id плюс компактные записи.
+    Словарь профиля создаётся только при обращении к to_dict().
+    on_grow(список, добавлено байт) вызывается после каждого extend() -
+    так SessionStore учитывает подгруженные страницы в бюджете памяти.
+    """
+
+    def __init__(self, candidates=()):
+        self.ids = array('q')
+        self._records = []
+        self.nbytes = 0
+        self.on_grow = None
+        self.extend(candidates)
+
+    def extend(self, candidates):
+        added = 0
+        for candidate in candidates:
+            record = CandidateRecord.from_dict(candidate)
+            self.ids.append(record.id)
+            self._records.append(record)
+            added += record.nbytes() + self.ids.itemsize + 8
+        self.nbytes += added
+        if added and self.on_grow is not None:
+            self.on_grow(self, added)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __getitem__(self, index):
+        return self._records[index]
+
+    def __iter__(self):
+        return iter(self._records)
+
+
+class SessionStore:
+    """
+    Состояния пользователей (замена обычному словарю user_states).
+
+    Сессия удаляется после idle_timeout секунд без обращений, а при превышении
+    общего бюджета памяти вытесняются давно не использованные сессии. Бюджет
+    проверяется при каждой записи сессии и при каждом росте её списка кандидатов.
+    Список кандидатов при сохранении состояния переводится в CandidateList.
+    on_evict(user_id) вызывается для каждой вытесненной сессии.
+    restore(user_id) -> состояние или None восстанавливает сессию, которой нет
+    в памяти (например, из снимка после перезапуска), в начале события.
+    """
+
+    def __init__(self, idle_timeout=DEFAULT_IDLE_TIMEOUT, memory_budget=DEFAULT_MEMORY_BUDGET,
+                 on_evict=None, restore=None):
+        self.idle_timeout = idle_timeout
+        self.memory_budget = memory_budget
+        self.on_evict = on_evict
+        self.restore = restore
+
+        self._sessions = OrderedDict()
+        self._touched = {}
+        # user_id -> учтённый объём кандидатов сессии; _bytes - их сумма
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._last_sweep = time.monotonic()
+
+        # Статистика
+        self.idle_evictions = 0
+        self.budget_evictions = 0
+
+    def _compact(self, state):
+        candidates = state.get('candidates')
+        if candidates is not None and not isinstance(candidates, CandidateList):
+            state['candidates'] = CandidateList(candidates)
+        current = state.get('current_candidate')
+        if current is not None:
+            state['current_candidate'] = CandidateRecord.from_dict(current)
+        return state
+
+    def _touch(self, user_id):
+        self._sessions.move_to_end(user_id)
+        self._touched[user_id] = time.monotonic()
+
+    def _account(self, user_id, state):
+        """Учёт объёма кандидатов сессии; рост списка отслеживается через on_grow"""
+        candidates = state.get('candidates')
+        size = 0
+        if isinstance(candidates, CandidateList):
+            size = candidates.nbytes
+            candidates.on_grow = partial(self._grown, user_id)
+        self._bytes += size - self._sizes.get(user_id, 0)
+        self._sizes[user_id] = size
+
+    def _forget(self, user_id):
+        self._touched.pop(user_id, None)
+        self._bytes -= self._sizes.pop(user_id, 0)
+
+    def _grown(self, user_id, candidates, added):
+        """Список кандидатов сессии вырос (подгружена страница поиска)"""
+        with self._lock:
+            state = self._sessions.get(user_id)
+            if state is None or state.get('candidates') is not candidates:
+                # Список уже не принадлежит сессии в хранилище
+                return
+            self._sizes[user_id] += added
+            self._bytes += added
+            self._touch(user_id)
+            evicted = self._enforce_budget()
+        self._notify(evicted)
+
+    def __setitem__(self, user_id, state):
+        evicted = []
+        with self._lock:
+            self._sessions[user_id] = state = self._compact(state)
+            self._account(user_id, state)
+            self._touch(user_id)
+            evicted = self._maybe_sweep() or self._enforce_budget()
+        self._notify(evicted)
+
+    def __getitem__(self, user_id):
+        with self._lock:
+            state = self._sessions[user_id]
+            self._touch(user_id)
+            return state
+
+    def get(self, user_id, default=None):
+        with self._lock:
+            if user_id not in self._sessions:
+                return default
+            return self[user_id]
+
+    def __contains__(self, user_id):
+        with self._lock:
+            return user_id in self._sessions
+
+    def __delitem__(self, user_id):
+        with self._lock:
+            del self._sessions[user_id]
+            self._forget(user_id)
+
+    def pop(self, user_id, default=None):
+        with self._lock:
+            self._forget(user_id)
+            return self._sessions.pop(user_id, default)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    @contextmanager
+    def session(self, user_id):
+        """
+        Обработка одного события пользователя.
+        Здесь восстанавливается сессия из снимка; общее хранилище (shared_sessions)
+        загружает сессию и сохраняет её изменения.
+        """
+        if self.restore and user_id not in self:
+            try:
+                state = self.restore(user_id)
+            except Exception as e:
+                logger.error(f"Ошибка восстановления сессии пользователя {user_id}: {e}")
+                state = None
+            if state is not None:
+                self[user_id] = state
+        yield
+
+    def idle_items(self):
+        """Сессии для снимка: список (user_id, секунд без обращений, состояние)"""
+        now = time.monotonic()
+        with self._lock:
+            return [(user_id, now - self._touched[user_id], state) for user_id, state in self._sessions.items()]
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        if now - self._last_sweep < SWEEP_INTERVAL:
+            return []
+        return self._sweep(now)
+
+    def _sweep(self, now):
+        """Удаление простаивающих сессий и вытеснение сверх бюджета (вызывается под блокировкой)"""
+        self._last_sweep = now
+        evicted = []
+
+        # Сессии упорядочены по последнему обращению - самые старые в начале
+        for user_id in list(self._sessions):
+            if now - self._touched[user_id] < self.idle_timeout:
+                break
+            self._evict(user_id)
+            self.idle_evictions += 1
+            evicted.append(user_id)
+
+        return evicted + self._enforce_budget()
+
+    def _enforce_budget(self):
+        """Вытеснение давно не использованных сессий сверх бюджета памяти (вызывается под блокировкой)"""
+        evicted = []
+        while self._bytes > self.memory_budget and len(self._sessions) > 1:
+            user_id = next(iter(self._sessions))
+            self._evict(user_id)
+            self.budget_evictions += 1
+            evicted.append(user_id)
+        return evicted
+
+    def _evict(self, user_id):
+        """Удаление сессии из памяти при вытеснении (вызывается под блокировкой)"""
+        del self._sessions[user_id]
+        self._forget(user_id)
+
+    def _notify(self, evicted):
+        if evicted:
+            logger.info(f"Удалено сессий пользователей: {len(evicted)}")
+        if self.on_evict:
+            for user_id in evicted:
+                self.on_evict(user_id)
+
+    def sweep(self):
+        """Принудительная очистка простаивающих сессий"""
+        with self._lock:
+            evicted = self._sweep(time.monotonic())
+        self._notify(evicted)
+        return len(evicted)
+
+    def stats(self):
+        """Размер хранилища и статистика вытеснений"""
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'candidates': sum(len(s.get('candidates') or ()) for s in self._sessions.values()),
+                'bytes': self._bytes,
+                'idle_evictions': self.idle_evictions,
+                'budget_evictions': self.budget_evictions,
+            }
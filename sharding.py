@@ -0,0 +1,282 @@
+"""
+Запуск VKinder в нескольких процессах
+Входной процесс принимает события и раздаёт их процессам обработки по user_id
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import zlib
+
+from vk_api.longpoll import VkEventType
+
+from callback import CallbackEvent
+from log_setup import setup_logging
+from outbound import DEFAULT_RATE, DEFAULT_BURST
+from router import event_payload
+from shared_sessions import SqliteSessionBackend, SESSION_DB_FILE
+from dispatcher import DEFAULT_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Глубина очереди событий одного процесса обработки
+DEFAULT_SHARD_QUEUE_SIZE = 10000
+# Сколько ждать места в очереди процесса, прежде чем отбросить событие (секунды)
+SHARD_SUBMIT_TIMEOUT = 5.0
+# Как часто проверять, живы ли процессы обработки (секунды)
+SUPERVISE_INTERVAL = 1.0
+# Сколько ждать завершения процесса обработки при остановке (секунды)
+SHARD_STOP_TIMEOUT = 30.0
+
+
+def shard_for(user_id, shards):
+    """Номер процесса пользователя; не зависит от PYTHONHASHSEED и одинаков во всех процессах"""
+    return zlib.crc32(str(user_id).encode()) % shards
+
+
+def shard_log_file(log_file, index):
+    """Отдельный файл лога для каждого процесса обработки: vkinder.log -> vkinder.1.log"""
+    if not log_file:
+        return None
+    base, ext = os.path.splitext(log_file)
+    return f'{base}.{index}{ext}'
+
+
+def to_shard_event(event):
+    """Событие, которое можно передать в другой процесс (только нужные обработчику поля)"""
+    if isinstance(event, CallbackEvent):
+        return event
+    return CallbackEvent(
+        user_id=event.user_id,
+        text=event.text,
+        timestamp=getattr(event, 'timestamp', None),
+        payload=event_payload(event),
+    )
+
+
+class ShardInbox:
+    """Входящий канал процесса обработки с интерфейсом VkLongPoll: listen() отдаёт события по одному"""
+
+    def __init__(self, inbox):
+        self.inbox = inbox
+
+    def listen(self):
+        while True:
+            try:
+                event = self.inbox.recv()
+            except EOFError:
+                return
+            if event is None:
+                return
+            yield event
+
+
+def _worker_main(index, inbox, bot_factory, bot_kwargs, session_db, workers, worker_queue_size,
+                 log_level, log_file):
+    """Точка входа процесса обработки"""
+    if log_level:
+        setup_logging(level=log_level, log_file=shard_log_file(log_file, index))
+
+    backend = SqliteSessionBackend(session_db)
+    bot = bot_factory(longpoll=ShardInbox(inbox), session_backend=backend, **bot_kwargs)
+    logger.info(f"Процесс обработки {index} запущен (pid {os.getpid()})")
+    try:
+        bot.run(workers=workers, queue_size=worker_queue_size)
+    finally:
+        backend.close()
+
+
+class ShardedRunner:
+    """
+    Входной процесс и процессы обработки.
+
+    Входной процесс читает события (long poll или Callback API) и кладёт
+    каждое в очередь процесса shard_for(user_id), поэтому события одного
+    пользователя обрабатываются по порядку одним процессом. Сессии
+    и позиции поиска лежат в общем хранилище (session_db), так что
+    упавший процесс перезапускается без потери сессий, а при изменении
+    числа процессов пользователь продолжает с того же места в другом.
+
+    bot_factory(longpoll=..., session_backend=..., **bot_kwargs) создаёт бота
+    в процессе обработки; фабрика и bot_kwargs передаются в процесс через pickle.
+    Все процессы отправляют сообщения одним токеном группы, поэтому лимит
+    outbound_rate (и пачка outbound_burst) делится между ними поровну
+    и передаётся боту как outbound_rate/outbound_burst.
+    workers и worker_queue_size - параметры bot.run в каждом процессе.
+    """
+
+    def __init__(self, shards, bot_factory, bot_kwargs=None, session_db=SESSION_DB_FILE, workers=0,
+                 queue_size=DEFAULT_SHARD_QUEUE_SIZE, log_level=None, log_file=None,
+                 worker_queue_size=DEFAULT_QUEUE_SIZE, outbound_rate=DEFAULT_RATE,
+                 outbound_burst=DEFAULT_BURST):
+        if shards < 1:
+            raise ValueError("Количество процессов обработки должно быть не меньше 1")
+
+        self.shards = shards
+        self.bot_factory = bot_factory
+        self.bot_kwargs = dict(bot_kwargs or {},
+                               outbound_rate=outbound_rate / shards,
+                               outbound_burst=max(1, outbound_burst // shards))
+        self.session_db = session_db
+        self.workers = workers
+        self.worker_queue_size = worker_queue_size
+        self.log_level = log_level
+        self.log_file = log_file
+        self.queue_size = queue_size
+
+        # spawn: процессы обработки не наследуют потоки и соединения входного процесса
+        self._context = multiprocessing.get_context('spawn')
+        # У каждого процесса свой канал (pipe). Входной процесс держит его открытым,
+        # поэтому события, пришедшие, пока процесс перезапускается, дождутся нового.
+        # Очередь multiprocessing.Queue не подходит: процесс, убитый во время
+        # ожидания, навсегда оставляет занятой её блокировку чтения.
+        self._pipes = [self._context.Pipe(duplex=False) for _ in range(shards)]
+        self._outboxes = [queue.Queue(maxsize=queue_size) for _ in range(shards)]
+        self._senders = []
+        self._processes = [None] * shards
+        self._running = False
+        self._stopped = threading.Event()
+        self._supervisor = None
+        self._lock = threading.Lock()
+
+        # Статистика
+        self.routed = 0
+        self.dropped = 0
+        self.restarts = 0
+
+    def _spawn(self, index):
+        reader, _ = self._pipes[index]
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, reader, self.bot_factory, self.bot_kwargs, self.session_db,
+                  self.workers, self.worker_queue_size, self.log_level, self.log_file),
+            name=f'vkinder-shard-{index}',
+            daemon=False
+        )
+        process.start()
+        self._processes[index] = process
+
+    def _sender_loop(self, index):
+        """Передача событий из очереди входного процесса в канал процесса обработки"""
+        outbox = self._outboxes[index]
+        _, writer = self._pipes[index]
+        while True:
+            event = outbox.get()
+            try:
+                # Если канал заполнен (процесс занят или перезапускается), ждём
+                writer.send(event)
+            except Exception as e:
+                logger.error(f"Ошибка передачи события процессу {index}: {e}")
+            if event is None:
+                return
+
+    def _supervise(self):
+        """Перезапуск упавших процессов обработки"""
+        while not self._stopped.wait(SUPERVISE_INTERVAL):
+            for index, process in enumerate(self._processes):
+                if self._stopped.is_set():
+                    return
+                if process is not None and not process.is_alive():
+                    logger.error(f"Процесс обработки {index} завершился (код {process.exitcode}), перезапускаем")
+                    with self._lock:
+                        self.restarts += 1
+                    self._spawn(index)
+
+    def start(self):
+        """Запуск процессов обработки"""
+        if self._running:
+            return
+
+        self._running = True
+        self._stopped.clear()
+        for index in range(self.shards):
+            self._spawn(index)
+            sender = threading.Thread(target=self._sender_loop, args=(index,),
+                                      name=f'vkinder-shard-sender-{index}', daemon=True)
+            sender.start()
+            self._senders.append(sender)
+        self._supervisor = threading.Thread(target=self._supervise, name='vkinder-shard-supervisor', daemon=True)
+        self._supervisor.start()
+        logger.info(f"Запущено процессов обработки: {self.shards}, сессии в {self.session_db}")
+
+    def submit(self, event):
+        """
+        Передача события процессу пользователя.
+        Возвращает False, если очередь процесса переполнена и событие отброшено.
+        """
+        index = shard_for(event.user_id, self.shards)
+        try:
+            self._outboxes[index].put(to_shard_event(event), timeout=SHARD_SUBMIT_TIMEOUT)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            logger.error(f"Очередь процесса {index} переполнена, событие от {event.user_id} отброшено")
+            return False
+
+        with self._lock:
+            self.routed += 1
+        return True
+
+    def stop(self, timeout=SHARD_STOP_TIMEOUT):
+        """Остановка: процессы обрабатывают уже принятые события и завершаются"""
+        if not self._running:
+            return
+
+        self._running = False
+        self._stopped.set()
+        if self._supervisor:
+            self._supervisor.join()
+
+        # Маркер остановки встаёт в конец очереди, после уже принятых событий
+        for outbox in self._outboxes:
+            outbox.put(None)
+        for index, process in enumerate(self._processes):
+            if process is None:
+                continue
+            process.join(timeout)
+            if process.is_alive():
+                logger.error(f"Процесс обработки {index} не завершился за {timeout} с, останавливаем")
+                process.terminate()
+                process.join()
+        self._senders = []
+        for reader, writer in self._pipes:
+            reader.close()
+            writer.close()
+
+        logger.info(f"Процессы обработки остановлены: передано {self.routed}, отброшено {self.dropped}, "
+                    f"перезапусков {self.restarts}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'shards': self.shards,
+                'alive': sum(1 for p in self._processes if p is not None and p.is_alive()),
+                'pending': sum(q.qsize() for q in self._outboxes),
+                'routed': self.routed,
+                'dropped': self.dropped,
+                'restarts': self.restarts,
+            }
+
+    def run(self, longpoll):
+        """Чтение событий и раздача их процессам обработки до Ctrl+C"""
+        logger.info("VKinder bot запущен в режиме нескольких процессов!")
+        print(f"🤖 VKinder bot запущен ({self.shards} процессов). Нажмите Ctrl+C для остановки.")
+
+        self.start()
+        try:
+            for event in longpoll.listen():
+                if event.type == VkEventType.MESSAGE_NEW and event.to_me:
+                    self.submit(event)
+
+        except KeyboardInterrupt:
+            logger.info("VKinder bot остановлен пользователем")
+            print("\n🛑 VKinder bot остановлен")
+
+        except Exception as e:
+            logger.error(f"Критическая ошибка: {e}")
+            print(f"❌ Критическая ошибка: {e}")
+
+        finally:
+            self.stop()
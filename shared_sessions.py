@@ -0,0 +1,454 @@
+"""
+Общее хранилище сессий для нескольких процессов бота
+Сессия пользователя переживает перезапуск процесса и переезд пользователя в другой процесс
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from datetime import datetime
+
+from session_store import SessionStore, CandidateList, CandidateRecord, DEFAULT_IDLE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Файл SQLite с сессиями по умолчанию
+SESSION_DB_FILE = 'vkinder_sessions.sqlite3'
+# Через сколько записей удалять из общего хранилища давно не использованные сессии
+PRUNE_EVERY = 1000
+# Сколько ждать блокировки файла другим процессом (секунды)
+SQLITE_TIMEOUT = 10
+# Ключ, под которым в JSON сессии хранится дата (ключи страниц избранных)
+_DATETIME_KEY = '__datetime__'
+
+
+class SqliteSessionBackend:
+    """
+    Сессии и позиции поиска в файле SQLite.
+
+    У каждой сессии есть номер версии, он растёт при каждой записи.
+    Процесс, у которого сессия уже есть в памяти, сверяет только версию
+    и перечитывает сессию, лишь если её изменил другой процесс.
+    Список кандидатов хранится отдельно от остального состояния со своей
+    версией: он меняется только при загрузке страницы поиска, а небольшое
+    состояние (номер карточки, режим) - при каждом событии.
+    Подходит любой объект с теми же методами (например, клиент сетевого KV).
+    """
+
+    def __init__(self, path=SESSION_DB_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
+
+    def _connection(self):
+        # Соединение открывается в том процессе, который им пользуется
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=SQLITE_TIMEOUT)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    user_id INTEGER PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    used_at REAL NOT NULL,
+                    state BLOB NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS session_candidates (
+                    user_id INTEGER PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    data BLOB NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS search_positions (
+                    user_id INTEGER PRIMARY KEY,
+                    key TEXT NOT NULL,
+                    offset INTEGER NOT NULL
+                )
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def __getstate__(self):
+        # В другой процесс передаётся только путь к файлу
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def version(self, user_id):
+        """Версия сессии или None, если сессии нет"""
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT version FROM sessions WHERE user_id = ?', (user_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def load(self, user_id):
+        """(версия, сессия в байтах) или (None, None)"""
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT version, state FROM sessions WHERE user_id = ?', (user_id,)
+            ).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def save(self, user_id, blob):
+        """Запись сессии; возвращает её новую версию"""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                'INSERT INTO sessions (user_id, version, used_at, state) VALUES (?, 1, ?, ?) '
+                'ON CONFLICT(user_id) DO UPDATE SET version = version + 1, '
+                'used_at = excluded.used_at, state = excluded.state',
+                (user_id, now, blob)
+            )
+            version = conn.execute('SELECT version FROM sessions WHERE user_id = ?', (user_id,)).fetchone()[0]
+            conn.commit()
+            self._writes += 1
+        return version
+
+    def load_candidates(self, user_id):
+        """(версия, список кандидатов в байтах) или (None, None)"""
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT version, data FROM session_candidates WHERE user_id = ?', (user_id,)
+            ).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def save_candidates(self, user_id, blob):
+        """Запись списка кандидатов сессии; возвращает его новую версию"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                'INSERT INTO session_candidates (user_id, version, data) VALUES (?, 1, ?) '
+                'ON CONFLICT(user_id) DO UPDATE SET version = version + 1, data = excluded.data',
+                (user_id, blob)
+            )
+            version = conn.execute(
+                'SELECT version FROM session_candidates WHERE user_id = ?', (user_id,)
+            ).fetchone()[0]
+            conn.commit()
+        return version
+
+    def delete(self, user_id):
+        with self._lock:
+            conn = self._connection()
+            conn.execute('DELETE FROM sessions WHERE user_id = ?', (user_id,))
+            conn.execute('DELETE FROM session_candidates WHERE user_id = ?', (user_id,))
+            conn.commit()
+
+    def prune(self, idle_timeout):
+        """Удаление сессий, к которым не обращались idle_timeout секунд; возвращает их число"""
+        with self._lock:
+            conn = self._connection()
+            cur = conn.execute('DELETE FROM sessions WHERE used_at < ?', (time.time() - idle_timeout,))
+            conn.execute('DELETE FROM session_candidates WHERE user_id NOT IN (SELECT user_id FROM sessions)')
+            conn.commit()
+        return cur.rowcount
+
+    def count(self):
+        with self._lock:
+            return self._connection().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+    def get_position(self, user_id):
+        """(ключ параметров поиска, смещение) или None"""
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT key, offset FROM search_positions WHERE user_id = ?', (user_id,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def save_position(self, user_id, key, offset):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                'INSERT OR REPLACE INTO search_positions (user_id, key, offset) VALUES (?, ?, ?)',
+                (user_id, key, offset)
+            )
+            conn.commit()
+
+    def reset_position(self, user_id):
+        with self._lock:
+            conn = self._connection()
+            conn.execute('DELETE FROM search_positions WHERE user_id = ?', (user_id,))
+            conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def _record_to_tuple(record):
+    return tuple(getattr(record, name) for name in CandidateRecord.__slots__)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return {_DATETIME_KEY: value.isoformat()}
+    raise TypeError(f"{type(value).__name__} не сохраняется в сессии")
+
+
+def _json_object_hook(data):
+    if len(data) == 1 and _DATETIME_KEY in data:
+        return datetime.fromisoformat(data[_DATETIME_KEY])
+    return data
+
+
+def _dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=_json_default).encode('utf-8')
+
+
+def _loads(blob):
+    return json.loads(blob, object_hook=_json_object_hook)
+
+
+def encode_candidates(candidates):
+    """Список кандидатов в байтах (JSON, кандидат - список полей CandidateRecord)"""
+    return _dumps([_record_to_tuple(CandidateRecord.from_dict(c)) for c in candidates])
+
+
+def decode_candidates(blob):
+    return CandidateList(CandidateRecord(*fields) for fields in _loads(blob))
+
+
+def session_to_json(state, with_candidates=True):
+    """
+    Сессия в виде, пригодном для JSON.
+    Кандидаты сохраняются списками полей, курсор поиска - своей позицией
+    (сам курсор держит ссылки на клиентов VK и в другой процесс не переносится).
+    """
+    data = dict(state)
+    candidates = data.pop('candidates', None)
+    if candidates is not None and with_candidates:
+        data['candidates'] = [_record_to_tuple(CandidateRecord.from_dict(c)) for c in candidates]
+    current = data.get('current_candidate')
+    if current is not None:
+        data['current_candidate'] = _record_to_tuple(CandidateRecord.from_dict(current))
+    cursor = data.get('cursor')
+    if cursor is not None:
+        data['cursor'] = cursor.position()
+    return data
+
+
+def session_from_json(data, restore_cursor=None):
+    """
+    Сессия из session_to_json.
+    restore_cursor(position) -> курсор заново открывает поиск с сохранённой позиции.
+    """
+    candidates = data.get('candidates')
+    if candidates is not None:
+        data['candidates'] = CandidateList(CandidateRecord(*fields) for fields in candidates)
+    current = data.get('current_candidate')
+    if current is not None:
+        data['current_candidate'] = CandidateRecord(*current)
+    position = data.get('cursor')
+    if position is not None:
+        data['cursor'] = restore_cursor(position) if restore_cursor else None
+    return data
+
+
+def encode_session(state):
+    """Сессия целиком в байтах (JSON: файлы сессий общие, и чтение не должно выполнять код)"""
+    return _dumps(session_to_json(state))
+
+
+def decode_session(blob, restore_cursor=None):
+    """Сессия из байтов encode_session"""
+    return session_from_json(_loads(blob), restore_cursor)
+
+
+class SharedSessionStore(SessionStore):
+    """
+    Сессии пользователей в общем хранилище (backend) с копией в памяти процесса.
+
+    Обработчики работают с сессией как с обычным словарём. В начале события
+    (session(user_id)) сверяется версия сессии в общем хранилище: если её
+    записал другой процесс или локальной копии нет, сессия загружается.
+    В конце события изменённая сессия записывается обратно, удалённая -
+    удаляется. Вытеснение из памяти процесса сессию в хранилище не удаляет.
+
+    Список кандидатов записывается отдельно и только когда он изменился
+    (загружена страница или начат новый поиск); на каждом событии
+    перезаписывается лишь небольшое состояние со ссылкой на версию списка.
+
+    restore_cursor(user_id, position) -> курсор восстанавливает курсор поиска
+    загруженной сессии.
+    """
+
+    def __init__(self, backend, restore_cursor=None, idle_timeout=DEFAULT_IDLE_TIMEOUT, **kwargs):
+        super().__init__(idle_timeout=idle_timeout, **kwargs)
+        self.backend = backend
+        self.restore_cursor = restore_cursor
+        # Версия и отпечаток локальной копии каждой сессии
+        self._versions = {}
+        self._digests = {}
+        # user_id -> (версия списка кандидатов, слабая ссылка на список, его длина при записи)
+        self._candidates = {}
+        self._saves = 0
+
+        # Статистика
+        self.loads = 0
+        self.writes = 0
+        self.skipped_writes = 0
+        self.candidate_writes = 0
+
+    def _load_candidates(self, user_id, version):
+        """Список кандидатов версии version: локальный, если он той же версии, иначе из хранилища"""
+        local = self._candidates.get(user_id)
+        if local is not None and local[0] == version:
+            candidates = local[1]()
+            if candidates is not None:
+                return candidates
+        version, blob = self.backend.load_candidates(user_id)
+        if blob is None:
+            # Список уже удалён из хранилища - сессия продолжится без кандидатов
+            return CandidateList()
+        candidates = decode_candidates(blob)
+        self._candidates[user_id] = (version, weakref.ref(candidates), len(candidates))
+        return candidates
+
+    def _store_candidates(self, user_id, candidates):
+        """Версия списка кандидатов в хранилище (список записывается, только если изменился)"""
+        local = self._candidates.get(user_id)
+        if local is not None and local[1]() is candidates and local[2] == len(candidates):
+            return local[0]
+        version = self.backend.save_candidates(user_id, encode_candidates(candidates))
+        self._candidates[user_id] = (version, weakref.ref(candidates), len(candidates))
+        self.candidate_writes += 1
+        return version
+
+    def _load(self, user_id):
+        version = self.backend.version(user_id)
+        if version is None:
+            self._drop_local(user_id)
+            return
+        if version == self._versions.get(user_id) and super().__contains__(user_id):
+            return
+
+        version, blob = self.backend.load(user_id)
+        if blob is None:
+            self._drop_local(user_id)
+            return
+        restore = None
+        if self.restore_cursor:
+            restore = lambda position: self.restore_cursor(user_id, position)  # noqa: E731
+        try:
+            data = _loads(blob)
+            candidates_version = data.pop('candidates', None)
+            state = session_from_json(data, restore)
+            if candidates_version is not None:
+                state['candidates'] = self._load_candidates(user_id, candidates_version)
+        except Exception as e:
+            logger.error(f"Ошибка загрузки сессии пользователя {user_id}: {e}")
+            self._drop_local(user_id)
+            return
+        super().__setitem__(user_id, state)
+        self._versions[user_id] = version
+        self._digests[user_id] = hash(blob)
+        self.loads += 1
+
+    def _drop_local(self, user_id):
+        super().pop(user_id, None)
+        self._versions.pop(user_id, None)
+        self._digests.pop(user_id, None)
+        self._candidates.pop(user_id, None)
+
+    def _store(self, user_id):
+        state = super().get(user_id)
+        if state is None:
+            if self._versions.pop(user_id, None) is not None:
+                self.backend.delete(user_id)
+            self._digests.pop(user_id, None)
+            self._candidates.pop(user_id, None)
+            return
+
+        data = session_to_json(state, with_candidates=False)
+        candidates = state.get('candidates')
+        if candidates is not None:
+            data['candidates'] = self._store_candidates(user_id, candidates)
+        blob = _dumps(data)
+        digest = hash(blob)
+        if digest == self._digests.get(user_id) and user_id in self._versions:
+            # Событие сессию не изменило
+            self.skipped_writes += 1
+            return
+        self._versions[user_id] = self.backend.save(user_id, blob)
+        self._digests[user_id] = digest
+        self.writes += 1
+
+        self._saves += 1
+        if self._saves % PRUNE_EVERY == 0:
+            pruned = self.backend.prune(self.idle_timeout)
+            if pruned:
+                logger.info(f"Удалено сессий из общего хранилища: {pruned}")
+
+    @contextmanager
+    def session(self, user_id):
+        """Загрузка сессии перед обработкой события и сохранение после"""
+        try:
+            self._load(user_id)
+        except Exception as e:
+            logger.error(f"Ошибка чтения общего хранилища сессий для {user_id}: {e}")
+        try:
+            yield
+        finally:
+            try:
+                self._store(user_id)
+            except Exception as e:
+                logger.error(f"Ошибка записи сессии пользователя {user_id}: {e}")
+
+    def _evict(self, user_id):
+        super()._evict(user_id)
+        # Из памяти процесса ушла только копия, сессия остаётся в хранилище
+        self._versions.pop(user_id, None)
+        self._digests.pop(user_id, None)
+        self._candidates.pop(user_id, None)
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({'loads': self.loads, 'writes': self.writes, 'skipped_writes': self.skipped_writes,
+                      'candidate_writes': self.candidate_writes})
+        return stats
+
+
+class SharedSearchPositions:
+    """Позиции поиска пользователей в общем хранилище (интерфейс candidate_search.SearchPositions)"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    @staticmethod
+    def _key(key):
+        return json.dumps(list(key), ensure_ascii=False)
+
+    def get(self, user_id, key):
+        try:
+            saved = self.backend.get_position(user_id)
+        except Exception as e:
+            logger.error(f"Ошибка чтения позиции поиска пользователя {user_id}: {e}")
+            return 0
+        if saved is None or saved[0] != self._key(key):
+            return 0
+        return saved[1]
+
+    def save(self, user_id, key, offset):
+        try:
+            self.backend.save_position(user_id, self._key(key), offset)
+        except Exception as e:
+            logger.error(f"Ошибка записи позиции поиска пользователя {user_id}: {e}")
+
+    def reset(self, user_id):
+        try:
+            self.backend.reset_position(user_id)
+        except Exception as e:
+            logger.error(f"Ошибка сброса позиции поиска пользователя {user_id}: {e}")
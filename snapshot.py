@@ -0,0 +1,186 @@
+"""
+Снимок сессий пользователей на диске
+После перезапуска пользователь продолжает просмотр с того же кандидата, не запуская поиск заново
+"""
+
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+
+from session_store import DEFAULT_IDLE_TIMEOUT
+from shared_sessions import encode_session, decode_session
+
+logger = logging.getLogger(__name__)
+
+# Файл снимка по умолчанию
+SNAPSHOT_FILE = 'vkinder_sessions.snap'
+# Как часто сохранять снимок во время работы (секунды)
+SNAPSHOT_INTERVAL = 60
+
+# Формат файла: сигнатура, число записей, затем записи
+# (user_id, время последнего обращения, длина) + сессия (JSON, сжатый zlib; см. encode_session)
+_MAGIC = b'VKSNAP2\n'
+_COUNT = struct.Struct('<I')
+_RECORD = struct.Struct('<qdI')
+
+
+class SessionSnapshot:
+    """
+    Снимок сессий.
+
+    При запуске читается только оглавление файла (user_id и смещения),
+    сама сессия распаковывается, когда пользователь присылает следующее
+    событие (take). Сессии, которые ещё никто не забрал, переносятся
+    в следующий снимок, пока не истечёт idle_timeout.
+    """
+
+    def __init__(self, path=SNAPSHOT_FILE, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        # user_id -> (время последнего обращения, смещение, длина)
+        self._index = {}
+        self._file = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+        # Статистика
+        self.restored = 0
+        self.saved = 0
+
+        self._open()
+
+    def _open(self):
+        """Чтение оглавления снимка (вызывается под блокировкой или при инициализации)"""
+        self._index = {}
+        if not os.path.exists(self.path):
+            return
+        try:
+            self._file = open(self.path, 'rb')
+            if self._file.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError("неизвестный формат файла")
+            count, = _COUNT.unpack(self._file.read(_COUNT.size))
+            expired_before = time.time() - self.idle_timeout
+            for _ in range(count):
+                user_id, used_at, length = _RECORD.unpack(self._file.read(_RECORD.size))
+                offset = self._file.tell()
+                if used_at >= expired_before:
+                    self._index[user_id] = (used_at, offset, length)
+                self._file.seek(length, os.SEEK_CUR)
+            logger.info(f"Снимок сессий {self.path}: {len(self._index)} сессий ожидают пользователей")
+        except Exception as e:
+            logger.error(f"Ошибка чтения снимка сессий {self.path}: {e}")
+            self._index = {}
+            self._close_file()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _read(self, offset, length):
+        self._file.seek(offset)
+        return self._file.read(length)
+
+    def __len__(self):
+        return len(self._index)
+
+    def take(self, user_id, restore_cursor=None):
+        """
+        Сессия пользователя из снимка (None, если её нет); забирается один раз.
+        restore_cursor(position) -> курсор заново открывает поиск.
+        """
+        with self._lock:
+            entry = self._index.pop(user_id, None)
+            if entry is None or self._file is None:
+                return None
+            _, offset, length = entry
+            blob = self._read(offset, length)
+
+        try:
+            state = decode_session(zlib.decompress(blob), restore_cursor)
+        except Exception as e:
+            logger.error(f"Ошибка восстановления сессии пользователя {user_id} из снимка: {e}")
+            return None
+        self.restored += 1
+        return state
+
+    def save(self, store):
+        """
+        Запись снимка: текущие сессии store и ещё не забранные сессии прошлого снимка.
+        Файл заменяется целиком, поэтому при сбое остаётся предыдущий снимок.
+        """
+        now = time.time()
+        records = []
+        for user_id, idle, state in store.idle_items():
+            try:
+                records.append((user_id, now - idle, zlib.compress(encode_session(state))))
+            except Exception as e:
+                logger.error(f"Ошибка сохранения сессии пользователя {user_id} в снимок: {e}")
+        live = {user_id for user_id, _, _ in records}
+
+        tmp_path = f'{self.path}.tmp'
+        with self._lock:
+            expired_before = now - self.idle_timeout
+            pending = [(user_id, used_at, self._read(offset, length))
+                       for user_id, (used_at, offset, length) in self._index.items()
+                       if user_id not in live and used_at >= expired_before]
+            records.extend(pending)
+
+            index = {}
+            try:
+                with open(tmp_path, 'wb') as f:
+                    f.write(_MAGIC)
+                    f.write(_COUNT.pack(len(records)))
+                    for user_id, used_at, blob in records:
+                        f.write(_RECORD.pack(user_id, used_at, len(blob)))
+                        if user_id not in live:
+                            index[user_id] = (used_at, f.tell(), len(blob))
+                        f.write(blob)
+                    f.flush()
+                    os.fsync(f.fileno())
+                # Старый файл закрываем до замены (иначе os.replace не сработает на Windows)
+                self._close_file()
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logger.error(f"Ошибка записи снимка сессий {self.path}: {e}")
+                self._close_file()
+                self._open()
+                return 0
+
+            self._file = open(self.path, 'rb')
+            self._index = index
+
+        self.saved = len(records)
+        logger.info(f"Снимок сессий сохранён: {len(live)} активных, {len(pending)} ожидающих")
+        return len(records)
+
+    def _loop(self, store, interval):
+        while not self._stop.wait(interval):
+            self.save(store)
+
+    def start(self, store, interval=SNAPSHOT_INTERVAL):
+        """Периодическое сохранение снимка в фоновом потоке"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(store, interval),
+                                        name='vkinder-snapshot', daemon=True)
+        self._thread.start()
+
+    def stop(self, store=None):
+        """Остановка фонового сохранения; при заданном store - последний снимок перед выходом"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if store is not None:
+            self.save(store)
+        with self._lock:
+            self._close_file()
+
+    def stats(self):
+        return {'pending': len(self._index), 'restored': self.restored, 'saved': self.saved}
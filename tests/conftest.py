@@ -0,0 +1,10 @@
+"""
+Общие настройки тестов VKinder
+Модули бота лежат в корне репозитория, поддельный VK API - в benchmarks
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
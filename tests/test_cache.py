@@ -0,0 +1,128 @@
+"""Тесты кэша ответов VK API"""
+
+import json
+import pickle
+
+import vk_executor
+from cache import CachedVKService, MemoryCacheBackend, SqliteCacheBackend, MISSING
+from vk_executor import VkUnavailable
+
+
+class FakeService:
+    """VKService, который считает вызовы; down=True - VK недоступен"""
+
+    def __init__(self, users=None):
+        self.users = users or {}
+        self.calls = []
+        self.down = False
+
+    def get_user_info(self, user_id):
+        self.calls.append(user_id)
+        if self.down:
+            raise VkUnavailable('users.get')
+        return self.users.get(user_id)
+
+    def get_popular_photos(self, owner_id):
+        return self.get_popular_photos_many([owner_id])[owner_id]
+
+    def get_popular_photos_many(self, owner_ids):
+        self.calls.append(tuple(owner_ids))
+        return {owner_id: [f'photo{owner_id}'] for owner_id in owner_ids}
+
+    def send_message(self, user_id, text):
+        return 'sent'
+
+
+def test_hit_after_first_call():
+    service = FakeService({1: {'user_id': 1}})
+    cached = CachedVKService(service)
+
+    assert cached.get_user_info(1) == {'user_id': 1}
+    assert cached.get_user_info(1) == {'user_id': 1}
+    assert service.calls == [1]
+    assert cached.stats()['hits'] == {'get_user_info': 1}
+    assert cached.stats()['misses'] == {'get_user_info': 1}
+
+
+def test_negative_answers_are_cached():
+    service = FakeService()
+    cached = CachedVKService(service)
+
+    assert cached.get_user_info(2) is None
+    assert cached.get_user_info(2) is None
+    assert service.calls == [2]
+
+
+def test_expired_entry_is_served_while_vk_is_down():
+    service = FakeService({1: {'user_id': 1}})
+    cached = CachedVKService(service, ttls={'get_user_info': -1})
+    cached.get_user_info(1)
+    service.down = True
+
+    assert cached.get_user_info(1) == {'user_id': 1}
+    assert cached.stats()['stale'] == {'get_user_info': 1}
+
+
+def test_answer_received_during_outage_is_not_cached():
+    service = FakeService({1: {'user_id': 1}})
+    cached = CachedVKService(service)
+    # VKService перехватил ошибку сам и вернул None, но сбой отмечен
+    service.get_user_info = lambda user_id: vk_executor._note_outage('users.get')
+
+    assert cached.get_user_info(1) is None
+    assert cached.backend.get('get_user_info:1') is MISSING
+
+
+def test_many_fetches_only_missing_owners():
+    service = FakeService()
+    cached = CachedVKService(service)
+    cached.get_popular_photos_many([1, 2])
+
+    assert cached.get_popular_photos_many([1, 2, 3]) == {1: ['photo1'], 2: ['photo2'], 3: ['photo3']}
+    assert service.calls == [(1, 2), (3,)]
+    assert cached.get_popular_photos(3) == ['photo3']
+
+
+def test_other_methods_pass_through():
+    assert CachedVKService(FakeService()).send_message(1, 'text') == 'sent'
+
+
+def test_memory_backend_evicts_least_recent():
+    backend = MemoryCacheBackend(max_entries=2)
+    backend.set('a', 1, 60)
+    backend.set('b', 2, 60)
+    backend.get('a')
+    backend.set('c', 3, 60)
+
+    assert backend.get('b') is MISSING
+    assert backend.get('a') == 1 and backend.get('c') == 3
+    assert backend.evictions == 1
+
+
+def test_sqlite_backend_roundtrip_and_expiry(tmp_path):
+    backend = SqliteCacheBackend(str(tmp_path / 'cache.sqlite3'))
+    backend.set('a', {'x': 1}, 60)
+    backend.set('b', 2, -1)
+
+    assert backend.get('a') == {'x': 1}
+    assert backend.get('b') is MISSING
+    assert backend.size()[0] == 1
+
+
+def test_sqlite_backend_stores_json_and_ignores_pickle(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    backend = SqliteCacheBackend(path)
+    cached = CachedVKService(FakeService({1: {'user_id': 1, 'first_name': 'Иван'}}), backend=backend)
+    cached.get_user_info(1)
+
+    blob = backend._conn.execute("SELECT value FROM cache WHERE key = 'get_user_info:1'").fetchone()[0]
+    assert json.loads(blob)[1] == {'user_id': 1, 'first_name': 'Иван'}
+
+    # Второй процесс читает ту же запись из файла как свежую
+    other = CachedVKService(FakeService(), backend=SqliteCacheBackend(path))
+    assert other.get_user_info(1) == {'user_id': 1, 'first_name': 'Иван'}
+    assert other.stats()['hits'] == {'get_user_info': 1}
+
+    backend._conn.execute("INSERT INTO cache VALUES ('old', 1e12, 0, ?)", (pickle.dumps({'x': 1}),))
+    backend._conn.commit()
+    assert backend.get('old') is MISSING
@@ -0,0 +1,67 @@
+"""Тесты сервера Callback API на настоящем HTTP-сервере"""
+
+import json
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+from callback import CallbackServer
+
+GROUP_ID = 42
+SECRET = 'secret'
+
+
+@pytest.fixture
+def server():
+    server = CallbackServer('abc123', secret=SECRET, group_id=GROUP_ID, host='127.0.0.1', port=0)
+    server.start()
+    yield server
+    server.stop()
+
+
+def post(server, update, path='/'):
+    """(HTTP-код, тело ответа) на POST с JSON"""
+    request = Request(f'http://127.0.0.1:{server.port}{path}', data=json.dumps(update).encode('utf-8'),
+                      headers={'Content-Type': 'application/json'})
+    try:
+        with urlopen(request, timeout=5) as response:
+            return response.status, response.read().decode('utf-8')
+    except HTTPError as e:
+        return e.code, e.read().decode('utf-8')
+
+
+def message_new(event_id, text='Поиск', user_id=7, secret=SECRET):
+    return {
+        'type': 'message_new', 'group_id': GROUP_ID, 'event_id': event_id, 'secret': secret,
+        'object': {'message': {'from_id': user_id, 'peer_id': user_id, 'text': text, 'date': 1700000000}},
+    }
+
+
+def test_confirmation_returns_code(server):
+    assert post(server, {'type': 'confirmation', 'group_id': GROUP_ID}) == (200, 'abc123')
+
+
+def test_message_new_is_queued_once(server):
+    assert post(server, message_new('e1')) == (200, 'ok')
+    # Повторная доставка того же event_id подтверждается, но в очередь не попадает
+    assert post(server, message_new('e1')) == (200, 'ok')
+
+    stats = server.stats()
+    assert (stats['accepted'], stats['duplicates'], stats['pending']) == (1, 1, 1)
+
+    event = next(server.listen())
+    assert (event.user_id, event.text, event.event_id) == (7, 'Поиск', 'e1')
+
+
+def test_wrong_secret_is_forbidden(server):
+    assert post(server, message_new('e2', secret='wrong')) == (403, 'forbidden')
+    assert server.stats()['rejected'] == 1
+    assert server.stats()['pending'] == 0
+
+
+def test_foreign_group_and_bad_path(server):
+    update = message_new('e3')
+    update['group_id'] = GROUP_ID + 1
+    assert post(server, update)[0] == 403
+    assert post(server, message_new('e4'), path='/other')[0] == 404
@@ -0,0 +1,42 @@
+"""Тесты общего пула кандидатов"""
+
+import pytest
+
+from candidate_pool import CandidatePool, pool_key, representative
+from candidate_search import search_params
+
+
+class SearchSession:
+    """users.search: запоминает параметры запросов"""
+
+    def __init__(self, total=50):
+        self.total = total
+        self.searches = []
+
+    def method(self, method, values=None):
+        if method == 'database.getCities':
+            return {'count': 1, 'items': [{'id': 1, 'title': 'Москва'}]}
+        self.searches.append(dict(values))
+        offset, count = values['offset'], values['count']
+        ids = range(offset + 1, min(offset + count, self.total) + 1)
+        return {'count': self.total, 'items': [{'id': i} for i in ids]}
+
+
+@pytest.mark.parametrize('sex', [1, 2, None])
+@pytest.mark.parametrize('age', [18, 20, 23, 24, 31, 60, None])
+def test_pool_search_matches_user_search(sex, age):
+    user_info = {'sex': sex, 'age': age, 'city': ' Москва '}
+    assert search_params(representative(pool_key(user_info))) == search_params(user_info)
+
+
+def test_users_share_pool_only_with_identical_search():
+    session = SearchSession()
+    pool = CandidatePool(session)
+
+    pool.cursor({'sex': 1, 'age': 30, 'city': 'москва'}).next_page(10)
+    pool.cursor({'sex': 1, 'age': 30, 'city': 'Москва'}).next_page(10)
+    pool.cursor({'sex': 1, 'age': 31, 'city': 'москва'}).next_page(10)
+
+    assert len(session.searches) == 2
+    assert [(s['age_from'], s['age_to']) for s in session.searches] == [(25, 35), (26, 36)]
+    assert pool.stats()['hits'] == 1
@@ -0,0 +1,96 @@
+"""Тесты постраничного поиска кандидатов"""
+
+from datetime import date
+
+from candidate_search import CandidateCursor, SearchPositions, MAX_SEARCH_OFFSET, age_from_bdate, \
+    search_params, to_candidate
+
+
+class SearchSession:
+    """users.search по total анкетам; закрытые - каждая десятая"""
+
+    def __init__(self, total=50):
+        self.total = total
+        self.calls = []
+
+    def method(self, method, values=None):
+        self.calls.append((method, dict(values)))
+        if method == 'database.getCities':
+            return {'count': 1, 'items': [{'id': 1, 'title': 'Москва'}]}
+        offset, count = values['offset'], values['count']
+        ids = range(offset + 1, min(offset + count, self.total) + 1)
+        return {'count': self.total, 'items': [{'id': i, 'is_closed': i % 10 == 0} for i in ids]}
+
+    def searches(self):
+        return [values for method, values in self.calls if method == 'users.search']
+
+
+def test_age_and_search_params():
+    assert age_from_bdate('15.6.1990', date(2020, 6, 14)) == 29
+    assert age_from_bdate('15.6', date(2020, 6, 14)) is None
+    params = search_params({'sex': 2, 'age': 20})
+    assert (params['sex'], params['age_from'], params['age_to']) == (1, 18, 25)
+
+
+def test_closed_profiles_are_skipped():
+    assert to_candidate({'id': 1, 'is_closed': True}) is None
+    assert to_candidate({'id': 1, 'city': {'id': 1, 'title': 'Москва'}})['city'] == 'Москва'
+
+
+def test_pages_are_loaded_on_demand_until_exhausted():
+    session = SearchSession(total=25)
+    cursor = CandidateCursor(session, {'sex': 1, 'age': 30}, page_size=10)
+
+    first = cursor.next_page(5)
+    assert [c['id'] for c in first] == [1, 2, 3, 4, 5]
+    assert len(session.searches()) == 1
+
+    rest = cursor.next_page() + cursor.next_page() + cursor.next_page()
+    assert [c['id'] for c in rest][-1] == 25
+    assert 10 not in [c['id'] for c in rest] and 20 not in [c['id'] for c in rest]
+    assert cursor.exhausted and cursor.next_page() == []
+    assert [s['offset'] for s in session.searches()] == [0, 5, 15]
+
+
+def test_search_stops_at_vk_offset_limit():
+    session = SearchSession(total=5000)
+    cursor = CandidateCursor(session, {}, offset=MAX_SEARCH_OFFSET - 10, page_size=20)
+
+    cursor.next_page()
+    assert session.searches()[-1]['count'] == 10
+    assert cursor.exhausted
+
+
+def test_city_is_resolved_once():
+    session = SearchSession()
+    cursor = CandidateCursor(session, {'city': 'Москва'}, page_size=5)
+    cursor.next_page()
+    cursor.next_page()
+
+    assert [method for method, _ in session.calls].count('database.getCities') == 1
+    assert all(s['city'] == 1 for s in session.searches())
+
+
+def test_resume_offset_points_at_page_of_current_candidate():
+    session = SearchSession()
+    cursor = CandidateCursor(session, {}, page_size=10, exclude=lambda cs: [c for c in cs if c['id'] % 2])
+    cursor.next_page()
+    cursor.next_page()
+
+    # По 5 кандидатов из каждой страницы: кандидат 7 в буфере - со второй страницы (смещение 10)
+    assert cursor.resume_offset(3) == 0
+    assert cursor.resume_offset(7) == 10
+
+    restored = CandidateCursor(session, {})
+    restored.seek(cursor.position())
+    assert restored.offset == 20 and restored.resume_offset(7) == 10
+
+
+def test_search_positions_depend_on_params():
+    positions = SearchPositions(max_size=1)
+    positions.save(1, ('key',), 40)
+
+    assert positions.get(1, ('key',)) == 40
+    assert positions.get(1, ('other',)) == 0
+    positions.save(2, ('key',), 10)
+    assert positions.get(1, ('key',)) == 0
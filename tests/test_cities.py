@@ -0,0 +1,74 @@
+"""Тесты справочника городов"""
+
+import pytest
+
+from cities import CityIndex, normalize_city
+
+
+class CitiesSession:
+    """database.getCities: города из списка или ошибка, если error задан"""
+
+    def __init__(self, cities=(), error=None):
+        self.cities = list(cities)
+        self.error = error
+        self.calls = 0
+
+    def method(self, method, values=None, raw=False):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        q = normalize_city(values['q'])
+        return {'items': [{'id': cid, 'title': title} for cid, title in self.cities
+                          if normalize_city(title).startswith(q)]}
+
+
+def make_index(session=None):
+    return CityIndex(session, cache_path=None)
+
+
+def test_exact_and_normalized_lookup():
+    index = make_index()
+    assert index.get('москва').id == 1
+    assert index.get('  Ростов на дону ').id == 119
+
+
+def test_suggest_by_prefix():
+    titles = [c.title for c in make_index().suggest('Са')]
+    assert titles == ['Самара', 'Санкт-Петербург', 'Саратов']
+
+
+def test_unknown_city_is_fetched_not_corrected():
+    session = CitiesSession([(104, 'Омск'), (144, 'Томск')])
+    city, suggestions = make_index(session).resolve('Томск')
+    assert (city.id, city.title) == (144, 'Томск')
+
+
+def test_typo_corrected_when_vk_has_no_such_city():
+    city, _ = make_index(CitiesSession()).resolve('Москвa')
+    assert city.id == 1
+
+
+def test_vk_failure_gives_suggestions_instead_of_correction():
+    session = CitiesSession(error=TimeoutError('timeout'))
+    city, suggestions = make_index(session).resolve('Томск')
+    assert city is None
+    assert [c.title for c in suggestions] == ['Омск']
+
+
+def test_city_id_caches_only_confirmed_misses():
+    session = CitiesSession()
+    index = make_index(session)
+    assert index.city_id('Нигдеград') is None
+    assert index.city_id('Нигдеград') is None
+    assert session.calls == 1
+
+
+def test_city_id_failure_is_not_cached():
+    session = CitiesSession(error=TimeoutError('timeout'))
+    index = make_index(session)
+    with pytest.raises(TimeoutError):
+        index.city_id('Томск')
+
+    session.error = None
+    session.cities = [(144, 'Томск')]
+    assert index.city_id('Томск') == 144
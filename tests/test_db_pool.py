@@ -0,0 +1,186 @@
+"""Тесты пула соединений и отложенной записи"""
+
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import psycopg2
+import psycopg2.pool
+import pytest
+
+import db_pool
+from db_pool import ConnectionPool, WriteBehindBuffer
+
+
+class RecordingPool:
+    """Пул, который записывает строки INSERT и отвергает строки с кандидатами из bad"""
+
+    def __init__(self, bad=(), down=False):
+        self.bad = set(bad)
+        self.down = down
+        self.rows = []
+        self.inserts = 0
+
+    @contextmanager
+    def connection(self):
+        if self.down:
+            raise psycopg2.OperationalError('connection refused')
+        yield self
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def fake_execute_values(cur, sql, rows):
+    cur.inserts += 1
+    if any(row[1] in cur.bad for row in rows):
+        raise psycopg2.DataError('invalid input')
+    cur.rows.extend(rows)
+
+
+def make_buffer(monkeypatch, pool):
+    monkeypatch.setattr(db_pool, 'execute_values', fake_execute_values)
+    return WriteBehindBuffer(pool, flush_interval=3600)
+
+
+def test_poison_row_is_dropped_and_others_written(monkeypatch):
+    pool = RecordingPool(bad={13})
+    buffer = make_buffer(monkeypatch, pool)
+    for candidate_id in range(1, 21):
+        buffer.add_blacklist(1, candidate_id)
+
+    assert buffer.flush() == 19
+    assert sorted(row[1] for row in pool.rows) == [i for i in range(1, 21) if i != 13]
+    assert buffer.dropped == 1
+    assert buffer.pending() == 0
+    # Следующий сброс ничего не повторяет
+    assert buffer.flush() == 0
+    buffer.close()
+
+
+def test_connection_error_keeps_rows_buffered(monkeypatch):
+    pool = RecordingPool(down=True)
+    buffer = make_buffer(monkeypatch, pool)
+    buffer.add_favorite(1, 2, 'Иван', 'Иванов')
+    buffer.add_blacklist(1, 3)
+    buffer.add_viewed(1, 4)
+
+    assert buffer.flush() == 0
+    assert buffer.pending() == 3
+    assert buffer.flush_errors == 1
+
+    pool.down = False
+    assert buffer.flush() == 3
+    assert (1, 4) in pool.rows
+    assert buffer.pending() == 0
+    buffer.close()
+
+
+def test_clear_favorites_waits_for_running_flush(monkeypatch):
+    pool = RecordingPool()
+    started, release = threading.Event(), threading.Event()
+
+    def slow_execute_values(cur, sql, rows):
+        started.set()
+        release.wait(5)
+        fake_execute_values(cur, sql, rows)
+
+    buffer = make_buffer(monkeypatch, pool)
+    monkeypatch.setattr(db_pool, 'execute_values', slow_execute_values)
+    buffer.add_favorite(1, 2, 'Иван', 'Иванов')
+
+    flusher = threading.Thread(target=buffer.flush)
+    flusher.start()
+    started.wait(5)
+
+    def clear(user_id):
+        pool.rows = [row for row in pool.rows if row[0] != user_id]
+
+    clearer = threading.Thread(target=buffer.clear_favorites, args=(1, clear))
+    clearer.start()
+    release.set()
+    flusher.join(5)
+    clearer.join(5)
+
+    # Очистка выполнилась после сброса и удалила записанное им избранное
+    assert pool.rows == []
+    buffer.close()
+
+
+def test_clear_favorites_discards_pending(monkeypatch):
+    pool = RecordingPool()
+    buffer = make_buffer(monkeypatch, pool)
+    buffer.add_favorite(1, 2, 'Иван', 'Иванов')
+    buffer.add_favorite(3, 4, 'Пётр', 'Петров')
+    cleared = []
+
+    buffer.clear_favorites(1, cleared.append)
+
+    assert cleared == [1]
+    assert buffer.flush() == 1
+    assert [row[:2] for row in pool.rows] == [(3, 4)]
+    buffer.close()
+
+
+class FakeConnection:
+    # putconn psycopg2 проверяет, открыто ли соединение и завершена ли транзакция
+    closed = 0
+    info = SimpleNamespace(transaction_status=0)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def test_connection_pool_waits_instead_of_raising_when_exhausted(monkeypatch):
+    monkeypatch.setattr(psycopg2, 'connect', lambda *args, **kwargs: FakeConnection())
+    pool = ConnectionPool({}, size=2)
+    lock = threading.Lock()
+    active, peak, errors = [0], [0], []
+
+    def work():
+        try:
+            with pool.connection():
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                time.sleep(0.01)
+                with lock:
+                    active[0] -= 1
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, daemon=True) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert errors == []
+    assert peak[0] == 2
+
+
+def test_connection_slot_is_returned_when_putconn_fails(monkeypatch):
+    monkeypatch.setattr(psycopg2, 'connect', lambda *args, **kwargs: FakeConnection())
+    pool = ConnectionPool({}, size=1)
+
+    def broken_putconn(conn, key=None, close=False):
+        raise psycopg2.pool.PoolError("trying to put unkeyed connection")
+
+    monkeypatch.setattr(pool._pool, 'putconn', broken_putconn)
+    for _ in range(3):
+        with pytest.raises(psycopg2.pool.PoolError):
+            with pool.connection():
+                pass
+
+    assert pool._slots.acquire(timeout=1)
@@ -0,0 +1,91 @@
+"""Тесты диспетчера событий"""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from dispatcher import EventDispatcher, SynchronizedProxy
+
+
+def event(user_id, n):
+    return SimpleNamespace(user_id=user_id, n=n)
+
+
+def test_events_of_one_user_keep_order():
+    handled = []
+    lock = threading.Lock()
+
+    def handler(item):
+        with lock:
+            handled.append((item.user_id, item.n))
+
+    dispatcher = EventDispatcher(handler, workers=4)
+    dispatcher.start()
+    for n in range(50):
+        for user_id in range(1, 6):
+            assert dispatcher.submit(event(user_id, n))
+    dispatcher.stop(drain=True)
+
+    assert len(handled) == 250
+    for user_id in range(1, 6):
+        assert [n for uid, n in handled if uid == user_id] == list(range(50))
+    assert dispatcher.processed == dispatcher.submitted == 250
+
+
+def test_users_are_processed_in_parallel():
+    started = threading.Barrier(2, timeout=5)
+    dispatcher = EventDispatcher(lambda item: started.wait(), workers=2)
+    dispatcher.start()
+
+    # Пользователи 1 и 2 закреплены за разными потоками: оба обработчика ждут друг друга
+    dispatcher.submit(event(1, 0))
+    dispatcher.submit(event(2, 0))
+    dispatcher.stop(drain=True)
+
+    assert not started.broken
+
+
+def test_handler_error_does_not_stop_worker():
+    handled = []
+
+    def handler(item):
+        if item.n == 0:
+            raise ValueError('boom')
+        handled.append(item.n)
+
+    dispatcher = EventDispatcher(handler, workers=1)
+    dispatcher.start()
+    dispatcher.submit(event(1, 0))
+    dispatcher.submit(event(1, 1))
+    dispatcher.stop(drain=True)
+
+    assert handled == [1]
+
+
+def test_full_queue_drops_event():
+    release = threading.Event()
+    dispatcher = EventDispatcher(lambda item: release.wait(5), workers=1, queue_size=1, submit_timeout=0.01)
+    dispatcher.start()
+    dispatcher.submit(event(1, 0))
+    dispatcher.submit(event(1, 1))
+
+    results = [dispatcher.submit(event(1, n)) for n in range(2, 4)]
+    release.set()
+    dispatcher.stop(drain=True)
+
+    assert not all(results)
+    assert dispatcher.dropped >= 1
+
+
+def test_submit_requires_start():
+    with pytest.raises(RuntimeError):
+        EventDispatcher(lambda item: None, workers=1).submit(event(1, 0))
+
+
+def test_synchronized_proxy_passes_calls_and_attributes():
+    target = SimpleNamespace(value=5, add=lambda x: x + 1)
+    proxy = SynchronizedProxy(target)
+
+    assert proxy.value == 5
+    assert proxy.add(1) == 2
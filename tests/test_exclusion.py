@@ -0,0 +1,119 @@
+"""Тесты индекса исключений"""
+
+from contextlib import contextmanager
+
+from exclusion import ExclusionIndex, IdSet
+
+
+class FakeDb:
+    def __init__(self, blacklist=(), favorites=(), fail=False):
+        self.blacklist = list(blacklist)
+        self.favorites = list(favorites)
+        self.fail = fail
+        self.loads = 0
+
+    def get_blacklist(self, user_id):
+        self.loads += 1
+        if self.fail:
+            raise ConnectionError('database is down')
+        return [{'candidate_id': c} for c in self.blacklist]
+
+    def get_favorites(self, user_id):
+        return [{'candidate_id': c} for c in self.favorites]
+
+
+class FakePool:
+    """Пул, курсор которого отвечает строками-кортежами по тексту запроса"""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.queries = []
+        self._rows = []
+
+    @contextmanager
+    def connection(self):
+        yield self
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        self.queries.append((sql, params))
+        table = sql.split('FROM ')[1].split()[0]
+        self._rows = [(c,) for c in self.tables.get(table, ())]
+
+    def fetchall(self):
+        return self._rows
+
+
+def candidates(*ids):
+    return [{'id': i} for i in ids]
+
+
+def test_idset_membership_across_merge():
+    ids = IdSet([5, 1])
+    for i in range(100, 200):
+        ids.add(i)
+    assert 1 in ids and 150 in ids and 3 not in ids
+    assert len(ids) == 102
+    assert sorted(ids) == [1, 5] + list(range(100, 200))
+
+
+def test_filter_excludes_blacklist_favorites_and_seen():
+    index = ExclusionIndex(FakeDb(blacklist=[1], favorites=[2]))
+    index.mark_seen(10, 3)
+
+    assert index.filter(10, candidates(1, 2, 3, 4)) == candidates(4)
+
+
+def test_loads_through_pool():
+    pool = FakePool({'blacklist': [1], 'favorites': [2]})
+    index = ExclusionIndex(db=None, pool=pool)
+
+    assert index.filter(10, candidates(1, 2, 3)) == candidates(3)
+    assert [params for _, params in pool.queries] == [(10,), (10,), (10,)]
+
+
+def test_seen_are_loaded_from_viewed_profiles():
+    pool = FakePool({'blacklist': [], 'favorites': [], 'viewed_profiles': [5]})
+    index = ExclusionIndex(db=None, pool=pool)
+
+    # Просмотренные в другом процессе или до перезапуска не показываются снова
+    assert index.filter(10, candidates(4, 5)) == candidates(4)
+
+
+def test_failed_load_keeps_writes_and_reloads_later():
+    db = FakeDb(blacklist=[1], fail=True)
+    index = ExclusionIndex(db, reload_interval=0)
+    index.add_blacklist(10, 2)
+    index.mark_seen(10, 3)
+
+    # БД недоступна: записи не теряются
+    assert index.filter(10, candidates(1, 2, 3, 4)) == candidates(1, 4)
+
+    db.fail = False
+    assert index.filter(10, candidates(1, 2, 3, 4)) == candidates(4)
+    loads = db.loads
+    index.filter(10, candidates(1))
+    assert db.loads == loads
+
+
+def test_failed_load_is_not_retried_before_interval():
+    db = FakeDb(fail=True)
+    index = ExclusionIndex(db, reload_interval=3600)
+    for _ in range(5):
+        index.filter(10, candidates(1))
+    assert db.loads == 1
+
+
+def test_eviction_bounds_users():
+    index = ExclusionIndex(FakeDb(), max_users=2)
+    for user_id in range(5):
+        index.mark_seen(user_id, 1)
+    assert index.stats()['users'] == 2
@@ -0,0 +1,93 @@
+"""Тесты постраничного просмотра избранных"""
+
+from contextlib import contextmanager
+
+from fake_vk import SqliteDatabase
+from favorites import FavoritesPager, FavoritesRepository
+
+
+def make_db(user_id=1, count=25):
+    db = SqliteDatabase()
+    # Записи, добавленные в одну секунду, различаются только id - он и упорядочивает страницы
+    for candidate_id in range(100, 100 + count):
+        db.add_to_favorites(user_id, candidate_id, f'Имя{candidate_id}', 'Фамилия')
+    return db
+
+
+def ids(favorites):
+    return [favorite['candidate_id'] for favorite in favorites]
+
+
+def test_pages_forward_and_back():
+    pager = FavoritesPager(make_db(), page_size=10)
+
+    page1, state = pager.first(1)
+    assert ids(page1) == list(range(100, 110))
+    assert (state['offset'], state['total'], state['has_prev'], state['has_next']) == (0, 25, False, True)
+
+    page2, state = pager.next(1, state)
+    page3, state = pager.next(1, state)
+    assert ids(page2) == list(range(110, 120))
+    assert ids(page3) == list(range(120, 125))
+    assert (state['offset'], state['has_next']) == (20, False)
+
+    back, state = pager.prev(1, state)
+    assert ids(back) == list(range(110, 120))
+    assert (state['offset'], state['has_prev'], state['has_next']) == (10, True, True)
+
+
+def test_single_page_is_not_counted():
+    db = make_db(count=3)
+    db.count_favorites = None
+    favorites, state = FavoritesPager(db, page_size=10).first(1)
+
+    assert len(favorites) == 3
+    assert state['total'] == 3 and not state['has_next']
+
+
+def test_next_after_clear_starts_over():
+    db = make_db()
+    pager = FavoritesPager(db, page_size=10)
+    _, state = pager.first(1)
+    db.clear_favorites(1)
+
+    favorites, state = pager.next(1, state)
+    assert favorites == [] and state['total'] == 0
+
+
+class RecordingPool:
+    """Пул соединений, который запоминает SQL и отдаёт заданные строки"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    @contextmanager
+    def connection(self):
+        yield self
+
+    @contextmanager
+    def cursor(self):
+        yield self
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_repository_reads_by_key_without_offset():
+    rows = [(i, 100 + i, 'Имя', 'Фамилия', '2024-01-01') for i in range(4)]
+    pool = RecordingPool(rows)
+    repository = FavoritesRepository(pool)
+
+    favorites, has_more = repository.get_favorites_page(1, after=('2024-01-01', 7), limit=3)
+    sql, params = pool.executed[-1]
+    assert 'OFFSET' not in sql and '(created_at, id) > (%s, %s)' in sql
+    assert params == (1, '2024-01-01', 7, 4)
+    assert ids(favorites) == [100, 101, 102] and has_more
+
+    favorites, has_more = repository.get_favorites_page(1, before=('2024-01-01', 7), limit=5)
+    assert 'ORDER BY created_at DESC, id DESC' in pool.executed[-1][0]
+    assert ids(favorites) == [103, 102, 101, 100] and not has_more
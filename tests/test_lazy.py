@@ -0,0 +1,71 @@
+"""Тесты отложенного создания клиентов"""
+
+import threading
+import time
+
+import pytest
+
+from lazy import LazyClient, Startup
+
+
+class SlowFactory:
+    """Фабрика клиента, которая ждёт release; calls - сколько раз клиент создавался"""
+
+    def __init__(self):
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return object()
+
+
+def test_start_builds_in_background():
+    factory = SlowFactory()
+    client = LazyClient(factory, 'client')
+    startup = Startup()
+
+    began = time.perf_counter()
+    startup.start(client)
+    assert time.perf_counter() - began < 1
+    factory.release.set()
+
+    assert client.get() is client.get()
+    assert factory.calls == 1
+    startup.shutdown()
+
+
+def test_start_does_not_wait_for_build_in_another_thread():
+    factory = SlowFactory()
+    client = LazyClient(factory, 'client')
+    startup = Startup()
+    # Фоновая задача обратилась к клиенту раньше start() и создаёт его сама
+    startup.submit(client.get, 'task')
+    assert factory.started.wait(5)
+
+    began = time.perf_counter()
+    startup.start(client)
+    assert time.perf_counter() - began < 1
+
+    factory.release.set()
+    assert client.get() is not None
+    assert factory.calls == 1
+    startup.shutdown()
+
+
+def test_failed_build_is_retried():
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError('нет сети')
+        return 'client'
+
+    client = LazyClient(factory, 'client')
+    with pytest.raises(ConnectionError):
+        client.get()
+    assert client.get() == 'client'
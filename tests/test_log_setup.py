@@ -0,0 +1,36 @@
+"""Тесты настройки логирования"""
+
+import logging
+import os
+
+from log_setup import RotatingFileHandler
+
+
+def emit(handler, message):
+    handler.emit(logging.LogRecord('test', logging.INFO, __file__, 0, message, None, None))
+
+
+def test_size_rotation_keeps_newest_backups(tmp_path):
+    path = tmp_path / 'x.log'
+    handler = RotatingFileHandler(str(path), max_bytes=200, backup_count=2)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    for i in range(40):
+        emit(handler, f'record {i:02d} ' + 'x' * 20)
+    handler.close()
+
+    files = sorted(tmp_path.iterdir(), key=lambda p: p.stat().st_mtime_ns)
+    assert len(files) == 3
+    numbers = [int(line.split()[1]) for f in files for line in f.read_text().splitlines()]
+    # Записи идут подряд и заканчиваются последней: потеряны только самые старые
+    assert numbers == list(range(numbers[0], 40))
+
+
+def test_backups_beyond_count_are_deleted(tmp_path):
+    path = tmp_path / 'x.log'
+    handler = RotatingFileHandler(str(path), max_bytes=50, backup_count=1)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    for i in range(20):
+        emit(handler, f'record {i:02d} ' + 'x' * 40)
+    handler.close()
+
+    assert len(os.listdir(tmp_path)) == 2
@@ -0,0 +1,34 @@
+"""Тесты параметров запуска бота"""
+
+import pytest
+
+from cli import parse_args
+
+
+def error_line(capsys):
+    return capsys.readouterr().err.strip().splitlines()[-1]
+
+
+def test_async_rejects_unsupported_options(capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        parse_args(['--async', '--workers', '4', '--write-behind', '--log-file', ''])
+
+    error = error_line(capsys)
+    assert exit_info.value.code == 2
+    assert '--workers' in error
+    assert '--write-behind' in error
+    assert '--log-file' not in error
+
+
+def test_async_accepts_supported_options():
+    args = parse_args(['--async', '--cache-db', 'cache.sqlite3', '--log-level', 'debug'])
+    assert args.use_async and args.cache_db == 'cache.sqlite3'
+
+
+def test_shards_reject_options_that_do_not_apply(capsys):
+    with pytest.raises(SystemExit):
+        parse_args(['--shards', '4', '--metrics-port', '9000', '--snapshot', 'x.snap', '--queue-size', '10'])
+
+    error = error_line(capsys)
+    assert '--metrics-port' in error and '--snapshot' in error
+    assert '--queue-size' not in error
@@ -0,0 +1,53 @@
+"""Тесты метрик"""
+
+from metrics import MetricsRegistry
+
+
+def test_counter_func_is_exported_as_counter():
+    registry = MetricsRegistry()
+    hits = {'value': 3}
+    registry.counter_func('vkinder_prefetch_hits_total', 'Попадания', lambda: hits['value'])
+
+    hits['value'] = 5
+    text = registry.render()
+
+    assert '# TYPE vkinder_prefetch_hits_total counter' in text
+    assert 'vkinder_prefetch_hits_total 5' in text
+
+
+def test_counter_func_with_label():
+    registry = MetricsRegistry()
+    registry.counter_func('vkinder_cache_hits_total', 'Попадания в кэш',
+                          lambda: {'get_user_info': 2, 'get_popular_photos': 7}, labelname='method')
+
+    lines = registry.render().splitlines()
+
+    assert '# TYPE vkinder_cache_hits_total counter' in lines
+    assert 'vkinder_cache_hits_total{method="get_popular_photos"} 7' in lines
+    assert 'vkinder_cache_hits_total{method="get_user_info"} 2' in lines
+
+
+def test_failing_metric_is_skipped():
+    registry = MetricsRegistry()
+    registry.counter_func('broken_total', 'Ошибка', lambda: 1 / 0)
+    registry.gauge('ok', 'Работает', lambda: 1)
+
+    text = registry.render()
+
+    assert 'broken_total' not in text
+    assert 'ok 1' in text
+
+
+def test_counter_and_histogram_render():
+    registry = MetricsRegistry()
+    errors = registry.counter('vkinder_errors_total', 'Ошибки', ('component',))
+    errors.labels(component='vk').inc()
+    latency = registry.histogram('vkinder_latency_seconds', 'Задержка', buckets=(0.1, 1.0))
+    latency.observe(0.5)
+
+    lines = registry.render().splitlines()
+
+    assert 'vkinder_errors_total{component="vk"} 1.0' in lines
+    assert 'vkinder_latency_seconds_bucket{le="0.1"} 0' in lines
+    assert 'vkinder_latency_seconds_bucket{le="1.0"} 1' in lines
+    assert 'vkinder_latency_seconds_count 1' in lines
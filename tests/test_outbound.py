@@ -0,0 +1,108 @@
+"""Тесты очереди исходящих сообщений"""
+
+import threading
+import time
+
+import pytest
+from vk_api.exceptions import ApiError
+
+import outbound
+from outbound import OutboundQueue
+
+
+class FakeMessages:
+    """messages.send, который отвечает ошибками из словаря user_id -> список кодов"""
+
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send(self, user_id, message, keyboard=None, attachment=None, random_id=0):
+        with self.lock:
+            codes = self.errors.get(user_id)
+            if codes:
+                code = codes.pop(0)
+                raise ApiError(self, 'messages.send', {}, False, {'error_code': code, 'error_msg': 'error'})
+            self.sent.append((user_id, message))
+
+
+class FakeVk:
+    def __init__(self, errors=None):
+        self.messages = FakeMessages(errors)
+
+
+def drain(queue):
+    queue.start()
+    queue.stop(timeout=5)
+
+
+@pytest.fixture(autouse=True)
+def short_backoff(monkeypatch):
+    monkeypatch.setattr(outbound, 'BACKOFF_BASE', 0.2)
+
+
+def test_rate_limited_message_does_not_block_other_users():
+    vk = FakeVk({1: [6]})
+    queue = OutboundQueue(vk, rate=1000, burst=1000)
+    queue.send(1, 'first')
+    queue.send(2, 'other')
+    queue.send(1, 'second')
+
+    started = time.monotonic()
+    queue.start()
+    deadline = started + 5
+    while not vk.messages.sent and time.monotonic() < deadline:
+        time.sleep(0.005)
+    # Сообщение второму пользователю ушло, не дожидаясь повтора первого
+    assert vk.messages.sent[0] == (2, 'other')
+    assert time.monotonic() - started < 0.1
+    queue.stop(timeout=5)
+
+    assert vk.messages.sent == [(2, 'other'), (1, 'first'), (1, 'second')]
+    assert queue.stats()['retries'] == 1
+    assert queue.stats()['failed'] == 0
+
+
+def test_flood_control_is_not_retried():
+    vk = FakeVk({1: [9]})
+    queue = OutboundQueue(vk, rate=1000, burst=1000)
+    queue.send(1, 'hello')
+    drain(queue)
+
+    assert vk.messages.sent == []
+    assert queue.stats()['failed'] == 1
+    assert queue.stats()['retries'] == 0
+
+
+def test_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr(outbound, 'BACKOFF_BASE', 0)
+    vk = FakeVk({1: [6] * (outbound.MAX_RETRIES + 1)})
+    queue = OutboundQueue(vk, rate=1000, burst=1000)
+    queue.send(1, 'hello')
+    drain(queue)
+
+    assert vk.messages.sent == []
+    assert queue.stats()['retries'] == outbound.MAX_RETRIES
+    assert queue.stats()['failed'] == 1
+
+
+def test_coalescing_is_off_by_default():
+    vk = FakeVk()
+    queue = OutboundQueue(vk, rate=1000, burst=1000)
+    queue.send(1, 'a')
+    queue.send(1, 'b')
+    drain(queue)
+
+    assert vk.messages.sent == [(1, 'a'), (1, 'b')]
+
+
+def test_coalesce_window_merges_messages():
+    vk = FakeVk()
+    queue = OutboundQueue(vk, rate=1000, burst=1000, coalesce_window=0.05)
+    queue.send(1, 'a')
+    queue.send(1, 'b')
+    drain(queue)
+
+    assert vk.messages.sent == [(1, 'a\n\nb')]
+    assert queue.stats()['coalesced'] == 1
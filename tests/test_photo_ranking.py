@@ -0,0 +1,113 @@
+"""Тесты ранжирования фото профиля"""
+
+import json
+import re
+
+from photo_ranking import PhotoRanker, TopK, EXECUTE_BATCH_SIZE, PHOTOS_PER_OWNER
+
+_CALL = re.compile(r'API\.photos\.get\((\{.*?\})\)(\.count)?')
+
+
+def photo(owner_id, n, likes):
+    return {'id': n, 'owner_id': owner_id, 'likes': {'count': likes}, 'comments': {'count': 0}}
+
+
+class PhotosSession:
+    """
+    photos.get и execute с пакетом photos.get по альбомам из словаря owner_id -> фото.
+    Альбом None - закрытый профиль (в execute вызов возвращает false);
+    execute с владельцем из failing завершается ошибкой целиком.
+    """
+
+    def __init__(self, albums, failing=()):
+        self.albums = albums
+        self.failing = set(failing)
+        self.calls = []
+
+    def _get(self, params):
+        items = self.albums[params['owner_id']]
+        offset = params.get('offset', 0)
+        return {'count': len(items), 'items': items[offset:offset + params['count']]}
+
+    def method(self, method, values=None, raw=False):
+        self.calls.append(method)
+        if method == 'photos.get':
+            return self._get(values)
+        results = []
+        for params, count_only in _CALL.findall(values['code']):
+            params = json.loads(params)
+            if params['owner_id'] in self.failing:
+                raise RuntimeError('execute failed')
+            if self.albums[params['owner_id']] is None:
+                results.append(False)
+                continue
+            page = self._get(params)
+            results.append(page['count'] if count_only else page)
+        return {'response': results}
+
+
+def album(owner_id, size, best_at, best_likes=1000):
+    return [photo(owner_id, n, best_likes if n == best_at else n % 10) for n in range(size)]
+
+
+def test_topk_keeps_most_popular_in_order():
+    top = TopK(2)
+    top.add([photo(1, n, likes) for n, likes in enumerate([5, 9, 1, 9, 7])])
+    assert [p['id'] for p in top.result()] == [1, 3]
+
+
+def test_streaming_reads_whole_album():
+    session = PhotosSession({1: album(1, 450, best_at=420)})
+    ranker = PhotoRanker(session, page_size=200)
+
+    photos = ranker.get_popular_photos(1)
+
+    assert photos[0]['id'] == 420
+    assert session.calls == ['photos.get'] * 3
+
+
+def test_batch_reads_photos_beyond_execute_cap():
+    size = PHOTOS_PER_OWNER + 300
+    session = PhotosSession({1: album(1, size, best_at=PHOTOS_PER_OWNER + 100), 2: album(2, 5, best_at=2)})
+    ranker = PhotoRanker(session, page_size=200)
+
+    result = ranker.get_popular_photos_many([1, 2])
+
+    assert result[1][0]['id'] == PHOTOS_PER_OWNER + 100
+    assert result[2][0]['id'] == 2
+    assert session.calls == ['execute', 'photos.get', 'photos.get']
+
+
+def test_unchanged_album_is_not_reread():
+    session = PhotosSession({1: album(1, 10, best_at=3)})
+    ranker = PhotoRanker(session)
+    ranker.get_popular_photos_many([1])
+    session.calls.clear()
+
+    assert ranker.get_popular_photos_many([1])[1][0]['id'] == 3
+    assert session.calls == ['execute']
+    assert ranker.stats()['fresh'] == 1
+
+
+def test_batch_splits_owners_into_execute_calls():
+    owners = range(1, EXECUTE_BATCH_SIZE * 2 + 2)
+    session = PhotosSession({owner_id: album(owner_id, 5, best_at=owner_id % 5) for owner_id in owners})
+
+    result = PhotoRanker(session).get_popular_photos_many(list(owners) + [1])
+
+    assert session.calls == ['execute'] * 3
+    assert all(result[owner_id][0]['id'] == owner_id % 5 for owner_id in owners)
+
+
+def test_closed_profile_and_failed_batch_do_not_lose_others():
+    owners = range(1, EXECUTE_BATCH_SIZE + 3)
+    albums = {owner_id: album(owner_id, 5, best_at=1) for owner_id in owners}
+    albums[2] = None
+    # Второй пакет execute (владельцы после первых 25) падает целиком
+    session = PhotosSession(albums, failing={EXECUTE_BATCH_SIZE + 1})
+
+    result = PhotoRanker(session).get_popular_photos_many(list(owners))
+
+    assert result[2] is None
+    assert result[1][0]['id'] == 1 and result[EXECUTE_BATCH_SIZE][0]['id'] == 1
+    assert result[EXECUTE_BATCH_SIZE + 1] is None and result[EXECUTE_BATCH_SIZE + 2] is None
@@ -0,0 +1,89 @@
+"""Тесты предзагрузки фотографий"""
+
+import threading
+
+import pytest
+
+from prefetch import PhotoPrefetcher
+
+
+class Fetcher:
+    """Загрузка фото с учётом вызовов; block - держать загрузку до release"""
+
+    def __init__(self, block=False):
+        self.calls = []
+        self.release = threading.Event()
+        if not block:
+            self.release.set()
+
+    def __call__(self, owner_id):
+        self.calls.append(owner_id)
+        self.release.wait(5)
+        if owner_id < 0:
+            raise ValueError('нет доступа')
+        return [f'photo{owner_id}']
+
+
+def candidates(*ids):
+    return [{'id': i} for i in ids]
+
+
+def test_scheduled_photos_are_hits():
+    fetch = Fetcher()
+    prefetcher = PhotoPrefetcher(fetch, depth=2)
+    prefetcher.schedule(1, candidates(10, 11, 12), 0)
+
+    assert prefetcher.get(1, 10) == ['photo10']
+    assert prefetcher.get(1, 11) == ['photo11']
+    assert prefetcher.get(1, 12) == ['photo12']
+    assert (prefetcher.hits, prefetcher.misses) == (2, 1)
+    assert sorted(fetch.calls) == [10, 11, 12]
+    prefetcher.shutdown()
+
+
+def test_schedule_does_not_refetch():
+    fetch = Fetcher()
+    prefetcher = PhotoPrefetcher(fetch, depth=3)
+    prefetcher.schedule(1, candidates(10, 11), 0)
+    prefetcher.schedule(1, candidates(10, 11), 0)
+    prefetcher.get(1, 10)
+    prefetcher.get(1, 11)
+
+    assert sorted(fetch.calls) == [10, 11]
+    prefetcher.shutdown()
+
+
+def test_warm_results_are_served_without_fetch():
+    fetch = Fetcher()
+    prefetcher = PhotoPrefetcher(fetch)
+    prefetcher.warm(1, {10: ['batched'], 11: None})
+
+    assert prefetcher.get(1, 10) == ['batched']
+    assert prefetcher.get(1, 11) == ['photo11']
+    assert fetch.calls == [11]
+    prefetcher.shutdown()
+
+
+def test_failed_prefetch_falls_back_to_direct_fetch():
+    fetch = Fetcher()
+    prefetcher = PhotoPrefetcher(fetch, depth=1)
+    prefetcher.schedule(1, candidates(-5), 0)
+
+    # Ошибка предзагрузки не отдаётся сразу: фото запрашиваются ещё раз напрямую
+    with pytest.raises(ValueError):
+        prefetcher.get(1, -5)
+    assert fetch.calls == [-5, -5]
+    assert prefetcher.misses == 1
+    prefetcher.shutdown()
+
+
+def test_cancel_drops_pending_prefetch():
+    fetch = Fetcher(block=True)
+    prefetcher = PhotoPrefetcher(fetch, depth=3, workers=1)
+    prefetcher.schedule(1, candidates(10, 11, 12), 0)
+    prefetcher.cancel(1)
+    fetch.release.set()
+
+    assert prefetcher.get(1, 12) == ['photo12']
+    assert prefetcher.misses == 1
+    prefetcher.shutdown()
@@ -0,0 +1,83 @@
+"""Тесты предобработки входящих событий"""
+
+import time
+from types import SimpleNamespace
+
+from preprocess import EventPreprocessor
+from router import CommandRouter
+
+
+def make_event(text, user_id=1, age=0):
+    return SimpleNamespace(user_id=user_id, text=text, timestamp=time.time() - age)
+
+
+def make_preprocessor(**kwargs):
+    return EventPreprocessor(CommandRouter(), **kwargs)
+
+
+def test_next_presses_coalesce_into_one_advance():
+    pre = make_preprocessor()
+    item = pre.admit(make_event('Следующий'))
+
+    assert pre.admit(make_event('Следующий')) is None
+    assert pre.admit(make_event('далее')) is None
+    assert pre.take(item)[1] == 3
+    assert pre.stats()['coalesced'] == 2
+
+
+def test_started_event_is_not_extended():
+    pre = make_preprocessor()
+    pre.take(pre.admit(make_event('Следующий')))
+
+    assert pre.admit(make_event('Следующий')) is not None
+
+
+def test_idempotent_duplicates_run_once_other_users_apart():
+    pre = make_preprocessor()
+
+    assert pre.admit(make_event('Помощь')) is not None
+    assert pre.admit(make_event('Помощь')) is None
+    assert pre.admit(make_event('Помощь', user_id=2)) is not None
+
+
+def test_ratings_are_not_coalesced():
+    pre = make_preprocessor()
+
+    assert pre.admit(make_event('В избранное')) is not None
+    assert pre.admit(make_event('В избранное')) is not None
+
+
+def test_stale_navigation_is_dropped():
+    pre = make_preprocessor(max_age=10)
+
+    assert pre.admit(make_event('Следующий', age=60)) is None
+    assert pre.stats()['stale'] == 1
+
+
+def test_stale_ratings_and_input_are_still_processed():
+    pre = make_preprocessor(max_age=10)
+
+    for text in ('В избранное', '25-30'):
+        item = pre.admit(make_event(text, age=60))
+        assert item is not None
+        event, repeat = pre.take(item)
+        assert event is item.event and repeat == 1
+    assert pre.stats()['stale'] == 0
+
+
+def test_navigation_that_aged_in_queue_is_dropped_on_take():
+    pre = make_preprocessor(max_age=10)
+    item = pre.admit(make_event('Поиск'))
+    item.received_at -= 60
+    item.event.timestamp -= 60
+
+    assert pre.take(item) == (None, 0)
+    assert pre.stats()['stale'] == 1
+
+
+def test_low_priority_commands_shed_under_load():
+    pre = make_preprocessor(shed_threshold=5)
+
+    assert pre.admit(make_event('Помощь'), load=5) is None
+    assert pre.admit(make_event('Поиск'), load=5) is not None
+    assert pre.stats()['shed'] == 1
@@ -0,0 +1,86 @@
+"""Тесты пакетной загрузки профилей"""
+
+import threading
+import time
+
+import pytest
+
+from profiles import ProfileBatcher
+
+
+class UsersSession:
+    """users.get с задержкой; known - ID существующих пользователей"""
+
+    def __init__(self, known, latency=0.0, error=None):
+        self.known = set(known)
+        self.latency = latency
+        self.error = error
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def method(self, method, values=None):
+        ids = [int(i) for i in values['user_ids'].split(',')]
+        with self.lock:
+            self.calls.append(ids)
+        time.sleep(self.latency)
+        if self.error:
+            raise self.error
+        return [{'id': i, 'first_name': 'Имя', 'last_name': 'Фамилия', 'bdate': '1.1.1990',
+                 'sex': 1, 'city': {'id': 1, 'title': 'Москва'}} for i in ids if i in self.known]
+
+
+def test_single_request_is_sent_without_waiting():
+    session = UsersSession({1})
+    batcher = ProfileBatcher(session, window=1.0)
+
+    started = time.monotonic()
+    profile = batcher.get(1)
+
+    assert time.monotonic() - started < 0.5
+    assert profile['user_id'] == 1
+    assert profile['city'] == 'москва'
+    assert session.calls == [[1]]
+
+
+def test_unknown_user_is_none():
+    batcher = ProfileBatcher(UsersSession(set()))
+    assert batcher.get(5) is None
+
+
+def test_concurrent_requests_share_calls():
+    session = UsersSession(range(100), latency=0.02)
+    batcher = ProfileBatcher(session, window=0.05)
+    results = {}
+
+    def get(user_id):
+        results[user_id] = batcher.get(user_id)
+
+    threads = [threading.Thread(target=get, args=(i,)) for i in range(100)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert sorted(results) == list(range(100))
+    assert all(results[i]['user_id'] == i for i in range(100))
+    assert len(session.calls) < 20
+    assert sorted(i for call in session.calls for i in call) == list(range(100))
+
+
+def test_batch_respects_max_ids():
+    session = UsersSession(range(10), latency=0.02)
+    batcher = ProfileBatcher(session, window=0.05, max_ids=3)
+
+    threads = [threading.Thread(target=batcher.get, args=(i,)) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert all(len(call) <= 3 for call in session.calls)
+
+
+def test_error_reaches_caller():
+    batcher = ProfileBatcher(UsersSession({1}, error=RuntimeError('boom')))
+    with pytest.raises(RuntimeError):
+        batcher.get(1)
@@ -0,0 +1,52 @@
+"""Тесты векторного ранжирования кандидатов"""
+
+import random
+
+import pytest
+
+from ranking import CandidateRanker, naive_score
+
+NOW = 1_700_000_000
+USER = {'age': 30, 'city': 'Москва'}
+
+
+def make_candidates(n, seed=1):
+    rng = random.Random(seed)
+    return [{
+        'id': i,
+        'age': rng.choice([None, 20, 25, 30, 35, 40]),
+        'city': rng.choice(['москва', 'казань', None]),
+        'last_seen': rng.choice([None, NOW - rng.randint(0, 10 * 24 * 3600)]),
+        'common_count': rng.choice([None, 0, 3, 10]),
+        'photos_count': rng.choice([None, 1, 20, 100]),
+    } for i in range(n)]
+
+
+def test_vector_scores_match_naive_scores():
+    ranker = CandidateRanker()
+    candidates = make_candidates(200)
+
+    scores = ranker.scores(ranker.features(candidates, USER, now=NOW))
+    assert list(scores) == pytest.approx([naive_score(c, USER, now=NOW) for c in candidates])
+
+
+def test_rank_orders_by_score_and_top_k_is_prefix():
+    ranker = CandidateRanker()
+    candidates = make_candidates(100)
+
+    ranked = ranker.rank(candidates, USER, now=NOW)
+    scores = [naive_score(c, USER, now=NOW) for c in ranked]
+    assert scores == sorted(scores, reverse=True)
+    top = ranker.rank(candidates, USER, k=10, now=NOW)
+    assert [naive_score(c, USER, now=NOW) for c in top] == pytest.approx(scores[:10])
+
+
+def test_weights_override_defaults():
+    ranker = CandidateRanker(weights={'city_match': 100})
+    candidates = [{'id': 1, 'city': 'казань', 'common_count': 50}, {'id': 2, 'city': 'москва'}]
+
+    assert [c['id'] for c in ranker.rank(candidates, USER, now=NOW)] == [2, 1]
+
+
+def test_small_lists_are_returned_as_is():
+    assert CandidateRanker().rank([{'id': 1}], USER) == [{'id': 1}]
@@ -0,0 +1,40 @@
+"""Тесты маршрутизации команд"""
+
+import json
+from types import SimpleNamespace
+
+from router import COMMANDS, CommandRouter, KeyboardCache, KEYBOARDS, event_payload, normalize_command
+
+
+def test_payload_wins_over_text():
+    router = CommandRouter()
+    assert router.resolve('помощь', {'command': 'search'}) == 'handle_search'
+    assert router.resolve('помощь', {'command': 'unknown'}) == 'handle_help'
+
+
+def test_button_labels_and_aliases():
+    router = CommandRouter()
+    assert router.resolve('▶️ следующий') == 'handle_next_candidate'
+    assert router.resolve('  ДАЛЕЕ!! ') == 'handle_next_candidate'
+    assert router.resolve('что-то ещё') is None
+
+
+def test_normalize_command_drops_emoji_and_punctuation():
+    assert normalize_command('❤️ В избранное!') == 'в избранное'
+
+
+def test_event_payload_from_string_or_extra_values():
+    assert event_payload(SimpleNamespace(payload='{"command": "next"}')) == {'command': 'next'}
+    assert event_payload(SimpleNamespace(extra_values={'payload': '{"command": "help"}'})) == {'command': 'help'}
+    assert event_payload(SimpleNamespace(payload='not json')) is None
+    assert event_payload(SimpleNamespace(payload='[1]')) is None
+
+
+def test_keyboards_carry_command_payloads():
+    keyboards = KeyboardCache()
+    for name in KEYBOARDS:
+        buttons = [button for row in json.loads(keyboards[name])['buttons'] for button in row]
+        payloads = [button['action'].get('payload') for button in buttons]
+        # Кнопки ввода настроек (пол, город) отправляют текст без payload
+        for payload in filter(None, payloads):
+            assert json.loads(payload)['command'] in COMMANDS
@@ -0,0 +1,71 @@
+"""Тесты хранилища сессий: бюджет памяти и учёт роста списков кандидатов"""
+
+from session_store import SessionStore, CandidateList
+
+
+def make_candidates(start, count):
+    return [{'id': i, 'first_name': 'Имя', 'last_name': 'Фамилия'} for i in range(start, start + count)]
+
+
+def list_bytes(count):
+    return CandidateList(make_candidates(0, count)).nbytes
+
+
+def test_budget_is_enforced_on_every_write():
+    store = SessionStore(memory_budget=list_bytes(10) * 2)
+
+    for user_id in range(1, 4):
+        store[user_id] = {'candidates': make_candidates(user_id * 100, 10)}
+
+    assert 1 not in store
+    assert 2 in store and 3 in store
+    assert store.stats()['budget_evictions'] == 1
+
+
+def test_growth_of_candidate_list_is_counted():
+    store = SessionStore(memory_budget=list_bytes(30))
+    store[1] = {'candidates': make_candidates(0, 10)}
+    store[2] = {'candidates': make_candidates(100, 10)}
+    assert store.stats()['bytes'] == store[1]['candidates'].nbytes + store[2]['candidates'].nbytes
+
+    # Подгрузка страницы у пользователя 2 выводит за бюджет - вытесняется давно не использованный 1
+    store[2]['candidates'].extend(make_candidates(200, 20))
+
+    assert 1 not in store
+    assert store.stats()['bytes'] == store[2]['candidates'].nbytes
+    assert store.stats()['budget_evictions'] == 1
+
+
+def test_growing_session_becomes_most_recent():
+    store = SessionStore(memory_budget=list_bytes(30))
+    store[1] = {'candidates': make_candidates(0, 10)}
+    store[2] = {'candidates': make_candidates(100, 10)}
+    candidates = store[1]['candidates']
+    store.get(2)
+
+    candidates.extend(make_candidates(200, 15))
+
+    assert 1 in store and 2 not in store
+
+
+def test_replaced_or_removed_list_is_not_counted():
+    store = SessionStore()
+    store[1] = {'candidates': make_candidates(0, 10)}
+    old = store[1]['candidates']
+    store[1] = {'candidates': make_candidates(100, 5)}
+
+    old.extend(make_candidates(200, 10))
+    assert store.stats()['bytes'] == store[1]['candidates'].nbytes
+
+    removed = store.pop(1)['candidates']
+    removed.extend(make_candidates(300, 10))
+    assert store.stats()['bytes'] == 0
+
+
+def test_last_session_is_kept_over_budget():
+    store = SessionStore(memory_budget=1)
+    store[1] = {'candidates': make_candidates(0, 10)}
+
+    store[1]['candidates'].extend(make_candidates(100, 10))
+
+    assert 1 in store
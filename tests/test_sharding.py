@@ -0,0 +1,44 @@
+"""Тесты запуска в нескольких процессах"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from outbound import DEFAULT_RATE
+from sharding import ShardedRunner, shard_for, shard_log_file, to_shard_event
+
+
+def close_pipes(runner):
+    for reader, writer in runner._pipes:
+        reader.close()
+        writer.close()
+
+
+def test_outbound_rate_is_split_between_shards():
+    runner = ShardedRunner(4, dict, bot_kwargs={'prefetch_depth': 2}, outbound_rate=20, outbound_burst=20)
+    try:
+        assert runner.bot_kwargs == {'prefetch_depth': 2, 'outbound_rate': 5, 'outbound_burst': 5}
+    finally:
+        close_pipes(runner)
+
+
+def test_each_shard_gets_at_least_burst_of_one():
+    runner = ShardedRunner(DEFAULT_RATE * 2, dict)
+    try:
+        assert runner.bot_kwargs['outbound_rate'] * runner.shards == pytest.approx(DEFAULT_RATE)
+        assert runner.bot_kwargs['outbound_burst'] == 1
+    finally:
+        close_pipes(runner)
+
+
+def test_shard_is_stable_and_in_range():
+    assert shard_for(12345, 4) == shard_for(12345, 4)
+    assert {shard_for(user_id, 4) for user_id in range(1000)} == {0, 1, 2, 3}
+
+
+def test_shard_log_file_and_event():
+    assert shard_log_file('vkinder.log', 2) == 'vkinder.2.log'
+    assert shard_log_file('', 2) is None
+
+    event = to_shard_event(SimpleNamespace(user_id=7, text='поиск', timestamp=1, extra_values={}))
+    assert (event.user_id, event.text, event.timestamp) == (7, 'поиск', 1)
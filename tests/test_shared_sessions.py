@@ -0,0 +1,127 @@
+"""Тесты общего хранилища сессий, снимка и позиции курсора"""
+
+import pickle
+from datetime import datetime
+
+import pytest
+
+from candidate_pool import CandidatePool
+from session_store import SessionStore, CandidateList
+from shared_sessions import SharedSessionStore, SqliteSessionBackend, encode_session, decode_session
+from snapshot import SessionSnapshot
+
+
+class SearchSession:
+    """users.search по населению из total анкет"""
+
+    def __init__(self, total=100):
+        self.total = total
+        self.calls = 0
+
+    def method(self, method, values=None):
+        self.calls += 1
+        offset, count = values['offset'], values['count']
+        ids = range(offset + 1, min(offset + count, self.total) + 1)
+        return {'count': self.total, 'items': [{'id': i, 'first_name': f'Имя{i}'} for i in ids]}
+
+
+def candidates(*ids):
+    return CandidateList({'id': i, 'first_name': f'Имя{i}', 'age': 25} for i in ids)
+
+
+def test_session_round_trip_is_json():
+    created = datetime(2026, 10, 18, 12, 30)
+    state = {
+        'candidates': candidates(1, 2),
+        'current_candidate': candidates(2)[0],
+        'current_index': 1,
+        'mode': 'search',
+        'favorites_page': {'first': (created, 7), 'last': None, 'total': 1},
+    }
+
+    blob = encode_session(state)
+    restored = decode_session(blob)
+
+    assert blob.startswith(b'{')
+    assert [c['id'] for c in restored['candidates']] == [1, 2]
+    assert restored['current_candidate']['id'] == 2
+    assert restored['current_index'] == 1
+    assert restored['favorites_page']['first'] == [created, 7]
+
+
+def test_pickled_blob_is_not_loaded():
+    with pytest.raises(Exception):
+        decode_session(pickle.dumps({'mode': 'search'}))
+
+
+def test_candidates_are_written_only_when_they_change(tmp_path):
+    path = str(tmp_path / 'sessions.sqlite3')
+    writer = SharedSessionStore(SqliteSessionBackend(path))
+    reader = SharedSessionStore(SqliteSessionBackend(path))
+
+    with writer.session(1):
+        writer[1] = {'candidates': candidates(1, 2, 3), 'current_index': 0, 'mode': 'search'}
+    for index in (1, 2):
+        with writer.session(1):
+            writer[1]['current_index'] = index
+
+    stats = writer.stats()
+    assert stats['writes'] == 3
+    assert stats['candidate_writes'] == 1
+
+    with reader.session(1):
+        state = reader[1]
+    assert state['current_index'] == 2
+    assert [c['id'] for c in state['candidates']] == [1, 2, 3]
+
+    # Новая страница дописана в список - он записывается заново
+    with writer.session(1):
+        writer[1]['candidates'].extend(candidates(4))
+    assert writer.stats()['candidate_writes'] == 2
+    with reader.session(1):
+        assert [c['id'] for c in reader[1]['candidates']] == [1, 2, 3, 4]
+
+
+def test_deleted_session_is_removed_from_backend(tmp_path):
+    backend = SqliteSessionBackend(str(tmp_path / 'sessions.sqlite3'))
+    store = SharedSessionStore(backend)
+    with store.session(1):
+        store[1] = {'candidates': candidates(1), 'current_index': 0}
+    with store.session(1):
+        del store[1]
+
+    assert backend.version(1) is None
+    assert backend.load_candidates(1) == (None, None)
+
+
+def test_snapshot_restores_session(tmp_path):
+    path = str(tmp_path / 'sessions.snap')
+    store = SessionStore()
+    store[1] = {'candidates': candidates(1, 2), 'current_index': 1, 'mode': 'search'}
+    SessionSnapshot(path).save(store)
+
+    snapshot = SessionSnapshot(path)
+    state = snapshot.take(1)
+    assert state['current_index'] == 1
+    assert [c['id'] for c in state['candidates']] == [1, 2]
+    assert snapshot.take(1) is None
+
+
+def test_pool_cursor_position_survives_seek():
+    pool = CandidatePool(SearchSession())
+    user_info = {'sex': 1, 'age': 25}
+    cursor = pool.cursor(user_info, exclude=lambda page: [c for c in page if c['id'] % 2])
+    first = cursor.next_page(10)
+    second = cursor.next_page(10)
+    assert len(first) == len(second) == 5
+
+    # Показан первый кандидат второй страницы - продолжать надо с её начала
+    assert cursor.resume_offset(len(first)) == 10
+    assert cursor.resume_offset(0) == 0
+
+    # Позиция проходит через JSON сессии и открывает курсор с того же места
+    position = decode_session(encode_session({'cursor': cursor}), restore_cursor=lambda p: p)['cursor']
+    restored = pool.cursor(user_info)
+    restored.seek(position)
+    assert restored.position() == cursor.position()
+    assert restored.resume_offset(len(first)) == 10
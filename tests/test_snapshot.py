@@ -0,0 +1,51 @@
+"""Тесты снимка сессий для тёплого перезапуска"""
+
+from session_store import SessionStore
+from snapshot import SessionSnapshot
+
+
+def make_store(*user_ids):
+    store = SessionStore()
+    for user_id in user_ids:
+        store[user_id] = {'candidates': [{'id': user_id * 10}], 'current_index': 0, 'mode': 'search'}
+    return store
+
+
+def test_untaken_sessions_carry_over_to_next_snapshot(tmp_path):
+    path = str(tmp_path / 'sessions.snap')
+    SessionSnapshot(path).save(make_store(1, 2))
+
+    # После перезапуска вернулся только пользователь 1; пользователь 2 ждёт в следующем снимке
+    snapshot = SessionSnapshot(path)
+    store = SessionStore()
+    store[1] = snapshot.take(1)
+    assert snapshot.save(store) == 2
+    snapshot.stop()
+
+    restarted = SessionSnapshot(path)
+    assert len(restarted) == 2
+    assert [c['id'] for c in restarted.take(2)['candidates']] == [20]
+
+
+def test_expired_sessions_are_not_restored(tmp_path):
+    path = str(tmp_path / 'sessions.snap')
+    SessionSnapshot(path).save(make_store(1))
+
+    assert len(SessionSnapshot(path, idle_timeout=-1)) == 0
+
+
+def test_unknown_file_is_ignored(tmp_path):
+    path = tmp_path / 'sessions.snap'
+    path.write_bytes(b'pickle data')
+
+    snapshot = SessionSnapshot(str(path))
+    assert len(snapshot) == 0 and snapshot.take(1) is None
+
+
+def test_stop_writes_final_snapshot(tmp_path):
+    path = str(tmp_path / 'sessions.snap')
+    snapshot = SessionSnapshot(path)
+    snapshot.start(make_store(), interval=3600)
+    snapshot.stop(make_store(3))
+
+    assert SessionSnapshot(path).take(3)['mode'] == 'search'
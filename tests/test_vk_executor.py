@@ -0,0 +1,119 @@
+"""Тесты слоя выполнения запросов VK API"""
+
+import pytest
+import vk_api
+from vk_api.exceptions import ApiError
+
+import vk_executor
+from vk_executor import VkExecutor, CircuitBreaker, CircuitOpenError, DeadlineExceeded, call_budget, \
+    outage_tracker
+
+
+class FlakySession:
+    """Сессия, которая отвечает ошибками из списка, а потом успехом"""
+
+    def __init__(self, codes):
+        self.codes = list(codes)
+        self.calls = 0
+
+    def method(self, method, values=None, raw=False):
+        self.calls += 1
+        if self.codes:
+            code = self.codes.pop(0)
+            raise ApiError(self, method, values, raw, {'error_code': code, 'error_msg': 'error'})
+        return {'ok': True}
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(vk_executor, 'BACKOFF_BASE', 0)
+
+
+def test_install_routes_error_6_to_executor():
+    session = vk_api.VkApi(token='token')
+    executor = VkExecutor(session, 'user')
+    executor._install()
+
+    error = ApiError(session, 'users.get', {}, False, {'error_code': 6, 'error_msg': 'Too many requests'})
+    with pytest.raises(ApiError):
+        session.error_handlers[6](error)
+
+
+def test_install_replaces_vk_api_serialization_with_pacer():
+    session = vk_api.VkApi(token='token')
+    rps_delay = session.RPS_DELAY
+    executor = VkExecutor(session, 'user')
+    executor._install()
+
+    assert session.RPS_DELAY == 0
+    assert executor.pacer is not None
+    assert executor.pacer.rate == pytest.approx(1 / rps_delay)
+
+
+def test_retries_transient_errors():
+    session = FlakySession([10, 10])
+    executor = VkExecutor(session, 'user')
+
+    assert executor.method('users.get') == {'ok': True}
+    assert session.calls == 3
+    assert executor.stats()['retries'] == 2
+
+
+def test_breaker_counts_one_failure_per_call():
+    session = FlakySession([10] * 100)
+    executor = VkExecutor(session, 'user', breaker=CircuitBreaker(failures=2), max_retries=3)
+
+    with pytest.raises(ApiError):
+        executor.method('users.get')
+    assert session.calls == 4
+    assert executor.breaker.state == CircuitBreaker.CLOSED
+
+    with pytest.raises(ApiError):
+        executor.method('users.get')
+    assert executor.breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        executor.method('users.get')
+    assert session.calls == 8
+
+
+def test_rate_limit_shrinks_limit_without_opening_breaker():
+    session = FlakySession([6] * 100)
+    executor = VkExecutor(session, 'user', breaker=CircuitBreaker(failures=1))
+    executor.limiter.cooldown = 0
+    initial = executor.limiter.limit
+
+    for _ in range(3):
+        with pytest.raises(ApiError):
+            executor.method('users.get')
+
+    assert executor.breaker.state == CircuitBreaker.CLOSED
+    assert executor.limiter.limit < initial
+
+
+def test_flood_control_is_not_retried():
+    session = FlakySession([9])
+    executor = VkExecutor(session, 'user')
+
+    with pytest.raises(ApiError):
+        executor.method('messages.send')
+    assert session.calls == 1
+
+
+def test_breaker_probe_after_reset_timeout():
+    breaker = CircuitBreaker(failures=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_expired_budget_raises_deadline_and_records_outage():
+    executor = VkExecutor(FlakySession([]), 'user')
+    with outage_tracker() as outages, call_budget(0):
+        with pytest.raises(DeadlineExceeded):
+            executor.method('users.get')
+    assert outages == ['users.get']
@@ -0,0 +1,57 @@
+"""
+Пакетные запросы к VK API через метод execute
+Один запрос execute вмещает до 25 вызовов API, один users.get - до 1000 профилей
+"""
+
+import logging
+
+from vk_service import VKService
+from vk_executor import VkUnavailable
+from profiles import ProfileBatcher
+from photo_ranking import PhotoRanker
+
+logger = logging.getLogger(__name__)
+
+
+class BatchVKService(VKService):
+    """
+    VKService с пакетными методами на основе execute.
+    Популярные фото считает PhotoRanker: альбом читается постранично,
+    а повторный запрос проверяет только число фото владельца.
+    Профили запрашиваются пакетами users.get (см. profiles.ProfileBatcher).
+    """
+
+    def __init__(self, vk_session, user_session):
+        super().__init__(vk_session, user_session)
+        self.batch_session = user_session
+        self.photo_ranker = PhotoRanker(user_session)
+        self.profiles = ProfileBatcher(user_session)
+
+    def get_user_info(self, user_id):
+        """Информация о пользователе (запросы из разных потоков объединяются в один users.get)"""
+        try:
+            return self.profiles.get(user_id)
+        except VkUnavailable:
+            # Кэш отдаст устаревшую запись, а не запомнит пустой ответ
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка получения информации о пользователе {user_id}: {e}")
+            return None
+
+    def get_popular_photos(self, owner_id):
+        """Самые популярные фото профиля ([] для закрытых и удалённых профилей)"""
+        try:
+            return self.photo_ranker.get_popular_photos(owner_id)
+        except Exception as e:
+            logger.error(f"Ошибка получения фото пользователя {owner_id}: {e}")
+            return []
+
+    def get_popular_photos_many(self, owner_ids):
+        """
+        Популярные фото сразу для многих пользователей.
+
+        Возвращает словарь owner_id -> список фото. Для закрытых и удалённых
+        профилей (и при любой ошибке отдельного вызова) значение - None,
+        остальные результаты пакета при этом не теряются.
+        """
+        return self.photo_ranker.get_popular_photos_many(owner_ids)
@@ -0,0 +1,380 @@
+"""
+Выполнение запросов VK API
+Адаптивное ограничение параллельности, повторы с разбросом, автоматический выключатель и бюджет времени
+"""
+
+import contextvars
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from vk_api.exceptions import ApiError
+from vk_api.vk_api import VkApiMethod
+
+from lazy import LazyClient
+from outbound import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Коды ошибок VK, после которых запрос стоит повторить:
+# 1 - неизвестная ошибка, 6 - слишком много запросов в секунду, 10 - внутренняя ошибка сервера.
+# 9 (слишком много однотипных действий) не повторяем: ограничение снимается не скоро
+TRANSIENT_ERROR_CODES = (1, 6, 10)
+# Ограничения частоты: уменьшают число параллельных запросов, но не размыкают выключатель -
+# VK при этом отвечает
+OVERLOAD_ERROR_CODES = (6, 9, 29)
+# Код ошибки «слишком много запросов в секунду» (vk_api обрабатывает его сам)
+TOO_MANY_RPS_CODE = 6
+# Повторы: не больше MAX_RETRIES, пауза случайная от 0 до BACKOFF_BASE * 2^попытка (не больше BACKOFF_MAX)
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.2
+BACKOFF_MAX = 2.0
+# Время на запрос, если обработчик не задал свой бюджет (секунды)
+DEFAULT_CALL_TIMEOUT = 10.0
+# Бюджет обработчика сообщения на все запросы к VK (секунды)
+DEFAULT_HANDLER_BUDGET = 5.0
+# Параллельные запросы с одним токеном: начальное значение и границы
+AIMD_INITIAL = 8
+AIMD_MIN = 1
+AIMD_MAX = 32
+# Уменьшаем лимит не чаще, чем раз в столько секунд (одна перегрузка - одно уменьшение)
+AIMD_COOLDOWN = 1.0
+# Выключатель: размыкается после стольких неудач подряд и через столько секунд пробует снова
+BREAKER_FAILURES = 5
+BREAKER_RESET_TIMEOUT = 10.0
+
+_deadline = contextvars.ContextVar('vk_deadline', default=None)
+_outages = contextvars.ContextVar('vk_outages', default=None)
+# Сколько секунд осталось у выполняемого запроса (для таймаута HTTP)
+_call_timeout = contextvars.ContextVar('vk_call_timeout', default=None)
+
+
+class VkUnavailable(Exception):
+    """VK сейчас не отвечает: выключатель разомкнут, истёк бюджет времени или закончились повторы"""
+
+
+class CircuitOpenError(VkUnavailable):
+    """Выключатель разомкнут - запрос к VK не отправлялся"""
+
+
+class DeadlineExceeded(VkUnavailable):
+    """Запрос не уложился в бюджет времени обработчика"""
+
+
+@contextmanager
+def call_budget(seconds):
+    """Бюджет времени на все запросы к VK внутри блока (вложенный бюджет не больше внешнего)"""
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None:
+        deadline = min(deadline, outer)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget():
+    """Сколько секунд осталось у текущего бюджета (None - бюджет не задан)"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+@contextmanager
+def outage_tracker():
+    """
+    Список методов, на которых VK оказался недоступен внутри блока.
+    Нужен, когда ошибку перехватывает код между кэшем и запросом
+    (VKService возвращает None вместо исключения).
+    """
+    outages = []
+    token = _outages.set(outages)
+    try:
+        yield outages
+    finally:
+        _outages.reset(token)
+
+
+def _note_outage(method):
+    outages = _outages.get()
+    if outages is not None:
+        outages.append(method)
+
+
+class AIMDLimiter:
+    """
+    Адаптивный лимит параллельных запросов (AIMD).
+    Каждый успешный запрос увеличивает лимит на 1/лимит (примерно +1 за «раунд»),
+    перегрузка (ошибки 6, 9, 29, таймауты) уменьшает его вдвое.
+    """
+
+    def __init__(self, initial=AIMD_INITIAL, min_limit=AIMD_MIN, max_limit=AIMD_MAX, cooldown=AIMD_COOLDOWN):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout=None):
+        """Место для запроса; False, если не дождались за timeout секунд"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    def release(self, overloaded=False):
+        with self._cond:
+            self.in_flight -= 1
+            if overloaded:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.min_limit, self.limit / 2)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель.
+    После failures неудач подряд размыкается: запросы сразу получают
+    CircuitOpenError. Через reset_timeout секунд пропускает один пробный
+    запрос; удачный замыкает выключатель, неудачный размыкает снова.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failures=BREAKER_FAILURES, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+        # Статистика
+        self.opened = 0
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            # Пробный запрос, который так и не отправили (истёк бюджет), не держит выключатель вечно
+            if self.state == self.HALF_OPEN and (not self._probing or now - self._probe_started >= self.reset_timeout):
+                self._probing = True
+                self._probe_started = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive = 0
+            if self.state != self.CLOSED:
+                logger.info("VK снова отвечает, выключатель замкнут")
+            self.state = self.CLOSED
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self.state == self.HALF_OPEN or self._consecutive >= self.failures:
+                if self.state != self.OPEN:
+                    self.opened += 1
+                    logger.error(f"VK не отвечает ({self._consecutive} ошибок подряд), "
+                                 f"выключатель разомкнут на {self.reset_timeout} с")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+class VkExecutor:
+    """
+    Сессия VK с политикой выполнения запросов (для одного токена).
+
+    Интерфейс совпадает с vk_api.VkApi: method(), get_api(), остальные
+    атрибуты берутся из исходной сессии. Каждый запрос:
+    - ждёт места в адаптивном лимите параллельных запросов (AIMD);
+    - при временных ошибках (TRANSIENT_ERROR_CODES, сетевые) повторяется
+      со случайной паузой;
+    - при разомкнутом выключателе сразу завершается CircuitOpenError;
+    - укладывается в бюджет времени обработчика (call_budget), иначе DeadlineExceeded.
+
+    Выключатель считает неудачей запрос, не выполненный после всех повторов
+    (а не каждую попытку); ограничения частоты (OVERLOAD_ERROR_CODES) только
+    уменьшают лимит параллельности.
+
+    vk_api.VkApi выполняет запросы строго по одному (под session.lock с паузой
+    RPS_DELAY между ними), поэтому лимит параллельности на нём ничего бы не менял.
+    Executor снимает эту блокировку, а паузу RPS_DELAY соблюдает сам (self.pacer):
+    частота запросов остаётся прежней, но медленные запросы (execute, photos.get)
+    больше не ждут друг друга.
+    """
+
+    def __init__(self, session, name, limiter=None, breaker=None, max_retries=MAX_RETRIES,
+                 call_timeout=DEFAULT_CALL_TIMEOUT):
+        self.session = session
+        self.name = name
+        self.limiter = limiter or AIMDLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        self.call_timeout = call_timeout
+        # Ограничитель частоты вместо паузы vk_api (создаётся в _install для vk_api.VkApi)
+        self.pacer = None
+        self._installed = False
+        self._lock = threading.Lock()
+
+        # Статистика
+        self.calls = 0
+        self.retries = 0
+        self.rejected = 0
+        self.deadlines = 0
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def _install(self):
+        """
+        Подготовка vk_api.VkApi: ошибка 6 должна доходить до нас (по умолчанию
+        vk_api сам ждёт и повторяет её без ограничений), запросы - идти параллельно
+        с прежней частотой, а HTTP-запрос - получать таймаут.
+        """
+        with self._lock:
+            if self._installed:
+                return
+            self._installed = True
+            session = self.session.get() if isinstance(self.session, LazyClient) else self.session
+            # Обработчик связывается со словарём в VkApi.__init__, подмена атрибута too_many_rps_handler не помогает
+            handlers = getattr(session, 'error_handlers', None)
+            if handlers is not None and TOO_MANY_RPS_CODE in handlers:
+                handlers[TOO_MANY_RPS_CODE] = _raise_error
+            rps_delay = getattr(session, 'RPS_DELAY', None)
+            if rps_delay and hasattr(session, 'lock'):
+                self.pacer = TokenBucket(rate=1 / rps_delay, burst=1)
+                session.RPS_DELAY = 0
+                session.lock = nullcontext()
+            http = getattr(session, 'http', None)
+            if http is not None:
+                http.request = _with_timeout(http.request)
+
+    def get_api(self):
+        return VkApiMethod(self)
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def method(self, method, values=None, raw=False):
+        self._install()
+        budget = remaining_budget()
+        deadline = time.monotonic() + (self.call_timeout if budget is None else min(budget, self.call_timeout))
+        self._count('calls')
+
+        if not self.breaker.allow():
+            self._count('rejected')
+            _note_outage(method)
+            raise CircuitOpenError(f"VK ({self.name}) временно недоступен, {method} не отправлен")
+
+        attempt = 0
+        while True:
+            left = deadline - time.monotonic()
+            if left <= 0 or not self.limiter.acquire(left):
+                self._deadline_exceeded(method)
+            if self.pacer is not None and not self.pacer.acquire(deadline - time.monotonic()):
+                self.limiter.release()
+                self._deadline_exceeded(method)
+
+            token = _call_timeout.set(deadline - time.monotonic())
+            try:
+                result = self.session.method(method, values, raw=raw)
+            except ApiError as e:
+                self.limiter.release(overloaded=e.code in OVERLOAD_ERROR_CODES)
+                if e.code not in TRANSIENT_ERROR_CODES:
+                    # Ошибка запроса (закрытый профиль, неверные параметры, ограничение частоты), а не недоступность VK
+                    self.breaker.record_success()
+                    raise
+                error = e
+            except OSError as e:
+                # Сетевые ошибки и таймауты requests - тоже признак перегрузки
+                self.limiter.release(overloaded=True)
+                error = e
+            except Exception:
+                self.limiter.release()
+                raise
+            else:
+                self.limiter.release()
+                self.breaker.record_success()
+                return result
+            finally:
+                _call_timeout.reset(token)
+
+            delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+            if attempt >= self.max_retries or time.monotonic() + delay >= deadline or not self.breaker.allow():
+                _note_outage(method)
+                logger.warning(f"{method} ({self.name}) не выполнен после {attempt + 1} попыток: {error}")
+                if isinstance(error, ApiError) and error.code in OVERLOAD_ERROR_CODES:
+                    # VK отвечает, только ограничивает частоту
+                    self.breaker.record_success()
+                else:
+                    self.breaker.record_failure()
+                raise error
+            attempt += 1
+            self._count('retries')
+            time.sleep(delay)
+
+    def _deadline_exceeded(self, method):
+        self._count('deadlines')
+        _note_outage(method)
+        raise DeadlineExceeded(f"{method} не уложился в бюджет времени")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limit': round(self.limiter.limit, 1),
+                'in_flight': self.limiter.in_flight,
+                'breaker': self.breaker.state,
+                'calls': self.calls,
+                'retries': self.retries,
+                'rejected': self.rejected,
+                'deadlines': self.deadlines,
+            }
+
+
+def _raise_error(error):
+    raise error
+
+
+def _with_timeout(request):
+    """HTTP-запрос requests с таймаутом из оставшегося бюджета текущего вызова"""
+    def wrapped(*args, **kwargs):
+        timeout = _call_timeout.get()
+        if timeout is not None and kwargs.get('timeout') is None:
+            kwargs['timeout'] = max(0.1, timeout)
+        return request(*args, **kwargs)
+
+    return wrapped
+
+
+def resilient(session, name):
+    """Сессия с политикой выполнения запросов (уже обёрнутая возвращается как есть)"""
+    if isinstance(session, VkExecutor):
+        return session
+    return VkExecutor(session, name)